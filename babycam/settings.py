@@ -86,6 +86,60 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Shared cache, used for recent chat history and room lookups so reconnecting
+# clients don't all hit the database
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+    }
+}
+
+# Audio monitor supervisor (`python manage.py runmonitor`).
+# Number of worker processes devices are spread over, 0 means one per CPU core.
+MONITOR_WORKERS = int(os.getenv("MONITOR_WORKERS", "0"))
+# "threads" runs a blocking reader thread per device, "asyncio" runs every device
+# of a worker on a single event loop.
+MONITOR_ENGINE = os.getenv("MONITOR_ENGINE", "threads")
+# asyncio engine only: analyze every device's current chunk together in one
+# vectorized call per tick instead of one call per device
+MONITOR_BATCH_ANALYSIS = os.getenv("MONITOR_BATCH_ANALYSIS", "False") == "True"
+# Monitors save/broadcast at most one AudioEvent per device per interval
+MONITOR_BROADCAST_INTERVAL = 0.5  # seconds
+# Live meter levels for every device are sent this many times a second, to
+# clients that connect to the monitor socket with ?levels=1
+MONITOR_LEVEL_STREAM_HZ = float(os.getenv("MONITOR_LEVEL_STREAM_HZ", "10"))
+# Relayed audio a listener may fall behind by before its oldest packets are
+# dropped. Low keeps live audio live on a bad connection.
+AUDIO_RELAY_CLIENT_BUFFER_MS = int(os.getenv("AUDIO_RELAY_CLIENT_BUFFER_MS", "1000"))
+# A device's ffmpeg reader is killed and restarted after this long without audio
+MONITOR_STALL_TIMEOUT = float(os.getenv("MONITOR_STALL_TIMEOUT", "10"))  # seconds
+# JSON model written by `manage.py train_cry_classifier`. Without one, RED
+# alerts aren't classified and always start a recording.
+CRY_MODEL_PATH = os.getenv("CRY_MODEL_PATH", os.path.join(BASE_DIR, "cry_model.json"))
+# Frames per second decoded for motion detection on devices that enable it
+MOTION_FPS = float(os.getenv("MOTION_FPS", "2"))
+# Raw AudioEvents older than this are pruned by the supervisor, the minute/hour
+# rollups are kept forever.
+AUDIO_EVENT_RETENTION_DAYS = int(os.getenv("AUDIO_EVENT_RETENTION_DAYS", "30"))
+# AudioEvents are saved in the background with bulk_create, in batches of up to
+# MONITOR_EVENT_BATCH_SIZE or every MONITOR_EVENT_FLUSH_INTERVAL seconds.
+MONITOR_EVENT_BATCH_SIZE = 50
+MONITOR_EVENT_FLUSH_INTERVAL = 1.0  # seconds
+MONITOR_EVENT_QUEUE_SIZE = 1000
+# What to do when the queue is full: "coalesce" into one event per device, or "drop"
+MONITOR_EVENT_OVERFLOW = "coalesce"
+# Recorded clips, one directory of HLS/fMP4 segments per clip
+RECORDINGS_ROOT = os.getenv("RECORDINGS_ROOT", os.path.join(BASE_DIR, "recordings"))
+RECORDING_SEGMENT_SECONDS = 2
+# Disk budget for clips, the supervisor evicts the least important clips to stay
+# under it. 0 disables a limit, which is the default for all three. Devices can
+# override the per-device quota. The free space limit counts everything on the
+# disk, so on a shared disk it can evict every clip.
+RECORDINGS_MAX_MB = int(os.getenv("RECORDINGS_MAX_MB", "0"))
+RECORDINGS_DEVICE_MAX_MB = int(os.getenv("RECORDINGS_DEVICE_MAX_MB", "0"))
+RECORDINGS_MIN_FREE_MB = int(os.getenv("RECORDINGS_MIN_FREE_MB", "0"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -146,7 +200,8 @@ LOGGING = {
     "loggers": {
         "monitor": {
             "handlers": ["console"],
-            "level": "DEBUG",
+            # DEBUG logs every level broadcast, keep it off in production
+            "level": os.getenv("MONITOR_LOG_LEVEL", "DEBUG" if DEBUG else "INFO"),
             "propagate": False,  # Prevent propagation to root logger
         },
     },
@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from monitor.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('monitor.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
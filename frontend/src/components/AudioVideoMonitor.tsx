@@ -1,6 +1,7 @@
 import { useState, useEffect } from "react";
 import useWebSocket from "react-use-websocket";
 import WebcamVideoStream from "./WebcamVideoStream";
+import RelayAudioPlayer from "./RelayAudioPlayer";
 import { WebsocketConnectionStatusBadge } from "./WebsocketConnectionStatusBadge";
 
 interface AudioMessage {
@@ -8,11 +9,44 @@ interface AudioMessage {
   device_id: number;
   peak: number;
   alert_level: "NONE" | "YELLOW" | "RED";
+  // Max of each audio feature over the interval (rms, crest_factor, band_mid, ...),
+  // plus the motion score when the device has motion detection on
+  features?: Record<string, number>;
+  // Learned background level of the device's alert feature, null until known
+  noise_floor?: number | null;
+  // The cry classifier's verdict on the interval, null without a model
+  sound?: { label: "cry" | "noise"; confidence: number } | null;
   timestamp: string;
 }
 
+// The device's camera connection, as seen by the monitor's ffmpeg reader
+interface ConnectionStateMessage {
+  type: "connection_state";
+  device_id: number;
+  state: "connecting" | "connected" | "reconnecting" | "stopped";
+  since: string;
+  reason?: string;
+  retry_in?: number;
+}
+
 interface WebSocketMessage {
-  message: AudioMessage;
+  message: AudioMessage | ConnectionStateMessage;
+}
+
+// Live meter update, sent MONITOR_LEVEL_STREAM_HZ times a second.
+// l holds [device_id, peak, alert] for devices whose level changed, alert is 0/1/2 for NONE/YELLOW/RED.
+interface LevelsMessage {
+  type: "levels";
+  t: number;
+  k?: 1;
+  l: [number, number, number][];
+}
+
+const ALERT_LEVELS = ["NONE", "YELLOW", "RED"] as const;
+
+interface LiveLevel {
+  peak: number;
+  alert_level: AudioMessage["alert_level"];
 }
 
 interface MonitorDevice {
@@ -20,11 +54,17 @@ interface MonitorDevice {
   name: string;
   stream_url: string;
   is_active: boolean;
+  threshold_mode: "absolute" | "relative";
+  noise_floor: number | null;
 }
 
 const AudioVideoMonitor = () => {
   const [device, setDevice] = useState<MonitorDevice | null>(null);
   const [audioData, setAudioData] = useState<AudioMessage | null>(null);
+  const [liveLevel, setLiveLevel] = useState<LiveLevel | null>(null);
+  const [connection, setConnection] = useState<ConnectionStateMessage | null>(
+    null
+  );
   const deviceId = 1; // We'll use device ID 1 for now
 
   useEffect(() => {
@@ -45,15 +85,32 @@ const AudioVideoMonitor = () => {
   }, [deviceId]);
 
   const { readyState } = useWebSocket(
-    `ws://localhost:8000/ws/monitor/${deviceId}/`,
+    `ws://localhost:8000/ws/monitor/${deviceId}/?levels=1`,
     {
       onMessage: (event) => {
-        console.log("Raw WebSocket message received:", event.data);
         try {
-          const parsed = JSON.parse(event.data) as WebSocketMessage;
-          console.log("Parsed message:", parsed);
-          if (parsed.message.type === "audio_level") {
+          const parsed = JSON.parse(event.data) as
+            | WebSocketMessage
+            | LevelsMessage;
+          if ("type" in parsed && parsed.type === "levels") {
+            const entry = parsed.l.find(([id]) => id === deviceId);
+            if (entry) {
+              setLiveLevel({
+                peak: entry[1],
+                alert_level: ALERT_LEVELS[entry[2]],
+              });
+            }
+          } else if (
+            "message" in parsed &&
+            parsed.message.type === "audio_level"
+          ) {
+            console.log("Audio event received:", parsed.message);
             setAudioData(parsed.message);
+          } else if (
+            "message" in parsed &&
+            parsed.message.type === "connection_state"
+          ) {
+            setConnection(parsed.message);
           }
         } catch (e) {
           console.error("Error parsing message:", e);
@@ -65,24 +122,28 @@ const AudioVideoMonitor = () => {
     }
   );
 
-  let audioDataView = audioData && (
+  // The meter follows the live level stream, falling back to the last alert event
+  const meter = liveLevel ?? audioData;
+  // Alert messages carry the live floor, the device fetch the last saved one
+  const noiseFloor = audioData?.noise_floor ?? device?.noise_floor ?? null;
+  let audioDataView = meter && (
     <div className="space-y-2">
       <div className="flex justify-between items-center">
         <span>Audio Level:</span>
-        <span className="font-mono">{audioData.peak}</span>
+        <span className="font-mono">{meter.peak}</span>
       </div>
 
       <div className="w-full bg-gray-200 rounded-full h-2.5">
         <div
           className={`h-full rounded-full transition-all duration-300 ${
-            audioData.alert_level === "RED"
+            meter.alert_level === "RED"
               ? "bg-red-500"
-              : audioData.alert_level === "YELLOW"
+              : meter.alert_level === "YELLOW"
               ? "bg-yellow-500"
               : "bg-green-500"
           }`}
           style={{
-            width: `${Math.min((audioData.peak / 3000) * 100, 100)}%`,
+            width: `${Math.min((meter.peak / 3000) * 100, 100)}%`,
           }}
         />
       </div>
@@ -91,14 +152,14 @@ const AudioVideoMonitor = () => {
         <span>Status:</span>
         <span
           className={`font-medium ${
-            audioData.alert_level === "RED"
+            meter.alert_level === "RED"
               ? "text-red-500"
-              : audioData.alert_level === "YELLOW"
+              : meter.alert_level === "YELLOW"
               ? "text-yellow-500"
               : "text-green-500"
           }`}
         >
-          {audioData.alert_level}
+          {meter.alert_level}
         </span>
       </div>
     </div>
@@ -124,8 +185,54 @@ const AudioVideoMonitor = () => {
 
       <div className="p-4">
         <WebsocketConnectionStatusBadge readyState={readyState} />
+        <RelayAudioPlayer deviceId={deviceId} />
+
+        {connection && (
+          <div
+            className={`mb-4 text-sm ${
+              connection.state === "connected"
+                ? "text-green-600"
+                : "text-red-600"
+            }`}
+          >
+            Camera: {connection.state}
+            {connection.state === "reconnecting" &&
+              ` (${connection.reason}, retrying in ${connection.retry_in}s)`}
+          </div>
+        )}
 
-        {audioData ? audioDataView : "No audio data yet"}
+        {meter ? audioDataView : "No audio data yet"}
+        {audioData?.sound && (
+          <div className="flex justify-between items-center text-sm text-gray-500">
+            <span>Sounds like:</span>
+            <span
+              className={`font-medium ${
+                audioData.sound.label === "cry" ? "text-red-500" : ""
+              }`}
+            >
+              {audioData.sound.label === "cry" ? "crying" : "other noise"} (
+              {Math.round(audioData.sound.confidence * 100)}%)
+            </span>
+          </div>
+        )}
+        {noiseFloor !== null && (
+          <div className="flex justify-between items-center text-sm text-gray-500">
+            <span>
+              Noise floor
+              {device?.threshold_mode === "relative" && " (thresholds follow it)"}
+              :
+            </span>
+            <span className="font-mono">{Math.round(noiseFloor)}</span>
+          </div>
+        )}
+        {audioData?.features?.motion !== undefined && (
+          <div className="flex justify-between items-center text-sm text-gray-500">
+            <span>Motion:</span>
+            <span className="font-mono">
+              {audioData.features.motion.toFixed(1)}%
+            </span>
+          </div>
+        )}
         <div className="text-xs text-gray-400 text-right">
           Current time:{" "}
           {currentTime.toLocaleTimeString("en-US", {
@@ -6,6 +6,7 @@ import { ReadyState } from "react-use-websocket";
 import { useUser } from "@/contexts/UserContext";
 
 interface Message {
+  id?: number;
   user: string;
   text: string;
   timestamp: string;
@@ -63,6 +64,8 @@ const Chat = () => {
     WebSocket.CONNECTING
   );
   const [isDeleting, setIsDeleting] = useState(false);
+  // Only the latest messages are sent on connect, older ones are loaded on request
+  const [hasMore, setHasMore] = useState(false);
   const wsRef = useRef<WebSocket | null>(null);
   const updateIntervalRef = useRef<NodeJS.Timeout | null>(null);
 
@@ -90,8 +93,8 @@ const Chat = () => {
       setReadyState(WebSocket.OPEN);
     };
     wsRef.current.onmessage = (evt) => {
-      // When we first connect to the server, we receive all the messages
-      // that were sent before we connected.
+      // When we first connect to the server, we receive the most recent messages
+      // that were sent before we connected, and can ask for older pages.
       // Subsequently, we only receive messages that were sent after we connected.
       console.log("Chat ws message received", evt.data);
       const data = JSON.parse(evt.data);
@@ -105,7 +108,12 @@ const Chat = () => {
       } else if (data.type === "chat_history") {
         const msgs: Message[] = data.messages;
         setMessages(msgs);
+        setHasMore(data.has_more);
         setupUpdateInterval(msgs);
+      } else if (data.type === "chat_history_page") {
+        const older: Message[] = data.messages;
+        setMessages((prev) => [...older, ...prev]);
+        setHasMore(data.has_more);
       }
     };
 
@@ -146,6 +154,19 @@ const Chat = () => {
     }
   };
 
+  const handleLoadOlder = () => {
+    const oldest = messages[0];
+    if (
+      oldest?.id === undefined ||
+      wsRef.current?.readyState !== WebSocket.OPEN
+    ) {
+      return;
+    }
+    wsRef.current.send(
+      JSON.stringify({ type: "load_older", before: oldest.id })
+    );
+  };
+
   const handleDeleteHistory = async () => {
     if (
       !confirm(
@@ -166,6 +187,7 @@ const Chat = () => {
       }
 
       setMessages([]);
+      setHasMore(false);
     } catch (error) {
       console.error("Error deleting chat history:", error);
       alert("Failed to delete chat history. Please try again.");
@@ -221,6 +243,13 @@ const Chat = () => {
             }
           `}
         </style>
+        {hasMore && (
+          <div style={{ textAlign: "center", marginBottom: "12px" }}>
+            <Button variant="outline" size="sm" onClick={handleLoadOlder}>
+              Load older messages
+            </Button>
+          </div>
+        )}
         {messages.map((message, index) => (
           <div
             key={index}
@@ -0,0 +1,81 @@
+import { useEffect, useRef, useState } from "react";
+import { Switch } from "@/components/ui/switch";
+
+// First (text) frame on the audio socket, describing the binary PCM frames after it
+interface AudioFormatMessage {
+  type: "audio_format";
+  encoding: "pcm_s16le";
+  rate: number;
+  channels: number;
+  packet_ms: number;
+}
+
+interface RelayAudioPlayerProps {
+  deviceId: number;
+}
+
+// Packets are scheduled this far ahead of the audio clock to ride out jitter
+const JITTER_BUFFER_SECONDS = 0.3;
+
+// Plays a device's audio as relayed by the server, so listening doesn't open
+// another stream to the camera however many parents are doing it
+const RelayAudioPlayer = ({ deviceId }: RelayAudioPlayerProps) => {
+  const [listening, setListening] = useState(false);
+  const contextRef = useRef<AudioContext | null>(null);
+
+  useEffect(() => {
+    if (!listening) {
+      return;
+    }
+
+    let format: AudioFormatMessage | null = null;
+    let playhead = 0;
+    const context = contextRef.current ?? new AudioContext();
+    contextRef.current = context;
+    context.resume();
+
+    const socket = new WebSocket(`ws://localhost:8000/ws/audio/${deviceId}/`);
+    socket.binaryType = "arraybuffer";
+    socket.onmessage = (event) => {
+      if (typeof event.data === "string") {
+        format = JSON.parse(event.data) as AudioFormatMessage;
+        return;
+      }
+      if (!format) {
+        return;
+      }
+      const pcm = new Int16Array(event.data as ArrayBuffer);
+      const buffer = context.createBuffer(1, pcm.length, format.rate);
+      const samples = buffer.getChannelData(0);
+      for (let i = 0; i < pcm.length; i++) {
+        samples[i] = pcm[i] / 32768;
+      }
+      const source = context.createBufferSource();
+      source.buffer = buffer;
+      source.connect(context.destination);
+      // Restart the playhead after a gap, otherwise play packets back to back
+      if (playhead < context.currentTime) {
+        playhead = context.currentTime + JITTER_BUFFER_SECONDS;
+      }
+      source.start(playhead);
+      playhead += buffer.duration;
+    };
+    socket.onerror = (event) => console.error("ws audio relay error:", event);
+
+    return () => {
+      socket.close();
+      context.suspend();
+    };
+  }, [listening, deviceId]);
+
+  return (
+    <div className="flex items-center gap-2">
+      <span className="text-gray-600">Listen:</span>
+      <div className="text-gray-600 text-lg">🔇</div>
+      <Switch checked={listening} onCheckedChange={setListening} />
+      <div className="text-gray-600 text-lg">🔊</div>
+    </div>
+  );
+};
+
+export default RelayAudioPlayer;
@@ -1,6 +1,13 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import MonitorDevice, AudioEvent
+from .models import (
+    MonitorDevice,
+    AudioEvent,
+    AudioEventMinuteRollup,
+    AudioEventHourRollup,
+    Recording,
+    RecordingSegment,
+)
 
 
 @admin.register(MonitorDevice)
@@ -9,6 +16,8 @@ class MonitorDeviceAdmin(admin.ModelAdmin):
         "name",
         "stream_url",
         "is_active",
+        "threshold_mode",
+        "noise_floor",
         "last_updated",
         "monitor_controls",
     )
@@ -29,6 +38,51 @@ class MonitorDeviceAdmin(admin.ModelAdmin):
 
 @admin.register(AudioEvent)
 class AudioEventAdmin(admin.ModelAdmin):
-    list_display = ("device", "timestamp", "peak_value", "alert_level")
-    list_filter = ("device", "alert_level", "timestamp")
-    ordering = ("-timestamp",)
+    list_display = ("device", "timestamp", "peak_value", "alert_level", "sound_label")
+    list_filter = ("device", "alert_level", "sound_label", "timestamp")
+    ordering = ("-timestamp", "-id")
+    # Counting every row on each page load gets slow once events pile up
+    show_full_result_count = False
+
+
+@admin.register(AudioEventMinuteRollup, AudioEventHourRollup)
+class AudioEventRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "device",
+        "bucket",
+        "max_peak",
+        "yellow_count",
+        "red_count",
+        "loud_seconds",
+    )
+    list_filter = ("device",)
+    ordering = ("-bucket",)
+
+
+class RecordingSegmentInline(admin.TabularInline):
+    model = RecordingSegment
+    extra = 0
+    readonly_fields = (
+        "sequence",
+        "uri",
+        "started_at",
+        "offset",
+        "duration",
+        "size_bytes",
+    )
+
+
+@admin.register(Recording)
+class RecordingAdmin(admin.ModelAdmin):
+    list_display = (
+        "device",
+        "started_at",
+        "duration",
+        "size_bytes",
+        "max_alert",
+        "max_peak",
+        "path",
+    )
+    list_filter = ("device", "max_alert")
+    ordering = ("-started_at",)
+    inlines = (RecordingSegmentInline,)
@@ -5,11 +5,10 @@ class MonitorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "monitor"
 
+    # Device monitors are owned by the supervisor (`python manage.py runmonitor`),
+    # not started here, so the web server and daphne workers never spawn duplicates.
+
     def ready(self):
-        from .services.audio_monitor import AudioMonitorService
-        from .models import MonitorDevice
+        # Device saves invalidate the config cache and reload running monitors
+        from . import signals  # noqa: F401
 
-        # Start audio monitoring for all active devices
-        for device in MonitorDevice.objects.filter(is_active=True):
-            monitor = AudioMonitorService.get_monitor(device.id)
-            monitor.start()
@@ -1,21 +1,75 @@
+import asyncio
 import logging
+import re
+from collections import deque
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
+import msgpack
 from channels.layers import get_channel_layer
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
 from asgiref.sync import sync_to_async
+from django.conf import settings
 
-from monitor.models import ChatMessage, ChatRoom
+from monitor.services import chat_history
+from monitor.services.audio_relay import (
+    LISTENER_REFRESH_INTERVAL,
+    PACKET_MS,
+    mark_listening,
+    relay_format,
+    relay_group_name,
+)
+from monitor.services.chat_history import CHAT_HISTORY_PAGE_SIZE
+from monitor.services.connection_state import get_connection_states
+from monitor.services.level_stream import levels_group
+from monitor.services.metrics import AUDIO_RELAY_DROPPED, WEBSOCKET_CLIENTS
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
-class MonitorConsumer(AsyncWebsocketConsumer):
-    """MonitorConsumer is used to send WS messages containing the most recent audio level measured by a given monitor device."""
+class CountedWebsocketConsumer(AsyncWebsocketConsumer):
+    """Counts accepted sockets in the websocket_clients metric, by `metrics_label`"""
+
+    metrics_label = ""
+    client_metric = None
+
+    async def accept(self, subprotocol=None, headers=None):
+        await super().accept(subprotocol, headers)
+        self.client_metric = WEBSOCKET_CLIENTS.labels(self.metrics_label)
+        self.client_metric.inc()
+
+    async def websocket_disconnect(self, message):
+        if self.client_metric is not None:
+            self.client_metric.dec()
+            self.client_metric = None
+        await super().websocket_disconnect(message)
+
+
+class MonitorConsumer(CountedWebsocketConsumer):
+    """MonitorConsumer is used to send WS messages containing the most recent audio level measured by a given monitor device.
+
+    One socket can watch several devices: the device in the URL (if any), any
+    listed in the `devices=1,2` query parameter, and any added later by sending
+    {"action": "subscribe" | "unsubscribe", "devices": [1, 2]}.
+
+    Other query parameters:
+        levels=1: also receive the live level stream, {"type": "levels", ...}
+            messages at MONITOR_LEVEL_STREAM_HZ holding only the watched devices
+            whose level changed (see LevelStream for the format)
+        encoding=msgpack: send msgpack-encoded binary frames instead of JSON text
+
+    Besides audio levels, each device's camera connection is reported as
+    {"message": {"type": "connection_state", "state": ...}}, once on subscribe
+    and again whenever it changes.
+    """
+
+    metrics_label = "monitor"
 
     async def connect(self):
-        self.device_id = self.scope["url_route"]["kwargs"]["device_id"]
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        self.binary = params.get("encoding", ["json"])[0] == "msgpack"
+        self.wants_levels = params.get("levels", ["0"])[0] in ("1", "true")
+        self.devices: set[int] = set()
 
         self.channel_layer = get_channel_layer()
         if self.channel_layer is None:
@@ -23,37 +77,411 @@ class MonitorConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
-        self.room_group_name = f"monitor_{self.device_id}"
-        logger.debug(f"New connection attempt for device {self.device_id}")
+        requested = []
+        url_device = self.scope["url_route"]["kwargs"].get("device_id")
+        if url_device is not None:
+            requested.append(url_device)
+        for value in params.get("devices", []):
+            requested.extend(value.split(","))
 
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        logger.debug(f"Added {self.channel_name} to group {self.room_group_name}")
         await self.accept()
-        logger.info(f"WebSocket connected for device {self.device_id}")
+        await self.subscribe(requested)
+        logger.info(f"WebSocket connected for devices {sorted(self.devices)}")
 
     async def disconnect(self, code):
-        logger.debug(f"Disconnecting from group: {self.room_group_name}")
-        if self.channel_layer is not None:
-            await self.channel_layer.group_discard(
-                self.room_group_name, self.channel_name
-            )
-        else:
+        if self.channel_layer is None:
             logger.error("Channel layer is None, cannot discard group")
+            return
+        await self.unsubscribe(list(self.devices))
+
+    async def subscribe(self, device_ids):
+        added = []
+        for device_id in parse_device_ids(device_ids):
+            if device_id not in self.devices:
+                self.devices.add(device_id)
+                added.append(device_id)
+                await self.channel_layer.group_add(
+                    f"monitor_{device_id}", self.channel_name
+                )
+                if self.wants_levels:
+                    await self.channel_layer.group_add(
+                        levels_group(device_id), self.channel_name
+                    )
+        # Tell the client whether each new device's camera is connected right now
+        for state in await fetch_connection_states(added):
+            await self.send_payload({"message": state})
+
+    async def unsubscribe(self, device_ids):
+        for device_id in parse_device_ids(device_ids):
+            if device_id in self.devices:
+                self.devices.discard(device_id)
+                await self.channel_layer.group_discard(
+                    f"monitor_{device_id}", self.channel_name
+                )
+                if self.wants_levels:
+                    await self.channel_layer.group_discard(
+                        levels_group(device_id), self.channel_name
+                    )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = decode_frame(text_data, bytes_data)
+            action = data["action"]
+            devices = list_field(data, "devices")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Error processing monitor message: {e}")
+            return
+
+        if action == "subscribe":
+            await self.subscribe(devices)
+        elif action == "unsubscribe":
+            await self.unsubscribe(devices)
+        else:
+            logger.error(f"Unknown monitor action: {action}")
+
+    async def send_payload(self, payload: Dict[str, Any]):
+        await self.send(**encode_frame(payload, self.binary))
 
     async def monitor_message(self, event):
-        logger.debug(f"Consumer received event to broadcast: {event}")
         try:
-            await self.send(text_data=json.dumps({"message": event["message"]}))
-            logger.debug("Successfully sent message to client")
+            await self.send_payload({"message": event["message"]})
         except Exception as e:
             logger.error(f"Error sending message: {e}", exc_info=True)
 
+    async def level_stream(self, event):
+        levels = event["levels"]
+        watched = [entry for entry in levels["l"] if entry[0] in self.devices]
+        if not watched:
+            return
+        await self.send_payload({**levels, "type": "levels", "l": watched})
+
+
+def encode_frame(payload: Dict[str, Any], binary: bool) -> Dict[str, Any]:
+    """Keyword arguments for `send()`: msgpack bytes or JSON text"""
+    if binary:
+        return {"bytes_data": msgpack.packb(payload)}
+    return {"text_data": json.dumps(payload)}
+
 
-class ChatConsumer(AsyncWebsocketConsumer):
+def decode_frame(text_data=None, bytes_data=None) -> Any:
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data)
+    return json.loads(text_data)
+
+
+def list_field(data: Dict[str, Any], key: str) -> list:
+    """data[key], which clients must send as a list"""
+    value = data[key]
+    if not isinstance(value, list):
+        raise TypeError(f"{key!r} must be a list, not {type(value).__name__}")
+    return value
+
+
+def parse_device_ids(values) -> List[int]:
+    device_ids = []
+    for value in values:
+        try:
+            device_ids.append(int(value))
+        except (TypeError, ValueError):
+            logger.error(f"Ignoring invalid device id: {value!r}")
+    return device_ids
+
+
+class DashboardConsumer(CountedWebsocketConsumer):
+    """One socket for everything a parent dashboard shows.
+
+    Clients send {"action": "subscribe" | "unsubscribe", "topics": [...]}, or
+    pass `topics=a,b` in the query string, where a topic is one of:
+        levels:<device_id>      live level meter (see LevelStream)
+        alerts:<device_id>      alert events and camera connection state, the same
+                                messages MonitorConsumer sends
+        recordings:<device_id>  a notice each time a clip has been written
+        chat:<room>             chat messages, with the room's history on subscribe
+    and get back frames of {"topic": topic, "data": message}. Chat messages are
+    sent with {"action": "chat", "room": room, "message": {user, text, timestamp}},
+    and older history fetched with {"action": "load_older", "room": room, "before": id}.
+    `encoding=msgpack` switches both directions to binary msgpack frames.
+
+    Outgoing frames go through a bounded per-connection queue so a slow client
+    can't hold up the channel layer. Unsent levels are merged into one frame
+    holding each device's newest level, and a client that falls more than SEND_QUEUE_SIZE
+    other frames behind is disconnected and left to reconnect.
+    """
+
+    metrics_label = "dashboard"
+    SEND_QUEUE_SIZE = 200
+
+    async def connect(self):
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        self.binary = params.get("encoding", ["json"])[0] == "msgpack"
+        self.topics: set[str] = set()
+        self.level_devices: set[int] = set()
+        self.outbox: deque = deque()
+        self.pending_levels: Optional[Dict[str, Any]] = None
+        self.levels_dropped = 0
+        self.outbox_ready = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+
+        self.channel_layer = get_channel_layer()
+        if self.channel_layer is None:
+            logger.error("Failed to get channel layer")
+            await self.close()
+            return
+
+        await self.accept()
+        self.sender = asyncio.create_task(self.send_loop())
+        topics = []
+        for value in params.get("topics", []):
+            topics.extend(value.split(","))
+        await self.subscribe(topics)
+
+    async def disconnect(self, code):
+        if self.sender is not None:
+            self.sender.cancel()
+        if self.channel_layer is None:
+            return
+        for topic in list(self.topics):
+            await self.unsubscribe([topic])
+        if self.levels_dropped:
+            logger.debug(f"Dropped {self.levels_dropped} stale level frames")
+
+    async def subscribe(self, topics):
+        for topic in topics:
+            group = topic_group(topic)
+            if group is None:
+                logger.error(f"Ignoring invalid topic: {topic!r}")
+                continue
+            if topic in self.topics:
+                continue
+            self.topics.add(topic)
+            kind, _, key = topic.partition(":")
+            if kind == "levels":
+                self.level_devices.add(int(key))
+            await self.channel_layer.group_add(group, self.channel_name)
+            if kind == "chat":
+                history = await fetch_history(key)
+                self.enqueue(topic, {"type": "chat_history", **history})
+            elif kind == "alerts":
+                for state in await fetch_connection_states([int(key)]):
+                    self.enqueue(topic, state)
+
+    async def unsubscribe(self, topics):
+        for topic in topics:
+            if topic not in self.topics:
+                continue
+            self.topics.discard(topic)
+            kind, _, key = topic.partition(":")
+            if kind == "levels":
+                self.level_devices.discard(int(key))
+            await self.channel_layer.group_discard(
+                topic_group(topic), self.channel_name
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = decode_frame(text_data, bytes_data)
+            action = data["action"]
+            if action == "subscribe":
+                await self.subscribe(list_field(data, "topics"))
+            elif action == "unsubscribe":
+                await self.unsubscribe(list_field(data, "topics"))
+            elif action == "chat":
+                await self.send_chat(data["room"], data["message"])
+            elif action == "load_older":
+                room_name = data["room"]
+                if f"chat:{room_name}" not in self.topics:
+                    raise ValueError(f"Not subscribed to chat room {room_name!r}")
+                page = await fetch_older(
+                    room_name, data["before"], data.get("limit", CHAT_HISTORY_PAGE_SIZE)
+                )
+                self.enqueue(f"chat:{room_name}", {"type": "chat_history_page", **page})
+            else:
+                logger.error(f"Unknown dashboard action: {action}")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Error processing dashboard message: {e}")
+
+    async def send_chat(self, room_name: str, message: Dict[str, Any]):
+        if topic_group(f"chat:{room_name}") is None:
+            raise ValueError(f"Invalid chat room: {room_name!r}")
+        message_data = {
+            "user": message["user"],
+            "text": message["text"],
+            "timestamp": message["timestamp"],
+        }
+        message_data["id"] = await save_message(room_name, message_data)
+        await self.channel_layer.group_send(
+            f"chat_{room_name}",
+            {"type": "chat_message", "room": room_name, "message": message_data},
+        )
+
+    def enqueue(self, topic: str, data: Any):
+        if len(self.outbox) >= self.SEND_QUEUE_SIZE:
+            logger.warning(f"Dashboard client {self.channel_name} is too slow, closing")
+            self.outbox.clear()
+            asyncio.create_task(self.close(code=4008))
+            return
+        self.outbox.append({"topic": topic, "data": data})
+        self.outbox_ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self.outbox_ready.wait()
+            self.outbox_ready.clear()
+            # Alerts and chat go first; levels only ever send the newest frame
+            while self.outbox or self.pending_levels is not None:
+                if self.outbox:
+                    frame = self.outbox.popleft()
+                else:
+                    frame, self.pending_levels = self.pending_levels, None
+                try:
+                    await self.send(**encode_frame(frame, self.binary))
+                except Exception as e:
+                    logger.error(f"Error sending dashboard frame: {e}")
+
+    async def level_stream(self, event):
+        levels = event["levels"]
+        watched = [entry for entry in levels["l"] if entry[0] in self.level_devices]
+        if not watched:
+            return
+        pending = self.pending_levels
+        if pending is not None:
+            # Each device's levels arrive on their own, merge them into the
+            # unsent frame keeping only the newest of each device
+            merged = {entry[0]: entry for entry in pending["data"]["l"]}
+            for entry in watched:
+                if entry[0] in merged:
+                    self.levels_dropped += 1
+                merged[entry[0]] = entry
+            watched = list(merged.values())
+            if "k" in pending["data"]:
+                levels = {**levels, "k": 1}
+        self.pending_levels = {"topic": "levels", "data": {**levels, "l": watched}}
+        self.outbox_ready.set()
+
+    async def monitor_message(self, event):
+        message = event["message"]
+        self.enqueue(f"alerts:{message['device_id']}", message)
+
+    async def recording_ready(self, event):
+        message = event["message"]
+        self.enqueue(f"recordings:{message['device_id']}", message)
+
+    async def chat_message(self, event):
+        self.enqueue(
+            f"chat:{event['room']}",
+            {"type": "chat_message", "message": event["message"]},
+        )
+
+
+class AudioRelayConsumer(CountedWebsocketConsumer):
+    """Live audio of one device, relayed by the server from the monitor's own decode.
+
+    The first frame is a JSON text frame describing the audio (see
+    `relay_format()`), every later one is a binary frame of raw PCM. Parents
+    listening this way don't each open a stream to the camera, the monitor
+    already has one.
+
+    While connected the socket keeps the device's listener key in the cache
+    fresh, which is what makes the monitor relay anything at all. Packets go
+    through a queue of AUDIO_RELAY_CLIENT_BUFFER_MS; a client that falls
+    further behind loses the oldest packets rather than hearing ever more
+    delayed audio.
+    """
+
+    metrics_label = "audio"
+
+    async def connect(self):
+        self.outbox: deque = deque(
+            maxlen=max(1, settings.AUDIO_RELAY_CLIENT_BUFFER_MS // PACKET_MS)
+        )
+        self.outbox_ready = asyncio.Event()
+        self.dropped = 0
+        self.tasks: List[asyncio.Task] = []
+        self.group_name: Optional[str] = None
+
+        try:
+            self.device_id = int(self.scope["url_route"]["kwargs"]["device_id"])
+        except (KeyError, ValueError):
+            await self.close()
+            return
+
+        self.channel_layer = get_channel_layer()
+        if self.channel_layer is None:
+            logger.error("Failed to get channel layer")
+            await self.close()
+            return
+
+        self.group_name = relay_group_name(self.device_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps(relay_format()))
+        self.tasks = [
+            asyncio.create_task(self.send_loop()),
+            asyncio.create_task(self.keep_listening()),
+        ]
+        logger.info(f"Audio listener connected for device {self.device_id}")
+
+    async def disconnect(self, code):
+        for task in self.tasks:
+            task.cancel()
+        if self.channel_layer is not None and self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.dropped:
+            logger.info(
+                f"Audio listener for device {self.device_id} fell behind, "
+                f"dropped {self.dropped} packets"
+            )
+
+    async def keep_listening(self):
+        while True:
+            try:
+                await sync_to_async(mark_listening)(self.device_id)
+            except Exception as e:
+                logger.error(f"Error refreshing audio listener: {e}")
+            await asyncio.sleep(LISTENER_REFRESH_INTERVAL)
+
+    async def send_loop(self):
+        while True:
+            await self.outbox_ready.wait()
+            self.outbox_ready.clear()
+            while self.outbox:
+                try:
+                    await self.send(bytes_data=self.outbox.popleft())
+                except Exception as e:
+                    logger.error(f"Error sending audio packet: {e}")
+
+    async def audio_packet(self, event):
+        if len(self.outbox) == self.outbox.maxlen:
+            # The deque drops its oldest packet to make room
+            self.dropped += 1
+            AUDIO_RELAY_DROPPED.labels(self.device_id).inc()
+        self.outbox.append(event["message"]["pcm"])
+        self.outbox_ready.set()
+
+
+def topic_group(topic: str) -> Optional[str]:
+    """The channel layer group behind a dashboard topic, None if it isn't valid"""
+    kind, _, key = topic.partition(":")
+    if kind == "chat":
+        return f"chat_{key}" if re.fullmatch(r"\w+", key) else None
+    if not key.isdigit():
+        return None
+    if kind == "levels":
+        return levels_group(int(key))
+    if kind == "alerts":
+        return f"monitor_{key}"
+    if kind == "recordings":
+        return f"recordings_{key}"
+    return None
+
+
+class ChatConsumer(CountedWebsocketConsumer):
     """ChatConsumer is used to send and receive chat messages from each of the parent clients."""
 
+    metrics_label = "chat"
+
     async def connect(self):
-        """On connect, the server should send all chat history to the client"""
+        """On connect, the server sends the room's most recent messages to the client"""
 
         self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
         self.channel_layer = get_channel_layer()
@@ -71,9 +499,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
         history = await fetch_history(self.room_name)
-        await self.send(
-            text_data=json.dumps({"type": "chat_history", "messages": history})
-        )
+        await self.send(text_data=json.dumps({"type": "chat_history", **history}))
 
     async def disconnect(self, code):
         # Leave room group
@@ -92,6 +518,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
         logger.debug(f"Chat message received: {text_data}")
         try:
             data = json.loads(text_data)
+            if data.get("type") == "load_older":
+                # Keyset paging: the client sends the id of the oldest message it has
+                page = await fetch_older(
+                    self.room_name,
+                    data["before"],
+                    data.get("limit", CHAT_HISTORY_PAGE_SIZE),
+                )
+                await self.send(
+                    text_data=json.dumps({"type": "chat_history_page", **page})
+                )
+                return
+
             message_data = {
                 "user": data["user"],
                 "text": data["text"],
@@ -99,7 +537,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
 
             # Save message to database
-            await save_message(self.room_name, message_data)
+            message_data["id"] = await save_message(self.room_name, message_data)
 
             # Send message to room group
             if self.channel_layer is None:
@@ -107,9 +545,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 return
 
             await self.channel_layer.group_send(
-                self.room_group_name, {"type": "chat_message", "message": message_data}
+                self.room_group_name,
+                {
+                    "type": "chat_message",
+                    "room": self.room_name,
+                    "message": message_data,
+                },
             )
-        except (KeyError, json.JSONDecodeError) as e:
+        except (KeyError, TypeError, ValueError) as e:
             logger.error(f"Error processing message: {e}")
             return
 
@@ -123,30 +566,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
 
 @sync_to_async
-def fetch_history(room_name: str) -> List[Dict[str, Any]]:
-    room, _ = ChatRoom.objects.get_or_create(name=room_name)
-    messages = ChatMessage.objects.filter(room=room).order_by("id")
-    # Convert to frontend Message interface format
-    history = [
-        {
-            "user": msg["user"],
-            "text": msg["text"],
-            "timestamp": msg["timestamp"].isoformat(),
-        }
-        for msg in messages.values("user", "text", "timestamp")
-    ]
-    return history
+def fetch_history(room_name: str) -> Dict[str, Any]:
+    return chat_history.fetch_recent(room_name)
+
+
+@sync_to_async
+def fetch_older(room_name: str, before_id: int, limit: int) -> Dict[str, Any]:
+    return chat_history.fetch_older(room_name, before_id, limit)
+
+
+@sync_to_async
+def save_message(room_name: str, message_data: Dict[str, Any]) -> int:
+    return chat_history.save_message(room_name, message_data)
 
 
 @sync_to_async
-def save_message(room_name: str, message_data: Dict[str, Any]) -> None:
-    room, _ = ChatRoom.objects.get_or_create(name=room_name)
-    # Frontend sends ISO format timestamp, parse it for database
-    ChatMessage.objects.create(
-        room=room,
-        user=message_data["user"],
-        text=message_data["text"],
-        timestamp=message_data[
-            "timestamp"
-        ],  # Django will parse ISO format automatically
-    )
+def fetch_connection_states(device_ids: List[int]) -> List[Dict[str, Any]]:
+    if not device_ids:
+        return []
+    return get_connection_states(device_ids)
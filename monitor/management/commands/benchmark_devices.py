@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from monitor.management.commands.benchmark_monitor import BenchmarkMonitor
+from monitor.models import MonitorDevice
+from monitor.services.batch import MAX_WAIT_CHUNKS, BatchAnalyzer
+from monitor.services.sources import ArraySource, SyntheticSource
+
+
+class Command(BaseCommand):
+    help = 'Compare CPU per device for per-device threads and batched analysis as the device count grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--devices',
+            default='1,2,4,8,16,32',
+            help='Comma-separated device counts to benchmark',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=60,
+            help='Seconds of synthetic audio each device processes',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(count) for count in options['devices'].split(',')]
+        except ValueError:
+            raise CommandError('--devices must be a comma-separated list of integers')
+        if any(count < 1 for count in counts):
+            raise CommandError('--devices counts must be at least 1')
+
+        if options['verbosity'] < 2:
+            # Per-alert log lines would dominate the timings
+            logging.disable(logging.WARNING)
+
+        # Every device replays the same audio, each starting at a different offset
+        self.pattern = None
+        self.stdout.write(
+            f'{"devices":>8}  {"mode":<8}  {"CPU/device":>12}  {"wall":>8}  {"x real time":>12}'
+        )
+        for count in counts:
+            for mode, run in (('threads', self.run_threads), ('batched', self.run_batched)):
+                monitors = self.build_monitors(count, options['seconds'])
+                wall_started = time.perf_counter()
+                cpu_started = time.process_time()
+                run(monitors)
+                cpu = time.process_time() - cpu_started
+                wall = time.perf_counter() - wall_started
+                # CPU seconds spent per device for each second of its audio
+                per_device = cpu / count / options['seconds']
+                self.stdout.write(
+                    f'{count:>8}  {mode:<8}  {per_device * 1000:>9.2f} ms  {wall:>7.2f}s  {options["seconds"] / wall:>11.0f}x'
+                )
+        logging.disable(logging.NOTSET)
+        self.stdout.write('CPU/device is CPU milliseconds per second of audio per device')
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def build_monitors(self, count, seconds):
+        monitors = []
+        for i in range(count):
+            device = MonitorDevice(
+                id=i,
+                name=f'benchmark-{i}',
+                stream_url='http://benchmark.invalid/',
+                yellow_threshold=1000,
+                red_threshold=5000,
+            )
+            monitor = BenchmarkMonitor(device, source=None)
+            if self.pattern is None:
+                self.pattern = SyntheticSource(monitor.RATE, seconds).samples
+            source = ArraySource(self.pattern)
+            source.position = (i * monitor.RATE * 7) % len(self.pattern)
+            source.remaining = int(seconds * monitor.RATE)
+            monitor.source = source
+            monitors.append(monitor)
+        return monitors
+
+    def run_threads(self, monitors):
+        """One thread per device, each analyzing its own chunks: the threads engine"""
+
+        def run(monitor):
+            source = monitor.source
+            while monitor.read_chunk(source):
+                monitor.process_chunk(monitor.audio_buffer, monitor.stream_time)
+
+        threads = [threading.Thread(target=run, args=(monitor,)) for monitor in monitors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_batched(self, monitors):
+        """Every device's chunk analyzed through BatchAnalyzer on one event loop: the asyncio engine"""
+        asyncio.run(self.run_analyzer(monitors))
+
+    async def run_analyzer(self, monitors):
+        first = monitors[0]
+        analyzer = BatchAnalyzer(
+            first.RATE,
+            first.CHUNK_FRAMES,
+            max_wait=first.CHUNK_MS / 1000 * MAX_WAIT_CHUNKS,
+            capacity=len(monitors),
+        )
+
+        async def run(monitor, slot):
+            try:
+                while monitor.read_chunk(monitor.source):
+                    features = await analyzer.analyze(slot, monitor.audio_buffer)
+                    monitor.process_chunk(monitor.audio_buffer, monitor.stream_time, features)
+            finally:
+                analyzer.unregister(monitor.device.id)
+
+        # All registered up front, as cameras that are already streaming would be
+        slots = [analyzer.register(monitor.device.id) for monitor in monitors]
+        await asyncio.gather(*(run(monitor, slot) for monitor, slot in zip(monitors, slots)))
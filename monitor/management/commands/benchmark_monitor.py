@@ -0,0 +1,133 @@
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from monitor.models import MonitorDevice
+from monitor.services.audio_monitor import AudioMonitorService
+from monitor.services.sources import SyntheticSource, WavFileSource
+
+
+class BenchmarkMonitor(AudioMonitorService):
+    """AudioMonitorService with every side effect replaced by a counter.
+
+    Nothing is written to the DB, sent to the channel layer or recorded, so the
+    benchmark runs offline and only measures the detection path.
+    """
+
+    def __init__(self, device, source):
+        super().__init__(device, source)
+        self.events_saved = 0
+        self.broadcasts = 0
+        self.recordings_started = 0
+        self.alerts_fired = 0
+        self.relay.poll_listeners = False
+
+    def save_event(self, peak, alert_level, features=None):
+        self.events_saved += 1
+
+    def broadcast_level(self, peak, alert_level, features=None):
+        self.broadcasts += 1
+
+    def start_recording(self):
+        self.recordings_started += 1
+        self.recording = True
+        self.recording_start_time = self.stream_time
+        self.quiet_period_start = None
+
+    def stop_recording(self):
+        self.recording = False
+        self.last_recording_stop = self.stream_time
+
+    def store_noise_floor(self, floor):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Push recorded or synthetic audio through the detection path as fast as possible and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='16-bit WAV file to replay (default: synthetic audio)')
+        parser.add_argument('--loops', type=int, default=1, help='Times to replay --file')
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=3600,
+            help='Seconds of synthetic audio to generate when no --file is given',
+        )
+        parser.add_argument('--yellow', type=float, default=1000, help='Yellow threshold')
+        parser.add_argument('--red', type=float, default=5000, help='Red threshold')
+        parser.add_argument('--feature', default='peak', help='Feature the thresholds apply to')
+        parser.add_argument(
+            '--trace-allocations',
+            action='store_true',
+            help='Track Python allocations with tracemalloc (slows the run down)',
+        )
+
+    def handle(self, *args, **options):
+        device = MonitorDevice(
+            id=0,
+            name='benchmark',
+            stream_url='http://benchmark.invalid/',
+            yellow_threshold=options['yellow'],
+            red_threshold=options['red'],
+            alert_feature=options['feature'],
+        )
+        # Build the monitor first so RATE and CHUNK_FRAMES come from the real service
+        monitor = BenchmarkMonitor(device, source=None)
+        try:
+            if options['file']:
+                monitor.source = WavFileSource(options['file'], monitor.RATE, options['loops'])
+            else:
+                monitor.source = SyntheticSource(monitor.RATE, options['seconds'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        expected_chunks = monitor.source.remaining // monitor.CHUNK_FRAMES
+        latencies = np.empty(expected_chunks, dtype=np.float64)
+        chunks = 0
+        previous_alert = 'NONE'
+
+        if options['verbosity'] < 2:
+            # Per-alert log lines would dominate the timings
+            logging.disable(logging.WARNING)
+        if options['trace_allocations']:
+            tracemalloc.start()
+
+        source = monitor.source
+        source.open()
+        started = time.perf_counter()
+        while chunks < expected_chunks and monitor.read_chunk(source):
+            chunk_started = time.perf_counter()
+            monitor.process_chunk(monitor.audio_buffer, monitor.stream_time)
+            latencies[chunks] = time.perf_counter() - chunk_started
+            alert = monitor.alert_state.state
+            if previous_alert == 'NONE' and alert != 'NONE':
+                monitor.alerts_fired += 1
+            previous_alert = alert
+            chunks += 1
+        elapsed = time.perf_counter() - started
+        source.close()
+        logging.disable(logging.NOTSET)
+
+        if options['trace_allocations']:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        latencies = latencies[:chunks] * 1e6
+        audio_seconds = monitor.stream_time
+        self.stdout.write(f'Audio processed:   {audio_seconds:.0f}s in {elapsed:.2f}s ({audio_seconds / elapsed:.0f}x real time)')
+        self.stdout.write(f'Throughput:        {monitor.frames_consumed / elapsed:,.0f} samples/s')
+        self.stdout.write(f'Chunks:            {chunks} x {monitor.CHUNK_MS} ms')
+        if chunks:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            self.stdout.write(
+                f'Per-chunk latency: p50 {p50:.1f}us  p95 {p95:.1f}us  p99 {p99:.1f}us  max {latencies.max():.1f}us'
+            )
+        self.stdout.write(f'Alerts fired:      {monitor.alerts_fired}')
+        self.stdout.write(f'Events saved:      {monitor.events_saved}')
+        self.stdout.write(f'Recordings:        {monitor.recordings_started}')
+        if options['trace_allocations']:
+            self.stdout.write(f'Allocations:       {current / 1024:.1f} KiB still held, {peak / 1024:.1f} KiB peak')
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
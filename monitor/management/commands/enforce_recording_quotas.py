@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from monitor.services.storage import enforce_quotas, usage
+
+class Command(BaseCommand):
+    help = 'Evict the least important recordings until every disk quota is met'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report disk usage',
+        )
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            evicted, freed = enforce_quotas()
+            self.stdout.write(self.style.SUCCESS(f'Evicted {evicted} recordings, freed {freed} bytes'))
+        current = usage()
+        for device in current['devices']:
+            self.stdout.write(
+                f"{device['name']}: {device['bytes']} bytes in {device['clips']} clips"
+                f" (quota {device['quota_bytes'] or 'none'})"
+            )
+        self.stdout.write(
+            f"Total: {current['bytes']} bytes in {current['clips']} clips"
+            f" (quota {current['quota_bytes'] or 'none'}), {current['disk']['free']} bytes free"
+        )
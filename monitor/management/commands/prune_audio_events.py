@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from monitor.services.rollups import prune_raw_events
+
+class Command(BaseCommand):
+    help = 'Delete raw audio events older than the retention period, keeping the rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.AUDIO_EVENT_RETENTION_DAYS,
+            help='Keep raw events from the last N days (default: AUDIO_EVENT_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_raw_events(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} audio events'))
@@ -1,21 +1,33 @@
+import asyncio
+
 from django.core.management.base import BaseCommand
-from monitor.models import MonitorDevice
-from monitor.services.audio_monitor import AudioMonitorService
+from monitor.services.supervisor import MonitorSupervisor
 
 class Command(BaseCommand):
-    help = 'Start audio monitoring for all active devices'
+    help = 'Run the monitor supervisor, which owns audio monitoring for all active devices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Number of worker processes (default: MONITOR_WORKERS, or one per CPU core)',
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['threads', 'asyncio'],
+            default='',
+            help='Monitor engine each worker runs (default: MONITOR_ENGINE)',
+        )
 
     def handle(self, *args, **options):
-        devices = MonitorDevice.objects.filter(is_active=True)
-        
-        for device in devices:
-            try:
-                monitor = AudioMonitorService.get_monitor(device.id)
-                monitor.start()
-                self.stdout.write(
-                    self.style.SUCCESS(f'Started monitoring {device.name}')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Failed to start {device.name}: {e}')
-                )
\ No newline at end of file
+        supervisor = MonitorSupervisor(
+            num_workers=options['workers'], engine=options['engine']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting monitor supervisor with {len(supervisor.workers)} workers')
+        )
+        try:
+            asyncio.run(supervisor.run())
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping monitor supervisor...'))
@@ -0,0 +1,118 @@
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from monitor.services.classifier import MODEL_VERSION, N_MELS, CryClassifier, LogMelFeatures
+from monitor.services.sources import WavFileSource
+
+# Must match AudioMonitorService.RATE and CHUNK_FRAMES, the model sees its chunks
+RATE = 48000
+FRAME = 1920
+WINDOW_FRAMES = 25  # One second, what the monitor classifies
+
+
+class Command(BaseCommand):
+    help = 'Train the cry-vs-noise classifier from folders of labeled 16-bit WAV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cry', required=True, help='Folder of WAV files of crying')
+        parser.add_argument(
+            '--noise',
+            required=True,
+            help='Folder of WAV files of everything else: dogs, doors, TV, fans, talking',
+        )
+        parser.add_argument(
+            '--output',
+            default=settings.CRY_MODEL_PATH,
+            help='Where to write the model (default: CRY_MODEL_PATH)',
+        )
+        parser.add_argument(
+            '--min-peak',
+            type=int,
+            default=1000,
+            help='Skip windows quieter than this peak, they would never be classified',
+        )
+        parser.add_argument('--holdout', type=float, default=0.2, help='Share of windows kept for testing')
+        parser.add_argument('--l2', type=float, default=1e-3, help='L2 regularization strength')
+        parser.add_argument('--epochs', type=int, default=2000, help='Gradient descent steps')
+
+    def handle(self, *args, **options):
+        features = LogMelFeatures(RATE, FRAME, N_MELS)
+        cry = self.load_windows(options['cry'], features, options['min_peak'])
+        noise = self.load_windows(options['noise'], features, options['min_peak'])
+        if not len(cry) or not len(noise):
+            raise CommandError('Need at least one usable window of both crying and noise')
+        self.stdout.write(f'Windows: {len(cry)} crying, {len(noise)} noise')
+
+        x = np.vstack([cry, noise])
+        y = np.concatenate([np.ones(len(cry)), np.zeros(len(noise))])
+        order = np.random.default_rng(0).permutation(len(y))
+        x, y = x[order], y[order]
+        split = int(len(y) * (1 - options['holdout']))
+        train_x, train_y, test_x, test_y = x[:split], y[:split], x[split:], y[split:]
+
+        mean = train_x.mean(axis=0)
+        scale = train_x.std(axis=0)
+        scale[scale == 0] = 1.0
+        weights, bias = self.fit(
+            (train_x - mean) / scale, train_y, options['l2'], options['epochs']
+        )
+
+        model = {
+            'version': MODEL_VERSION,
+            'rate': RATE,
+            'frame': FRAME,
+            'n_mels': N_MELS,
+            'mean': mean.tolist(),
+            'scale': scale.tolist(),
+            'weights': weights.tolist(),
+            'bias': bias,
+        }
+        classifier = CryClassifier(model)
+        for name, set_x, set_y in (('train', train_x, train_y), ('holdout', test_x, test_y)):
+            if len(set_y):
+                z = (set_x - classifier.mean) / classifier.scale
+                predicted = (z @ classifier.weights + classifier.bias) >= 0
+                self.stdout.write(f'Accuracy ({name}): {np.mean(predicted == set_y):.1%} of {len(set_y)} windows')
+
+        directory = os.path.dirname(options['output'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(options['output'], 'w') as f:
+            json.dump(model, f)
+        self.stdout.write(self.style.SUCCESS(f'Model written to {options["output"]}'))
+
+    def load_windows(self, folder, features, min_peak):
+        """Log-mel features of every loud enough one-second window, hopping half a second"""
+        if not os.path.isdir(folder):
+            raise CommandError(f'{folder} is not a folder')
+        window = WINDOW_FRAMES * FRAME
+        rows = []
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith('.wav'):
+                continue
+            try:
+                samples = WavFileSource(os.path.join(folder, name), RATE).samples
+            except (OSError, ValueError, EOFError) as e:
+                self.stderr.write(f'Skipping {name}: {e}')
+                continue
+            for start in range(0, len(samples) - window + 1, window // 2):
+                chunk = samples[start : start + window]
+                if np.abs(chunk.astype(np.int32)).max() < min_peak:
+                    continue
+                rows.append(features.extract(chunk.reshape(WINDOW_FRAMES, FRAME)))
+        return np.array(rows).reshape(-1, features.size)
+
+    def fit(self, x, y, l2, epochs):
+        """Logistic regression by full-batch gradient descent"""
+        weights = np.zeros(x.shape[1])
+        bias = 0.0
+        rate = 0.5
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(x @ weights + bias)))
+            error = p - y
+            weights -= rate * (x.T @ error / len(y) + l2 * weights)
+            bias -= rate * float(error.mean())
+        return weights, bias
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0004_alter_monitordevice_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitordevice',
+            name='pre_roll_max_kb',
+            field=models.PositiveIntegerField(default=8192),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='pre_roll_seconds',
+            field=models.PositiveIntegerField(default=5),
+        ),
+    ]
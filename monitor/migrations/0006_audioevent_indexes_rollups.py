@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0005_monitordevice_pre_roll'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioEventHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('max_peak', models.IntegerField(default=0)),
+                ('yellow_count', models.IntegerField(default=0)),
+                ('red_count', models.IntegerField(default=0)),
+                ('loud_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AudioEventMinuteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('max_peak', models.IntegerField(default=0)),
+                ('yellow_count', models.IntegerField(default=0)),
+                ('red_count', models.IntegerField(default=0)),
+                ('loud_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='audioevent',
+            index=models.Index(fields=['device', 'timestamp'], name='monitor_aud_device__52448a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audioevent',
+            index=models.Index(fields=['timestamp'], name='monitor_aud_timesta_fb0dad_idx'),
+        ),
+        migrations.AddField(
+            model_name='audioeventhourrollup',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitor.monitordevice'),
+        ),
+        migrations.AddField(
+            model_name='audioeventminuterollup',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='monitor.monitordevice'),
+        ),
+        migrations.AddConstraint(
+            model_name='audioeventhourrollup',
+            constraint=models.UniqueConstraint(fields=('device', 'bucket'), name='audioeventhourrollup_device_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='audioeventminuterollup',
+            constraint=models.UniqueConstraint(fields=('device', 'bucket'), name='audioeventminuterollup_device_bucket'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0006_audioevent_indexes_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioevent',
+            name='band_high',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='band_low',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='band_mid',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='crest_factor',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='rms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='zero_crossing_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='alert_feature',
+            field=models.CharField(choices=[('peak', 'Peak'), ('rms', 'RMS'), ('crest_factor', 'Crest factor'), ('zero_crossing_rate', 'Zero-crossing rate'), ('band_low', 'Low band energy'), ('band_mid', 'Mid band energy'), ('band_high', 'High band energy')], default='peak', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='monitordevice',
+            name='red_threshold',
+            field=models.FloatField(default=5000),
+        ),
+        migrations.AlterField(
+            model_name='monitordevice',
+            name='yellow_threshold',
+            field=models.FloatField(default=1000),
+        ),
+    ]
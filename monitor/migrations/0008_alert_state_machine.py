@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0007_audio_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitordevice',
+            name='alert_hysteresis',
+            field=models.FloatField(default=0.8),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='alert_release_ms',
+            field=models.PositiveIntegerField(default=1000),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='alert_sustain_ms',
+            field=models.PositiveIntegerField(default=200),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='recording_cooldown_seconds',
+            field=models.PositiveIntegerField(default=5),
+        ),
+    ]
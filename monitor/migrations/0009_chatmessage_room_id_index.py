@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0008_alert_state_machine'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'id'], name='monitor_cha_room_id_b135e7_idx'),
+        ),
+    ]
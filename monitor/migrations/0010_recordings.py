@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0009_chatmessage_room_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recording',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordings', to='monitor.monitordevice')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecordingSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('uri', models.CharField(max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('offset', models.FloatField()),
+                ('duration', models.FloatField()),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('recording', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='monitor.recording')),
+            ],
+            options={
+                'ordering': ['recording', 'sequence'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recording',
+            index=models.Index(fields=['device', 'started_at'], name='monitor_rec_device__279ca3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recordingsegment',
+            constraint=models.UniqueConstraint(fields=('recording', 'sequence'), name='recordingsegment_sequence'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0010_recordings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='has_poster',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='has_waveform',
+            field=models.BooleanField(default=False),
+        ),
+    ]
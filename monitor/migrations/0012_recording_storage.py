@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0011_recording_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitordevice',
+            name='recording_quota_mb',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='max_alert',
+            field=models.CharField(choices=[('NONE', 'None'), ('YELLOW', 'Yellow'), ('RED', 'Red')], default='NONE', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='max_peak',
+            field=models.IntegerField(default=0),
+        ),
+    ]
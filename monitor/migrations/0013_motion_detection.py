@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0012_recording_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioevent',
+            name='motion_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='motion_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='motion_regions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='motion_threshold',
+            field=models.FloatField(default=2.0),
+        ),
+    ]
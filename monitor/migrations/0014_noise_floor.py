@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0013_motion_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitordevice',
+            name='noise_floor',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='red_db',
+            field=models.FloatField(default=18),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='threshold_mode',
+            field=models.CharField(choices=[('absolute', 'Absolute'), ('relative', 'Relative to noise floor')], default='absolute', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='yellow_db',
+            field=models.FloatField(default=12),
+        ),
+    ]
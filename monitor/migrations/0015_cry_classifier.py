@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0014_noise_floor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioevent',
+            name='sound_confidence',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audioevent',
+            name='sound_label',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='monitordevice',
+            name='cry_confidence_threshold',
+            field=models.FloatField(default=0.5),
+        ),
+    ]
@@ -1,6 +1,25 @@
 from django.db import models
 
 
+# Audio features a device's thresholds can be applied to (see services/features.py)
+ALERT_FEATURE_CHOICES = [
+    ("peak", "Peak"),
+    ("rms", "RMS"),
+    ("crest_factor", "Crest factor"),
+    ("zero_crossing_rate", "Zero-crossing rate"),
+    ("band_low", "Low band energy"),
+    ("band_mid", "Mid band energy"),
+    ("band_high", "High band energy"),
+]
+
+# Absolute thresholds are in feature units, relative ones are dB above the
+# device's learned noise floor (see services/noise_floor.py)
+THRESHOLD_MODE_CHOICES = [
+    ("absolute", "Absolute"),
+    ("relative", "Relative to noise floor"),
+]
+
+
 class MonitorDevice(models.Model):
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=100)
@@ -8,8 +27,43 @@ class MonitorDevice(models.Model):
     is_authenticated = models.BooleanField(default=False)
     username = models.CharField(max_length=100)
     password = models.CharField(max_length=100)
-    yellow_threshold = models.IntegerField(default=1000)
-    red_threshold = models.IntegerField(default=5000)
+    # Thresholds apply to whichever feature `alert_feature` selects
+    alert_feature = models.CharField(
+        max_length=30, choices=ALERT_FEATURE_CHOICES, default="peak"
+    )
+    threshold_mode = models.CharField(
+        max_length=10, choices=THRESHOLD_MODE_CHOICES, default="absolute"
+    )
+    yellow_threshold = models.FloatField(default=1000)
+    red_threshold = models.FloatField(default=5000)
+    # Used instead of the thresholds above in relative mode
+    yellow_db = models.FloatField(default=12)
+    red_db = models.FloatField(default=18)
+    # Learned background level of `alert_feature`, saved by the monitor so it
+    # survives restarts. Null until the device has been monitored.
+    noise_floor = models.FloatField(null=True, blank=True)
+    # Alerts clear below threshold * alert_hysteresis, so levels near a threshold don't flap
+    alert_hysteresis = models.FloatField(default=0.8)
+    # How long a level must hold above a threshold before the alert is raised
+    alert_sustain_ms = models.PositiveIntegerField(default=200)
+    # How long a level must stay below the exit threshold before the alert clears
+    alert_release_ms = models.PositiveIntegerField(default=1000)
+    # Minimum gap between the end of one recording and the start of the next
+    recording_cooldown_seconds = models.PositiveIntegerField(default=5)
+    # With a cry classifier configured, a RED alert only starts a recording when
+    # crying is at least this likely. 0 records every RED alert.
+    cry_confidence_threshold = models.FloatField(default=0.5)
+    # Seconds of A/V kept in memory so clips include what happened before the alert
+    pre_roll_seconds = models.PositiveIntegerField(default=5)
+    pre_roll_max_kb = models.PositiveIntegerField(default=8192)
+    # Disk space this device's clips may use, 0 falls back to RECORDINGS_DEVICE_MAX_MB
+    recording_quota_mb = models.PositiveIntegerField(default=0)
+    # Optional motion detection on a downscaled, low-fps copy of the video
+    motion_enabled = models.BooleanField(default=False)
+    # Percent of the watched pixels that must change between frames to raise an alert
+    motion_threshold = models.FloatField(default=2.0)
+    # [[x0, y0, x1, y1], ...] rectangles in fractions of the frame, empty watches it all
+    motion_regions = models.JSONField(default=list, blank=True)
     is_active = models.BooleanField(default=True)
     last_updated = models.DateTimeField(auto_now=True)
 
@@ -17,19 +71,125 @@ class MonitorDevice(models.Model):
         return self.name
 
 
+ALERT_LEVEL_CHOICES = [("NONE", "None"), ("YELLOW", "Yellow"), ("RED", "Red")]
+
+
 class AudioEvent(models.Model):
     device = models.ForeignKey(MonitorDevice, on_delete=models.CASCADE)
     timestamp = models.DateTimeField()
     peak_value = models.IntegerField()
-    alert_level = models.CharField(
-        max_length=10, choices=[("NONE", "None"), ("YELLOW", "Yellow"), ("RED", "Red")]
-    )
+    alert_level = models.CharField(max_length=10, choices=ALERT_LEVEL_CHOICES)
     recording_path = models.CharField(max_length=255, null=True, blank=True)
+    # Highest value of each feature over the event's interval
+    rms = models.FloatField(null=True, blank=True)
+    crest_factor = models.FloatField(null=True, blank=True)
+    zero_crossing_rate = models.FloatField(null=True, blank=True)
+    band_low = models.FloatField(null=True, blank=True)
+    band_mid = models.FloatField(null=True, blank=True)
+    band_high = models.FloatField(null=True, blank=True)
+    # Highest motion score over the interval, only set when motion detection is on
+    motion_score = models.FloatField(null=True, blank=True)
+    # What the cry classifier made of the interval, if a model is configured
+    sound_label = models.CharField(max_length=20, null=True, blank=True)
+    sound_confidence = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # History queries are always per device over a time range
+            models.Index(fields=["device", "timestamp"]),
+            # Retention pruning scans by age across all devices
+            models.Index(fields=["timestamp"]),
+        ]
 
     def __str__(self):
         return f"{self.device.name} - {self.alert_level} - {self.timestamp}"
 
 
+class AudioEventRollup(models.Model):
+    """Per-device aggregate of the AudioEvents in one time bucket"""
+
+    device = models.ForeignKey(MonitorDevice, on_delete=models.CASCADE)
+    bucket = models.DateTimeField()  # Start of the minute/hour
+    max_peak = models.IntegerField(default=0)
+    yellow_count = models.IntegerField(default=0)
+    red_count = models.IntegerField(default=0)
+    loud_seconds = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device", "bucket"], name="%(class)s_device_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.device.name} - {self.bucket}"
+
+
+class AudioEventMinuteRollup(AudioEventRollup):
+    pass
+
+
+class AudioEventHourRollup(AudioEventRollup):
+    pass
+
+
+class Recording(models.Model):
+    """A recorded clip: an HLS playlist of fMP4 segments under RECORDINGS_ROOT.
+
+    AudioEvents saved while the clip was recording share its `path` in their
+    `recording_path`, and fall inside the segment covering their timestamp.
+    """
+
+    device = models.ForeignKey(
+        MonitorDevice, on_delete=models.CASCADE, related_name="recordings"
+    )
+    # The clip's playlist, relative to RECORDINGS_ROOT
+    path = models.CharField(max_length=255, unique=True)
+    started_at = models.DateTimeField()  # Includes the pre-roll
+    ended_at = models.DateTimeField()
+    duration = models.FloatField()  # seconds
+    size_bytes = models.BigIntegerField(default=0)
+    # Previews written next to the playlist once the clip is finished
+    has_poster = models.BooleanField(default=False)
+    has_waveform = models.BooleanField(default=False)
+    # Loudest moment of the clip, the storage manager evicts the least important clips first
+    max_peak = models.IntegerField(default=0)
+    max_alert = models.CharField(
+        max_length=10, choices=ALERT_LEVEL_CHOICES, default="NONE"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["device", "started_at"])]
+
+    def __str__(self):
+        return f"{self.device.name} - {self.started_at}"
+
+
+class RecordingSegment(models.Model):
+    recording = models.ForeignKey(
+        Recording, on_delete=models.CASCADE, related_name="segments"
+    )
+    sequence = models.PositiveIntegerField()
+    uri = models.CharField(max_length=255)  # Relative to the playlist
+    started_at = models.DateTimeField()
+    offset = models.FloatField()  # seconds from the start of the recording
+    duration = models.FloatField()  # seconds
+    size_bytes = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["recording", "sequence"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recording", "sequence"], name="recordingsegment_sequence"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recording} - {self.sequence}"
+
+
 class ChatRoom(models.Model):
     name = models.CharField(max_length=255, unique=True)
 
@@ -42,5 +202,9 @@ class ChatMessage(models.Model):
         max_length=255
     )  # TODO enforce username length on the frontend
 
+    class Meta:
+        # Chat history is paged newest-first by id within a room
+        indexes = [models.Index(fields=["room", "id"])]
+
     def __str__(self):
         return f"{self.user} - {self.timestamp}"
@@ -2,6 +2,9 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
+    re_path(r"ws/monitor/$", consumers.MonitorConsumer.as_asgi()),
     re_path(r"ws/monitor/(?P<device_id>\w+)/$", consumers.MonitorConsumer.as_asgi()),
+    re_path(r"ws/audio/(?P<device_id>\w+)/$", consumers.AudioRelayConsumer.as_asgi()),
+    re_path(r"ws/dashboard/$", consumers.DashboardConsumer.as_asgi()),
     re_path(r"ws/chat/(?P<room_name>\w+)/$", consumers.ChatConsumer.as_asgi()),
 ]
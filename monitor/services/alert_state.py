@@ -0,0 +1,84 @@
+from typing import Optional
+
+ALERT_LEVELS = ("NONE", "YELLOW", "RED")
+SEVERITY = {level: i for i, level in enumerate(ALERT_LEVELS)}
+
+
+class AlertStateMachine:
+    """Per-device alert level with hysteresis, sustain and release times.
+
+    * Escalating to YELLOW/RED needs the level to stay at or above that alert's
+      enter threshold for `sustain` seconds, so a single loud chunk (a click or
+      a door slam) doesn't raise an alert.
+    * De-escalating needs the level to stay below the exit threshold, which is
+      `hysteresis` times the enter threshold, for `release` seconds, so a level
+      hovering around a threshold doesn't flap between states.
+
+    Pure state: feed it one value per chunk with the stream time and read the
+    returned level. Nothing here touches ffmpeg, the DB or the channel layer.
+    """
+
+    def __init__(
+        self,
+        yellow_threshold: float,
+        red_threshold: float,
+        hysteresis: float = 0.8,
+        sustain: float = 0.2,
+        release: float = 1.0,
+    ):
+        self.state = "NONE"
+        # When the level first reached each alert's enter threshold, None if it isn't there
+        self.above_since: dict[str, Optional[float]] = {"YELLOW": None, "RED": None}
+        # When the level first dropped below the current state's exit threshold
+        self.below_since: Optional[float] = None
+        self.configure(yellow_threshold, red_threshold, hysteresis, sustain, release)
+
+    def configure(
+        self,
+        yellow_threshold: float,
+        red_threshold: float,
+        hysteresis: float = 0.8,
+        sustain: float = 0.2,
+        release: float = 1.0,
+    ):
+        """Change thresholds and timings without resetting the current state"""
+        self.enter = {"YELLOW": yellow_threshold, "RED": red_threshold}
+        self.exit = {level: value * hysteresis for level, value in self.enter.items()}
+        self.sustain = sustain
+        self.release = release
+
+    def update(self, level: float, now: float) -> str:
+        """Feed the latest chunk's level at stream time `now`, returns the alert state"""
+        for alert in ("YELLOW", "RED"):
+            if level >= self.enter[alert]:
+                if self.above_since[alert] is None:
+                    self.above_since[alert] = now
+            else:
+                self.above_since[alert] = None
+
+        # Escalate to the most severe alert that has been sustained long enough
+        for alert in ("RED", "YELLOW"):
+            since = self.above_since[alert]
+            if SEVERITY[alert] <= SEVERITY[self.state] or since is None:
+                continue
+            if now - since >= self.sustain:
+                self.state = alert
+                self.below_since = None
+                return self.state
+
+        if self.state == "NONE":
+            return self.state
+
+        # Release one step at a time once the level has stayed below the exit threshold
+        if level >= self.exit[self.state]:
+            self.below_since = None
+        elif self.below_since is None:
+            self.below_since = now
+        elif now - self.below_since >= self.release:
+            if self.state == "RED" and level >= self.exit["YELLOW"]:
+                self.state = "YELLOW"
+            else:
+                self.state = "NONE"
+            self.below_since = None
+
+        return self.state
@@ -0,0 +1,577 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..models import MonitorDevice
+from .audio_monitor import AudioMonitorService
+from .audio_relay import LISTENER_CHECK_INTERVAL, listening_devices, relay_group_name
+from .batch import MAX_WAIT_CHUNKS, BatchAnalyzer
+from .connection_state import (
+    CONNECTING,
+    RECONNECTING,
+    STOPPED,
+    connection_message,
+    save_connection_state,
+)
+from .device_config import get_device
+from .ingest import AV_READ_SIZE, WATCHDOG_INTERVAL, StreamIngest
+from .level_stream import get_level_stream
+from .metrics import BROADCAST_SECONDS, FFMPEG_RESTARTS
+from .noise_floor import store_noise_floor
+from .recorder import ClipRecorder
+from .runner import (
+    HEALTHY_RUN_SECONDS,
+    RESTART_BACKOFF_MAX,
+    RESTART_BACKOFF_MIN,
+    restart_delay,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_THREADS = 2
+PUBLISH_QUEUE_SIZE = 1000
+# A/V a clip's remuxer may fall behind by, on top of its pre-roll, before the
+# clip is ended rather than buffered without limit
+RECORDER_BACKLOG_BYTES = 8 * 1024 * 1024
+RECORDER_CLOSE_TIMEOUT = 5  # seconds
+
+
+class AsyncStreamIngest(StreamIngest):
+    """`StreamIngest` driven by the event loop instead of blocking reads and a pump thread"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_process: Optional[asyncio.subprocess.Process] = None
+        self.av_task: Optional[asyncio.Task] = None
+        self.watch_tasks: list[asyncio.Task] = []
+        self.stdout: Optional[asyncio.StreamReader] = None
+
+    async def start(self) -> asyncio.StreamReader:
+        """Start the ingest process and return its PCM audio stream"""
+        read_fds, write_fds = self.open_pipes()
+        command = self.build_command(*write_fds)
+        logger.info(f"Starting ingest for {self.device.name}: {' '.join(command)}")
+
+        try:
+            self.async_process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                pass_fds=write_fds,
+            )
+        except Exception:
+            for fd in read_fds:
+                os.close(fd)
+            raise
+        finally:
+            for fd in write_fds:
+                os.close(fd)
+
+        if self.async_process.stdout is None:
+            raise RuntimeError("Failed to capture ffmpeg stdout.")
+
+        self.av_task = asyncio.create_task(self._pump_av_feed_async(read_fds[0]))
+        self.last_data = time.monotonic()
+        self.watch_tasks = [
+            asyncio.create_task(self._drain_stderr_async(self.async_process)),
+            asyncio.create_task(self._watch_async(self.async_process)),
+        ]
+        if len(read_fds) > 1:
+            self.watch_tasks.append(
+                asyncio.create_task(self._pump_video_frames_async(read_fds[1]))
+            )
+        self.stdout = self.async_process.stdout
+        return self.stdout
+
+    async def read_chunk(self, size: int) -> bytes:
+        """Exactly `size` bytes of PCM. Raises IncompleteReadError once ffmpeg exits"""
+        data = await self.stdout.readexactly(size)
+        self.last_data = time.monotonic()
+        return data
+
+    async def _drain_stderr_async(self, process: asyncio.subprocess.Process):
+        if process.stderr is None:
+            return
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                break
+            self.log_stderr(line.decode(errors="replace"))
+
+    async def _watch_async(self, process: asyncio.subprocess.Process):
+        while process.returncode is None:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            if process.returncode is None and self.check_stalled(time.monotonic()):
+                process.kill()
+                return
+
+    async def _pump_av_feed_async(self, fd: int):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=AV_READ_SIZE * 4)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+        )
+        try:
+            while True:
+                data = await reader.read(AV_READ_SIZE)
+                if not data:
+                    break
+                self.forward_av(data)
+        finally:
+            transport.close()
+        logger.info(f"A/V feed closed for {self.device.name}")
+
+    async def _pump_video_frames_async(self, fd: int):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=self.frame_bytes * 4)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+        )
+        try:
+            while True:
+                try:
+                    frame = await reader.readexactly(self.frame_bytes)
+                except asyncio.IncompleteReadError:
+                    break
+                self.forward_frame(frame)
+        finally:
+            transport.close()
+        logger.info(f"Video frames closed for {self.device.name}")
+
+    async def stop(self):
+        """Stop the ingest process"""
+        process, self.async_process = self.async_process, None
+        if process is not None and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+
+        av_task, self.av_task = self.av_task, None
+        if av_task is not None:
+            try:
+                await asyncio.wait_for(av_task, timeout=2)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+
+        for task in self.watch_tasks:
+            task.cancel()
+        self.watch_tasks = []
+
+
+class AsyncClipRecorder(ClipRecorder):
+    """`ClipRecorder` that never blocks the event loop.
+
+    `start()` and `feed()` only queue data. Each clip gets a writer task that
+    starts its remuxer with asyncio.create_subprocess_exec and writes the
+    pre-roll and every later chunk with `await stdin.drain()`, so a clip start
+    or a slow remuxer holds up that clip alone, not every device on the loop.
+    A clip whose remuxer falls more than RECORDER_BACKLOG_BYTES behind is ended.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queue: Optional[asyncio.Queue] = None
+        self.queued = 0
+        self.max_queued = self.pre_roll.max_bytes + RECORDER_BACKLOG_BYTES
+        self.writers: set[asyncio.Task] = set()
+
+    @property
+    def recording(self) -> bool:
+        return self.queue is not None
+
+    def start(self, path: str, info: Optional[dict] = None) -> bool:
+        """Queue a new clip, its remuxer is started by the clip's writer task"""
+        if self.queue is not None:
+            return True
+        self.path = path
+        self.info = info if info is not None else {}
+        self.started_at, pre_roll = self.take_pre_roll()
+        self.queue = asyncio.Queue()
+        self.queued = 0
+        for chunk in pre_roll:
+            self.queue.put_nowait(chunk)
+            self.queued += len(chunk)
+        writer = asyncio.create_task(
+            self._write(self.queue, path, self.started_at, self.info)
+        )
+        self.writers.add(writer)
+        writer.add_done_callback(self.writers.discard)
+        logger.info(f"Started recording to {path} with {self.queued} bytes of pre-roll")
+        return True
+
+    def feed(self, data: bytes):
+        """Called by the ingest for every chunk of the A/V feed"""
+        if self.queue is None:
+            self.pre_roll.append(data)
+            return
+        if self.queued + len(data) > self.max_queued:
+            logger.error(f"Recorder for {self.device_name} can't keep up, ending clip")
+            self.stop()
+            self.pre_roll.append(data)
+            return
+        self.queue.put_nowait(data)
+        self.queued += len(data)
+
+    def stop(self):
+        """Finish the current clip once its writer has written what is queued"""
+        if self.queue is None:
+            return
+        self.queue.put_nowait(None)
+        self.queue = None
+        self._detach()
+        logger.info("Stopped recording")
+
+    async def close(self):
+        """Wait for clips still being written, e.g. before the engine shuts down"""
+        if self.writers:
+            await asyncio.wait(self.writers, timeout=RECORDER_CLOSE_TIMEOUT)
+
+    async def _write(
+        self, queue: asyncio.Queue, path: str, started_at: datetime, info: dict
+    ):
+        process: Optional[asyncio.subprocess.Process] = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *await asyncio.to_thread(self.command, path),
+                stdin=asyncio.subprocess.PIPE,
+            )
+        except Exception as e:
+            logger.error(f"Failed to start recording: {e}")
+
+        # Keep taking chunks after a failure so the queue never grows unread
+        accepting = process is not None and process.stdin is not None
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if queue is self.queue:
+                self.queued -= len(chunk)
+            if not accepting:
+                continue
+            try:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                logger.error(
+                    f"Recorder for {self.device_name} stopped accepting data: {e}"
+                )
+                accepting = False
+        if process is None:
+            return
+
+        ended_at = datetime.now(timezone.utc)
+        try:
+            # Closing stdin lets ffmpeg flush the last segment and end the playlist
+            if process.stdin is not None:
+                process.stdin.close()
+            await asyncio.wait_for(process.wait(), timeout=RECORDER_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error stopping recording: {e}")
+            process.kill()
+            await process.wait()
+            return
+
+        if process.returncode != 0:
+            logger.error(
+                f"Recorder for {self.device_name} exited with {process.returncode}"
+            )
+        elif self.on_complete:
+            try:
+                # Indexing the clip queries the DB
+                await asyncio.to_thread(
+                    self.on_complete, path, started_at, ended_at, info
+                )
+            except Exception as e:
+                logger.error(f"Error handling finished recording {path}: {e}")
+
+
+class AsyncDeviceMonitor(AudioMonitorService):
+    """Runs the regular detection logic for one device inside the engine's event loop.
+
+    Blocking side effects are handed off: events go to the write-behind event
+    sink, level broadcasts to the engine's publisher task and clips to
+    `AsyncClipRecorder`'s writer tasks.
+    """
+
+    recorder_class = AsyncClipRecorder
+
+    def __init__(self, engine: "AsyncMonitorEngine", device: MonitorDevice):
+        super().__init__(device)
+        self.engine = engine
+        self.ingest: Optional[AsyncStreamIngest] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # The engine polls every device's listeners at once, see relay_listeners()
+        self.relay.poll_listeners = False
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.ingest = AsyncStreamIngest(
+            self.device, self.RATE, self.recorder.feed, self.process_frame
+        )
+        self.reset_motion()
+        await self.ingest.start()
+        chunk_bytes = len(self.chunk_view)
+        batch = self.engine.batch_analyzer(self)
+        slot = None
+
+        logger.info(f"Started monitoring for {self.device.name}")
+        try:
+            while self.running:
+                read_start = time.perf_counter()
+                try:
+                    data = await self.ingest.read_chunk(chunk_bytes)
+                except asyncio.IncompleteReadError:
+                    break
+                process_start = time.perf_counter()
+                self.read_metric.observe(process_start - read_start)
+                if not self.connected:
+                    self.mark_connected()
+                self.chunk_view[:] = data
+                self.frames_consumed += self.CHUNK_FRAMES
+                features = None
+                if batch is not None:
+                    if slot is None:
+                        # Only once audio flows, a connecting camera never holds up a tick
+                        slot = batch.register(self.device.id)
+                    # Includes waiting for the rest of the tick
+                    features = await batch.analyze(slot, self.audio_buffer)
+                self.process_chunk(self.audio_buffer, self.stream_time, features)
+                self.processing_metric.observe(time.perf_counter() - process_start)
+                self.chunks_metric.inc()
+        finally:
+            if batch is not None:
+                batch.unregister(self.device.id)
+            if self.recording:
+                self.stop_recording()
+            await self.recorder.close()
+            self.save_noise_floor()
+            self.disconnect_reason = self.ingest.disconnect_reason()
+            await self.ingest.stop()
+            self.level_stream.remove(self.device.id)
+            self.running = False
+
+    def broadcast_level(self, peak, alert_level, features=None):
+        self.engine.publish(
+            self.group_name, self.level_message(peak, alert_level, features)
+        )
+
+    def store_noise_floor(self, floor: Optional[float]):
+        self.engine.submit_db(store_noise_floor, self.device.id, floor)
+
+    def publish_audio(self, message):
+        self.engine.publish(relay_group_name(self.device.id), message, "audio_packet")
+
+    def publish_connection_state(self, state: str, **details):
+        self.engine.report_connection(self.device.id, state, **details)
+
+    def publish_recording(self, message):
+        # Called from the recorder's finalize thread, so hop onto the engine's loop
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(
+                self.engine.publish,
+                self.recordings_group_name,
+                message,
+                "recording_ready",
+            )
+
+
+class AsyncMonitorEngine:
+    """Watches many devices from a single event loop.
+
+    Every device's ingest, detection and recording control run as tasks on one
+    loop. The only threads are a small pool for ORM lookups and the event sink's
+    writer, so a single process can handle dozens of cameras. With
+    MONITOR_BATCH_ANALYSIS on, their chunks are also analyzed together, one
+    vectorized call per tick.
+    """
+
+    def __init__(self, db_threads: int = DB_THREADS):
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=db_threads, thread_name_prefix="monitor-db"
+        )
+        self.publish_queue: asyncio.Queue = asyncio.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self.tasks: dict[int, asyncio.Task] = {}
+        self.monitors: dict[int, AsyncDeviceMonitor] = {}
+        self.publisher_task: Optional[asyncio.Task] = None
+        self.level_task: Optional[asyncio.Task] = None
+        self.relay_task: Optional[asyncio.Task] = None
+        self.batch: Optional[BatchAnalyzer] = None
+
+    def batch_analyzer(self, monitor: AsyncDeviceMonitor) -> Optional[BatchAnalyzer]:
+        """The shared analyzer if MONITOR_BATCH_ANALYSIS is on, else None"""
+        if not settings.MONITOR_BATCH_ANALYSIS:
+            return None
+        if self.batch is None:
+            self.batch = BatchAnalyzer(
+                monitor.RATE,
+                monitor.CHUNK_FRAMES,
+                max_wait=monitor.CHUNK_MS / 1000 * MAX_WAIT_CHUNKS,
+            )
+        return self.batch
+
+    def submit_db(self, fn, *args, **kwargs) -> Future:
+        """Run an ORM call on the DB thread pool without waiting for it"""
+
+        def call():
+            close_old_connections()
+            return fn(*args, **kwargs)
+
+        future = self.db_executor.submit(call)
+        future.add_done_callback(_log_db_error)
+        return future
+
+    async def run_db(self, fn, *args, **kwargs):
+        """Run an ORM call on the DB thread pool and await the result"""
+        return await asyncio.wrap_future(self.submit_db(fn, *args, **kwargs))
+
+    def report_connection(self, device_id: int, state: str, **details):
+        """Record a device's connection state and send it to its monitor sockets"""
+        message = connection_message(device_id, state, **details)
+        self.submit_db(save_connection_state, message)
+        self.publish(f"monitor_{device_id}", message)
+
+    def publish(
+        self, group_name: str, message: dict, event_type: str = "monitor_message"
+    ):
+        try:
+            self.publish_queue.put_nowait((group_name, event_type, message))
+        except asyncio.QueueFull:
+            logger.warning(f"Publish queue full, dropping message for {group_name}")
+
+    async def publisher(self):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("No channel layer available!")
+            return
+        while True:
+            group_name, event_type, message = await self.publish_queue.get()
+            try:
+                started = time.perf_counter()
+                await channel_layer.group_send(
+                    group_name, {"type": event_type, "message": message}
+                )
+                if event_type == "monitor_message":
+                    BROADCAST_SECONDS.labels(message["device_id"]).observe(
+                        time.perf_counter() - started
+                    )
+            except Exception as e:
+                logger.error(f"Error broadcasting level: {e}", exc_info=True)
+
+    async def relay_listeners(self):
+        """Turn each device's audio relay on or off, one cache lookup for all of them"""
+        while True:
+            await asyncio.sleep(LISTENER_CHECK_INTERVAL)
+            monitors = dict(self.monitors)
+            if not monitors:
+                continue
+            try:
+                listening = await self.run_db(listening_devices, list(monitors))
+            except Exception as e:
+                logger.error(f"Error checking audio listeners: {e}")
+                continue
+            for device_id, monitor in monitors.items():
+                monitor.relay.set_listening(device_id in listening)
+
+    def start_device(self, device_id: int):
+        task = self.tasks.get(device_id)
+        if task is not None and not task.done():
+            return
+        self.tasks[device_id] = asyncio.create_task(self.run_device(device_id))
+
+    async def stop_device(self, device_id: int):
+        task = self.tasks.pop(device_id, None)
+        monitor = self.monitors.pop(device_id, None)
+        if monitor is not None:
+            monitor.running = False
+            if monitor.ingest is not None:
+                await monitor.ingest.stop()
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self.report_connection(device_id, STOPPED)
+
+    async def reload_device(self, device_id: int):
+        """Hand a device's latest config to its running monitor"""
+        monitor = self.monitors.get(device_id)
+        if monitor is None:
+            return
+        try:
+            monitor.reload_device(await self.run_db(get_device, device_id))
+        except Exception as e:
+            logger.error(f"Couldn't reload config for device {device_id}: {e}")
+
+    async def run_device(self, device_id: int):
+        """Keep one device's monitor running, restarting it with backoff"""
+        loop = asyncio.get_running_loop()
+        backoff = RESTART_BACKOFF_MIN
+        while True:
+            started_at = loop.time()
+            reason = None
+            try:
+                device = await self.run_db(get_device, device_id, credentials=True)
+                monitor = AsyncDeviceMonitor(self, device)
+                monitor.running = True
+                self.monitors[device_id] = monitor
+                self.report_connection(device_id, CONNECTING)
+                await monitor.run()
+                reason = monitor.disconnect_reason
+            except MonitorDevice.DoesNotExist:
+                logger.error(f"Device {device_id} no longer exists, giving up")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Monitor for device {device_id} crashed: {e}")
+                reason = str(e)
+            finally:
+                self.monitors.pop(device_id, None)
+
+            # stop_device() ended the monitor on purpose
+            if device_id not in self.tasks:
+                return
+            FFMPEG_RESTARTS.labels(device_id).inc()
+            if loop.time() - started_at >= HEALTHY_RUN_SECONDS:
+                backoff = RESTART_BACKOFF_MIN
+            delay = restart_delay(backoff)
+            logger.warning(
+                f"Reader for device {device_id} exited ({reason}), "
+                f"restarting in {delay:.1f}s"
+            )
+            self.report_connection(
+                device_id, RECONNECTING, reason=reason, retry_in=round(delay, 1)
+            )
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    async def start(self):
+        self.publisher_task = asyncio.create_task(self.publisher())
+        self.level_task = asyncio.create_task(get_level_stream().run())
+        self.relay_task = asyncio.create_task(self.relay_listeners())
+
+    async def shutdown(self):
+        for device_id in list(self.tasks):
+            await self.stop_device(device_id)
+        for task in (self.publisher_task, self.level_task, self.relay_task):
+            if task is not None:
+                task.cancel()
+        self.db_executor.shutdown(wait=True)
+
+
+def _log_db_error(future: Future):
+    exception = future.exception()
+    if exception is not None:
+        logger.error(f"Database write failed: {exception}")
@@ -1,15 +1,45 @@
-import queue
-import subprocess
 import numpy as np
 import logging
+import math
 import threading
 import time
 from datetime import datetime
+from typing import Optional
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from ..models import MonitorDevice, AudioEvent
-
-WAV_HEADER_LENGTH = 44
+from ..models import MonitorDevice, AudioEvent, Recording
+from .alert_state import SEVERITY, AlertStateMachine
+from .audio_relay import AudioRelay, get_relay_publisher
+from .classifier import Classification, get_classifier
+from .connection_state import CONNECTED, publish_connection_state
+from .device_config import get_device
+from .event_sink import get_event_sink
+from .features import FeatureExtractor
+from .level_stream import get_level_stream
+from .metrics import (
+    ACTIVE_RECORDINGS,
+    BROADCAST_SECONDS,
+    CHUNK_PROCESSING_SECONDS,
+    CHUNK_READ_SECONDS,
+    CHUNKS_PROCESSED,
+    CLASSIFICATION_SECONDS,
+    PIPE_BACKLOG_BYTES,
+    RECORDINGS_GATED,
+)
+from .motion import MotionDetector
+from .noise_floor import ALERT_STEP_SCALE, NoiseFloor, store_noise_floor_in_thread
+from .previews import schedule_previews
+from .recorder import ClipRecorder
+from .recordings import (
+    index_recording,
+    new_playlist_path,
+    relative_recording_path,
+    resolve_recording_path,
+)
+from .sources import AudioSource, LiveStreamSource
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,302 +47,624 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S.%f",  # Include milliseconds
 )
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)  # Ensure DEBUG level is enabled
 
 
 class AudioMonitorService:
     _instances = {}
+    # Writes clips from the ingest's A/V feed, the asyncio engine swaps in its own
+    recorder_class = ClipRecorder
 
     @classmethod
     def get_monitor(cls, device_id):
         if device_id not in cls._instances:
-            device = MonitorDevice.objects.get(id=device_id)
+            device = get_device(device_id, credentials=True)
             cls._instances[device_id] = cls(device)
         return cls._instances[device_id]
 
-    def __init__(self, device: MonitorDevice):
+    def __init__(self, device: MonitorDevice, source: Optional[AudioSource] = None):
         self.device = device
+        # Where PCM comes from. Defaults to a fresh live ingest each time monitoring starts
+        self.source = source
+        self.active_source: Optional[AudioSource] = None
         self.running = False
+        # Set once the first chunk arrives, and why the stream ended once it has
+        self.connected = False
+        self.disconnect_reason: Optional[str] = None
         self.thread = None
         self.channel_layer = get_channel_layer()
 
-        # Audio processing & recording settings
-        self.CHUNK = 4096
+        # Audio processing & recording settings.
+        # All durations are measured on the sample clock (frames consumed / RATE),
+        # not wall time, so detection doesn't depend on how the pipe is scheduled.
         self.RATE = 48000
+        self.CHUNK_MS = 40
+        self.CHUNK_FRAMES = self.RATE * self.CHUNK_MS // 1000
         self.MIN_RECORDING_DURATION = 1  # seconds
         self.MAX_RECORDING_DURATION = 5  # seconds
         self.QUIET_PERIOD_THRESHOLD = 3  # seconds
-        self.BROADCAST_INTERVAL = 0.5  # seconds, minimum time between broadcasts
-        self.last_broadcast_time = 0
+        # How often relative thresholds follow the noise floor, and it is saved
+        self.FLOOR_REFRESH_INTERVAL = 1  # seconds
+        self.FLOOR_SAVE_INTERVAL = 60  # seconds
+        # The cry classifier looks at the last second of audio, at most twice a second
+        self.CLASSIFY_CHUNKS = 1000 // self.CHUNK_MS
+        self.CLASSIFY_INTERVAL = 0.5  # seconds
+        # Motion raises YELLOW once two frames in a row score above the device's
+        # threshold, and clears after a few seconds of stillness
+        self.MOTION_SUSTAIN = 1 / settings.MOTION_FPS  # seconds
+        self.MOTION_RELEASE = 3  # seconds
+        # A score older than a few frame periods means the video stopped, e.g. its
+        # pipe hit EOF while audio kept flowing, and counts as no motion
+        self.MOTION_STALE_AFTER = 3 / settings.MOTION_FPS  # seconds
+        self.BROADCAST_INTERVAL = settings.MONITOR_BROADCAST_INTERVAL  # seconds, minimum time between broadcasts
+        self.last_broadcast_time = 0.0
         self.current_max_peak = 0  # Track max peak during broadcast interval
         self.current_max_alert = "NONE"  # Track highest alert level during interval
+        self.current_max_features = {}  # Track max of each feature during interval
         self.recording = False
         self.current_recording_path = None
         self.recording_start_time = None
         self.last_alert_time = None
         self.quiet_period_start = None
+        self.last_recording_stop = None
+        # Loudest moment of the current clip, used to rank clips for eviction
+        self.clip_stats = {"max_peak": 0, "max_alert": "NONE"}
+        # Background level of the alert feature, carried over from the last run
+        self.noise_floor = NoiseFloor(initial=device.noise_floor)
+        self.last_floor_refresh = -math.inf  # Refreshed on the first chunk
+        self.last_floor_save = 0.0
+        self.alert_state = AlertStateMachine(
+            *self.alert_thresholds(device),
+            hysteresis=device.alert_hysteresis,
+            sustain=device.alert_sustain_ms / 1000,
+            release=device.alert_release_ms / 1000,
+        )
+        self.motion = MotionDetector(regions=device.motion_regions)
+        # Score of the latest video frame and its time.monotonic() arrival,
+        # written by the ingest's video reader
+        self.motion_score = 0.0
+        self.motion_scored_at = -math.inf
+        self.motion_state = AlertStateMachine(
+            device.motion_threshold,
+            math.inf,  # Motion alone never raises RED
+            sustain=self.MOTION_SUSTAIN,
+            release=self.MOTION_RELEASE,
+        )
+        # Config saved while running, applied by the audio thread before its next chunk
+        self.pending_device: Optional[MonitorDevice] = None
         self.recording_lock = threading.Lock()
-        self.event_queue = queue.Queue()
-        self.recording_process = None
-
-    def start_ffmpeg(self):
-        """Start FFmpeg process for audio stream"""
-        command = [
-            "ffmpeg",
-            "-loglevel",
-            "error",  # Only show errors
-            "-i",
-            self.device.stream_url,
-            "-vn",  # Skip video
-            "-acodec",
-            "pcm_s16le",
-            "-ar",
-            str(self.RATE),
-            "-ac",
-            "1",
-            "-f",
-            "wav",
-            "pipe:1",  # Output to stdout
-        ]
-
-        if self.device.username and self.device.password:
-            import base64
-
-            auth = base64.b64encode(
-                f"{self.device.username}:{self.device.password}".encode()
-            ).decode()
-            command.insert(1, "-headers")
-            command.insert(2, f"Authorization: Basic {auth}\r\n")
-
-        logger.info(f"Starting FFmpeg with command: {' '.join(command)}")
-        return subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=10**8
+        self.event_sink = get_event_sink()
+        # Live meter levels go out on the shared level stream, independent of alerts
+        self.level_stream = get_level_stream()
+        # Parents listening in get this device's audio from here, not the camera
+        self.relay = AudioRelay(device.id, self.RATE, self.publish_audio)
+        self.relay_publisher = get_relay_publisher()
+        self.recorder = self.recorder_class(
+            device.name,
+            pre_roll_seconds=device.pre_roll_seconds,
+            pre_roll_max_bytes=device.pre_roll_max_kb * 1024,
+            segment_seconds=settings.RECORDING_SEGMENT_SECONDS,
+            on_complete=self.recording_ready,
         )
 
+        # Chunks are read straight into this buffer, which is reused for every chunk
+        self.audio_buffer = np.empty(self.CHUNK_FRAMES, dtype=np.int16)
+        self.chunk_view = memoryview(self.audio_buffer).cast("B")
+        self.feature_extractor = FeatureExtractor(self.RATE, self.CHUNK_FRAMES)
+        self.frames_consumed = 0
+
+        # Loaded once per process. Its window is a ring of the latest chunks,
+        # only kept when there is a classifier to look at it.
+        self.classifier = get_classifier()
+        classifier = self.classifier
+        if classifier is not None and (
+            classifier.rate != self.RATE or classifier.frame != self.CHUNK_FRAMES
+        ):
+            logger.error(
+                f"Cry model expects {classifier.frame}-sample chunks at "
+                f"{classifier.rate} Hz, not classifying {device.name}"
+            )
+            self.classifier = None
+        self.recent_audio = None
+        if self.classifier is not None:
+            self.recent_audio = np.zeros(
+                (self.CLASSIFY_CHUNKS, self.CHUNK_FRAMES), dtype=np.int16
+            )
+        self.last_classification: Optional[Classification] = None
+        self.last_classified_at = -math.inf
+        # Latest classification in the current broadcast interval
+        self.current_classification: Optional[Classification] = None
+
+        # This device's metric series, looked up once rather than per chunk
+        self.chunks_metric = CHUNKS_PROCESSED.labels(device.id)
+        self.read_metric = CHUNK_READ_SECONDS.labels(device.id)
+        self.processing_metric = CHUNK_PROCESSING_SECONDS.labels(device.id)
+        self.classification_metric = CLASSIFICATION_SECONDS.labels(device.id)
+        self.gated_metric = RECORDINGS_GATED.labels(device.id)
+        self.backlog_metric = PIPE_BACKLOG_BYTES.labels(device.id)
+        self.broadcast_metric = BROADCAST_SECONDS.labels(device.id)
+        self.recording_metric = ACTIVE_RECORDINGS.labels(device.id)
+
     def start_recording(self):
         """Start recording video and audio"""
-        if self.recording:
-            return
-
-        self.recording = True
-        self.recording_start_time = time.time()
-        self.last_alert_time = time.time()
-        self.quiet_period_start = None
+        # stop() may finish a clip from another thread while the audio thread runs
+        with self.recording_lock:
+            if self.recording:
+                return
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.current_recording_path = f"recordings/{self.device.name}_{timestamp}.mp4"
+            self.recording = True
+            self.recording_start_time = self.stream_time
+            self.last_alert_time = self.stream_time
+            self.quiet_period_start = None
 
-        command = [
-            "ffmpeg",
-            "-y",  # Overwrite output files without asking
-        ]
+            # Relative to RECORDINGS_ROOT, which is also how AudioEvents and the index refer to it
+            self.current_recording_path = new_playlist_path(
+                self.device.name, datetime.now()
+            )
 
-        if self.device.is_authenticated:
-            if not self.device.username or not self.device.password:
-                logger.error(
-                    f"Device {self.device.name} is marked as authenticated but missing credentials"
-                )
+            # The clip is cut from the ingest's A/V feed, so no new camera connection is made
+            playlist = resolve_recording_path(self.current_recording_path)
+            self.clip_stats = {"max_peak": 0, "max_alert": "NONE"}
+            if not self.recorder.start(playlist, self.clip_stats):
                 self.recording = False
+                self.current_recording_path = None
                 return
-            import base64
-
-            auth = base64.b64encode(
-                f"{self.device.username}:{self.device.password}".encode()
-            ).decode()
-            command.extend(["-headers", f"Authorization: Basic {auth}\r\n"])
-
-        command.extend(
-            [
-                "-i",
-                self.device.stream_url,
-                "-c:v",
-                "copy",
-                "-c:a",
-                "aac",
-                "-strict",
-                "experimental",
-                "-f",
-                "mp4",
-                self.current_recording_path,
-            ]
-        )
-
-        try:
-            self.recording_process = subprocess.Popen(command)
-            logger.info(f"Started recording to {self.current_recording_path}")
-        except Exception as e:
-            logger.error(f"Failed to start recording: {e}")
-            self.recording = False
+            self.recording_metric.set(1)
 
     def stop_recording(self):
         """Stop current recording"""
-        if not self.recording:
-            return
+        with self.recording_lock:
+            if not self.recording:
+                return
 
-        try:
-            if self.recording_process:
-                self.recording_process.terminate()
-                self.recording_process.wait(timeout=2)
-                logger.info("Stopped recording")
-        except Exception as e:
-            logger.error(f"Error stopping recording: {e}")
-            if self.recording_process:
-                self.recording_process.kill()
-        finally:
-            self.recording = False
-            self.recording_process = None
-            self.current_recording_path = None
+            try:
+                self.recorder.stop()
+            except Exception as e:
+                logger.error(f"Error stopping recording: {e}")
+            finally:
+                self.recording = False
+                self.current_recording_path = None
+                self.last_recording_stop = self.stream_time
+                self.recording_metric.set(0)
+
+    @property
+    def stream_time(self) -> float:
+        """Seconds of audio consumed so far, the clock all timing decisions use"""
+        return self.frames_consumed / self.RATE
+
+    def read_chunk(self, source: AudioSource) -> bool:
+        """Fill the reusable chunk buffer from the source. Returns False on EOF"""
+        view = self.chunk_view
+        filled = 0
+        while filled < len(view):
+            n = source.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        self.frames_consumed += self.CHUNK_FRAMES
+        return True
 
     def process_audio(self):
-        ffmpeg_process = self.start_ffmpeg()
-        if ffmpeg_process.stdout is None:
-            raise RuntimeError("Failed to capture ffmpeg stdout.")
-        ffmpeg_process.stdout.read(WAV_HEADER_LENGTH)  # Skip WAV header
+        source = self.source or LiveStreamSource(
+            self.device, self.RATE, self.recorder.feed, self.process_frame
+        )
+        self.active_source = source
+        self.reset_motion()
+        source.open()
+        # Listener checks and packet sends happen on the publisher's thread
+        self.relay_publisher.register(self.relay)
 
         logger.info(f"Started monitoring for {self.device.name}")
-        logger.info(f"Yellow threshold: {self.device.yellow_threshold}")
-        logger.info(f"Red threshold: {self.device.red_threshold}")
+        yellow, red = self.alert_thresholds(self.device)
+        logger.info(f"Yellow threshold: {yellow:.0f} ({self.device.threshold_mode})")
+        logger.info(f"Red threshold: {red:.0f} ({self.device.threshold_mode})")
 
         try:
             while self.running:
-                audio_data = ffmpeg_process.stdout.read(self.CHUNK)
-                if not audio_data:
+                read_start = time.perf_counter()
+                if not self.read_chunk(source):
                     break
-
-                audio_array = np.frombuffer(audio_data, dtype=np.int16)
-                peak = int(np.max(np.abs(audio_array)))
-
-                # Determine alert level
-                alert_level = "NONE"
-                if peak >= self.device.red_threshold:
-                    alert_level = "RED"
-                    logger.warning(
-                        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} - RED ALERT - Loud noise detected! Peak: {peak}"
-                    )
-                    if not self.recording:
-                        self.start_recording()
-                    self.last_alert_time = time.time()
-                    self.quiet_period_start = None
-                elif peak >= self.device.yellow_threshold:
-                    alert_level = "YELLOW"
-                    logger.warning(
-                        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} - YELLOW ALERT - Moderate noise detected. Peak: {peak}"
-                    )
-                    self.last_alert_time = time.time()
-                    self.quiet_period_start = None
-
-                # Update max values for the current broadcast interval
-                if peak > self.current_max_peak:
-                    self.current_max_peak = peak
-                if alert_level in ["RED", "YELLOW"]:
-                    # Update to the highest severity alert level
-                    if alert_level == "RED" or (
-                        alert_level == "YELLOW" and self.current_max_alert == "NONE"
-                    ):
-                        self.current_max_alert = alert_level
-
-                # Check if it's time to broadcast
-                current_time = time.time()
-                if current_time - self.last_broadcast_time >= self.BROADCAST_INTERVAL:
-                    if self.current_max_alert != "NONE":
-                        # Save event with the max values from this interval
-                        AudioEvent.objects.create(
-                            device=self.device,
-                            peak_value=self.current_max_peak,
-                            alert_level=self.current_max_alert,
-                            timestamp=datetime.now(),
-                            recording_path=self.current_recording_path,
-                        )
-                        self.broadcast_level(
-                            self.current_max_peak, self.current_max_alert
-                        )
-                    # Reset max values for next interval
-                    self.current_max_peak = peak
-                    self.current_max_alert = alert_level
-
-                # Check recording status
-                if self.recording:
-                    current_time = time.time()
-                    if self.recording_start_time is None:
-                        recording_duration = 0
-                    else:
-                        recording_duration = current_time - self.recording_start_time
-
-                    # Start quiet period tracking if below yellow threshold
-                    if peak < self.device.yellow_threshold:
-                        if self.quiet_period_start is None:
-                            self.quiet_period_start = current_time
-                    else:
-                        self.quiet_period_start = None
-
-                    # Check if we should stop recording
-                    should_stop = False
-                    if recording_duration >= self.MAX_RECORDING_DURATION:
-                        logger.info("Max recording duration reached")
-                        should_stop = True
-                    elif recording_duration >= self.MIN_RECORDING_DURATION:
-                        if (
-                            self.quiet_period_start
-                            and (current_time - self.quiet_period_start)
-                            >= self.QUIET_PERIOD_THRESHOLD
-                        ):
-                            logger.info("Quiet period threshold reached")
-                            should_stop = True
-
-                    if should_stop:
-                        self.stop_recording()
-
-                time.sleep(0.01)  # Reduced sleep time
+                process_start = time.perf_counter()
+                self.read_metric.observe(process_start - read_start)
+                if not self.connected:
+                    self.mark_connected()
+                self.process_chunk(self.audio_buffer, self.stream_time)
+                self.processing_metric.observe(time.perf_counter() - process_start)
+                self.chunks_metric.inc()
 
         except Exception as e:
             logger.error(f"Error in audio processing: {e}")
+            self.disconnect_reason = str(e)
         finally:
             if self.recording:
                 self.stop_recording()
-            ffmpeg_process.terminate()
-            ffmpeg_process.wait()
+            self.save_noise_floor()
+            if self.disconnect_reason is None:
+                self.disconnect_reason = source.disconnect_reason()
+            source.close()
+            self.active_source = None
+            self.relay_publisher.unregister(self.relay)
+            self.level_stream.remove(self.device.id)
+            # Let start() (or the supervisor) bring the monitor back after an EOF
+            self.running = False
+
+    def mark_connected(self):
+        self.connected = True
+        logger.info(f"Receiving audio from {self.device.name}")
+        self.publish_connection_state(CONNECTED)
+
+    def publish_connection_state(self, state: str, **details):
+        publish_connection_state(self.device.id, state, **details)
+
+    def reload_device(self, device: MonitorDevice):
+        """Use `device`'s thresholds from the next chunk on. Safe to call from any thread"""
+        self.pending_device = device
+
+    def alert_thresholds(self, device: MonitorDevice) -> tuple[float, float]:
+        """Yellow and red thresholds, following the noise floor in relative mode"""
+        if device.threshold_mode == "relative" and self.noise_floor.value is not None:
+            return (
+                self.noise_floor.threshold(device.yellow_db),
+                self.noise_floor.threshold(device.red_db),
+            )
+        return device.yellow_threshold, device.red_threshold
 
-    def broadcast_level(self, peak, alert_level):
-        """Send audio level update via WebSocket"""
-        current_time = time.time()
-        if current_time - self.last_broadcast_time < self.BROADCAST_INTERVAL:
-            return  # Skip broadcasting if we've broadcast too recently
+    def apply_device(self, device: MonitorDevice):
+        if device.alert_feature != self.device.alert_feature:
+            self.reset_noise_floor()
+        self.device = device
+        self.alert_state.configure(
+            *self.alert_thresholds(device),
+            hysteresis=device.alert_hysteresis,
+            sustain=device.alert_sustain_ms / 1000,
+            release=device.alert_release_ms / 1000,
+        )
+        # Turning motion detection on or off changes the ffmpeg command, so that
+        # only takes effect when the reader next reconnects
+        self.motion.set_regions(device.motion_regions)
+        self.motion_state.configure(
+            device.motion_threshold,
+            math.inf,
+            sustain=self.MOTION_SUSTAIN,
+            release=self.MOTION_RELEASE,
+        )
+        yellow, red = self.alert_thresholds(device)
+        logger.info(
+            f"{device.name}: reloaded config, {device.alert_feature} thresholds "
+            f"{yellow:.0f}/{red:.0f}"
+        )
 
+    def process_frame(self, frame: bytes):
+        """Score one grayscale frame for motion. Called from the ingest's video reader"""
+        self.motion_score = self.motion.update(frame)
+        self.motion_scored_at = time.monotonic()
+
+    def reset_motion(self):
+        """Forget the previous frame and its score, e.g. before the reader reconnects"""
+        self.motion.reset()
+        self.motion_score = 0.0
+        self.motion_scored_at = -math.inf
+
+    def process_chunk(
+        self, samples: np.ndarray, now: float, features: Optional[dict] = None
+    ):
+        """Run level detection and recording logic on one chunk ending at `now` (stream time).
+
+        `features` can be passed in when the chunk was already analyzed in a batch.
+        """
+        pending = self.pending_device
+        if pending is not None:
+            self.pending_device = None
+            self.apply_device(pending)
+        if features is None:
+            features = self.feature_extractor.extract(samples)
+        if self.recent_audio is not None:
+            chunk_index = self.frames_consumed // self.CHUNK_FRAMES
+            self.recent_audio[chunk_index % self.CLASSIFY_CHUNKS] = samples
+        peak = int(features["peak"])
+        # Thresholds apply to the feature the device is configured to alert on
+        level = features[self.device.alert_feature]
+
+        # Determine alert level. The state machine only escalates on sustained
+        # levels and clears with hysteresis, so a single loud chunk is ignored.
+        previous_alert = self.alert_state.state
+        alert_level = self.alert_state.update(level, now)
+        if alert_level != previous_alert:
+            logger.warning(
+                f"{self.device.name}: {previous_alert} -> {alert_level} alert, {self.device.alert_feature}: {level:.0f}"
+            )
+        # Alerts slow the floor down rather than stop it, so a long cry doesn't
+        # become "normal" but a permanently louder room still does
+        self.noise_floor.update(level, ALERT_STEP_SCALE[alert_level])
+        if now - self.last_floor_refresh >= self.FLOOR_REFRESH_INTERVAL:
+            self.refresh_noise_floor(now)
+        if self.device.motion_enabled:
+            alert_level = self.process_motion(features, alert_level, now)
+
+        if alert_level != "NONE":
+            self.last_alert_time = now
+            self.quiet_period_start = None
+        if (
+            alert_level == "RED"
+            and not self.recording
+            and self.recording_allowed(now)
+            and self.sounds_like_crying(now)
+        ):
+            self.start_recording()
+        if self.recording:
+            stats = self.clip_stats
+            if peak > stats["max_peak"]:
+                stats["max_peak"] = peak
+            if SEVERITY[alert_level] > SEVERITY[stats["max_alert"]]:
+                stats["max_alert"] = alert_level
+
+        self.level_stream.update(self.device.id, peak, alert_level)
+        self.relay.feed(samples, now)
+
+        # Update max values for the current broadcast interval
+        if peak > self.current_max_peak:
+            self.current_max_peak = peak
+        for name, value in features.items():
+            if value > self.current_max_features.get(name, 0.0):
+                self.current_max_features[name] = value
+        if alert_level in ["RED", "YELLOW"]:
+            # Update to the highest severity alert level
+            if alert_level == "RED" or (
+                alert_level == "YELLOW" and self.current_max_alert == "NONE"
+            ):
+                self.current_max_alert = alert_level
+
+        # Check if it's time to broadcast
+        if now - self.last_broadcast_time >= self.BROADCAST_INTERVAL:
+            source = self.active_source
+            if source is not None:
+                self.backlog_metric.set(source.backlog())
+            if self.current_max_alert != "NONE":
+                if self.classifier is not None and self.current_classification is None:
+                    self.classify(now)
+                # Save event with the max values from this interval
+                self.save_event(
+                    self.current_max_peak,
+                    self.current_max_alert,
+                    self.current_max_features,
+                )
+                self.broadcast_level(
+                    self.current_max_peak,
+                    self.current_max_alert,
+                    self.current_max_features,
+                )
+            # Reset max values for next interval
+            self.last_broadcast_time = now
+            self.current_max_peak = 0
+            self.current_max_alert = "NONE"
+            self.current_max_features = {}
+            self.current_classification = None
+
+        if self.should_stop_recording(alert_level, now):
+            self.stop_recording()
+
+    def refresh_noise_floor(self, now: float):
+        """Move relative thresholds to the current floor and save it now and then"""
+        self.last_floor_refresh = now
+        device = self.device
+        if device.threshold_mode == "relative":
+            self.alert_state.configure(
+                *self.alert_thresholds(device),
+                hysteresis=device.alert_hysteresis,
+                sustain=device.alert_sustain_ms / 1000,
+                release=device.alert_release_ms / 1000,
+            )
+        if now - self.last_floor_save >= self.FLOOR_SAVE_INTERVAL:
+            self.last_floor_save = now
+            self.save_noise_floor()
+
+    def save_noise_floor(self):
+        """Persist the learned floor in the background"""
+        floor = self.noise_floor.value
+        if floor is not None:
+            self.store_noise_floor(floor)
+
+    def reset_noise_floor(self):
+        """Learn the floor from scratch, e.g. once the alert feature (and its units) changed"""
+        self.noise_floor = NoiseFloor()
+        self.last_floor_refresh = -math.inf
+        self.store_noise_floor(None)
+
+    def store_noise_floor(self, floor: Optional[float]):
+        threading.Thread(
+            target=store_noise_floor_in_thread,
+            args=(self.device.id, floor),
+            daemon=True,
+        ).start()
+
+    def classification_is_fresh(self, now: float) -> bool:
+        return (
+            self.last_classification is not None
+            and now - self.last_classified_at < self.CLASSIFY_INTERVAL
+        )
+
+    def classify(self, now: float) -> Classification:
+        """Classify the last second of audio, reusing a recent enough result"""
+        if self.classification_is_fresh(now):
+            self.current_classification = self.last_classification
+            return self.last_classification
+
+        started = time.perf_counter()
+        chunks = min(self.frames_consumed // self.CHUNK_FRAMES, self.CLASSIFY_CHUNKS)
+        result = self.classifier.classify(self.recent_audio[: max(chunks, 1)])
+        self.classification_metric.observe(time.perf_counter() - started)
+        self.last_classification = self.current_classification = result
+        self.last_classified_at = now
+        return result
+
+    def sounds_like_crying(self, now: float) -> bool:
+        """Whether a RED alert should start a recording, according to the classifier"""
+        threshold = self.device.cry_confidence_threshold
+        if self.classifier is None or threshold <= 0:
+            return True
+        reused = self.classification_is_fresh(now)
+        result = self.classify(now)
+        if result.cry_probability >= threshold:
+            return True
+        if not reused:
+            self.gated_metric.inc()
+            logger.info(
+                f"{self.device.name}: not recording, sounds like {result.label} "
+                f"({result.cry_probability:.0%} crying)"
+            )
+        return False
+
+    def process_motion(self, features: dict, alert_level: str, now: float) -> str:
+        """Fold the latest motion score into this chunk's features and alert level"""
+        score = self.motion_score
+        if time.monotonic() - self.motion_scored_at > self.MOTION_STALE_AFTER:
+            score = 0.0
+        features["motion"] = score
+        previous_motion = self.motion_state.state
+        motion_alert = self.motion_state.update(score, now)
+        if motion_alert != previous_motion:
+            logger.warning(
+                f"{self.device.name}: {previous_motion} -> {motion_alert} motion "
+                f"alert, {score:.1f}% of pixels changed"
+            )
+        if SEVERITY[motion_alert] > SEVERITY[alert_level]:
+            return motion_alert
+        return alert_level
+
+    def save_event(self, peak, alert_level, features=None):
+        """Queue an AudioEvent for the interval that just ended.
+
+        The event sink saves it in the background, so a slow database never
+        delays the next read from ffmpeg.
+        """
+        features = features or {}
+        classification = self.current_classification
+        self.event_sink.put(
+            AudioEvent(
+                device=self.device,
+                peak_value=peak,
+                alert_level=alert_level,
+                timestamp=timezone.now(),
+                recording_path=self.current_recording_path,
+                rms=features.get("rms"),
+                crest_factor=features.get("crest_factor"),
+                zero_crossing_rate=features.get("zero_crossing_rate"),
+                band_low=features.get("band_low"),
+                band_mid=features.get("band_mid"),
+                band_high=features.get("band_high"),
+                motion_score=features.get("motion"),
+                sound_label=classification.label if classification else None,
+                sound_confidence=classification.confidence if classification else None,
+            )
+        )
+
+    @property
+    def group_name(self) -> str:
+        return f"monitor_{self.device.id}"
+
+    def level_message(self, peak, alert_level, features=None) -> dict:
+        floor = self.noise_floor.value
+        return {
+            "type": "audio_level",
+            "device_id": self.device.id,
+            "peak": peak,
+            "alert_level": alert_level,
+            "features": {
+                name: round(value, 2) for name, value in (features or {}).items()
+            },
+            "noise_floor": None if floor is None else round(floor, 1),
+            "sound": self.sound_message(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def sound_message(self) -> Optional[dict]:
+        classification = self.current_classification
+        if classification is None:
+            return None
+        return {
+            "label": classification.label,
+            "confidence": round(classification.confidence, 2),
+        }
+
+    def broadcast_level(self, peak, alert_level, features=None):
+        """Send audio level update via WebSocket"""
         try:
             channel_layer = get_channel_layer()
             if channel_layer is None:
                 logger.error("No channel layer available!")
                 return
 
-            message = {
-                "type": "audio_level",
-                "device_id": self.device.id,
-                "peak": peak,
-                "alert_level": alert_level,
-                "timestamp": datetime.now().isoformat(),
-            }
-
-            group_name = f"monitor_{self.device.id}"
-            logger.debug(f"Broadcasting to group {group_name}: {message}")
-
-            # Get list of channels in group (for debugging)
-            channels = getattr(channel_layer, "_groups", {}).get(group_name, set())
-            logger.debug(f"Current channels in group {group_name}: {channels}")
+            message = self.level_message(peak, alert_level, features)
+            group_name = self.group_name
+            # Runs every broadcast interval, so only build log messages that will be shown
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Broadcasting to group %s: %s", group_name, message)
 
+            started = time.perf_counter()
             async_to_sync(channel_layer.group_send)(
                 group_name, {"type": "monitor_message", "message": message}
             )
-            logger.debug(f"Broadcast complete: {peak} ({alert_level})")
-            self.last_broadcast_time = current_time
+            self.broadcast_metric.observe(time.perf_counter() - started)
         except Exception as e:
             logger.error(f"Error broadcasting level: {e}", exc_info=True)
 
+    def publish_audio(self, message):
+        """Queue one relay packet for everyone listening to this device"""
+        self.relay_publisher.publish(message)
+
+    @property
+    def recordings_group_name(self) -> str:
+        return f"recordings_{self.device.id}"
+
+    def recording_message(self, recording: Recording) -> dict:
+        return {
+            "type": "recording_ready",
+            "device_id": self.device.id,
+            "recording_id": recording.id,
+            "path": recording.path,
+            "duration": recording.duration,
+            "timestamp": recording.started_at.isoformat(),
+        }
+
+    def recording_ready(self, path, started_at, ended_at, stats):
+        """Index a finished clip and tell dashboards about it. Called from the recorder's thread"""
+        try:
+            recording = index_recording(
+                self.device.id,
+                relative_recording_path(path),
+                started_at,
+                ended_at,
+                max_peak=stats.get("max_peak", 0),
+                max_alert=stats.get("max_alert", "NONE"),
+            )
+        except Exception as e:
+            logger.error(f"Error indexing recording {path}: {e}")
+            return
+        finally:
+            # The recorder's thread is about to exit, don't leave its connection open
+            connection.close()
+        schedule_previews(recording.id)
+        self.publish_recording(self.recording_message(recording))
+
+    def publish_recording(self, message):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("No channel layer available!")
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                self.recordings_group_name,
+                {"type": "recording_ready", "message": message},
+            )
+        except Exception as e:
+            logger.error(f"Error announcing recording {message['path']}: {e}")
+
     def start(self):
         """Start monitoring"""
         if self.running:
             return
 
         self.running = True
+        self.level_stream.start_thread()
         self.thread = threading.Thread(target=self.process_audio)
         self.thread.start()
         logger.info(f"Started monitoring thread for device: {self.device.name}")
@@ -326,20 +678,14 @@ class AudioMonitorService:
         self.running = False
 
         try:
+            # Closing the source kills the ingest, unblocking a reader waiting on a stalled stream
+            source = self.active_source
+            if source is not None:
+                source.close()
+
             # Stop recording if it's running
-            if self.recording and self.recording_process:
-                try:
-                    self.recording_process.terminate()
-                    self.recording_process.wait(timeout=2)
-                    logger.info("Stopped recording")
-                except:
-                    # If terminate fails, try to force kill
-                    if self.recording_process:  # Check again in case it changed
-                        self.recording_process.kill()
-                finally:
-                    self.recording = False
-                    self.recording_process = None
-                    self.current_recording_path = None
+            if self.recording:
+                self.stop_recording()
 
             # Clear the instance from our registry
             if self.device.id in self._instances:
@@ -350,18 +696,28 @@ class AudioMonitorService:
 
         logger.info(f"Monitor stopped for device: {self.device.name}")
 
-    def should_stop_recording(self, current_peak):
+    def recording_allowed(self, now):
+        """Enforce the device's cooldown between the end of one clip and the next"""
+        if self.last_recording_stop is None:
+            return True
+        return now - self.last_recording_stop >= self.device.recording_cooldown_seconds
+
+    def should_stop_recording(self, alert_level, now):
         """Determine if recording should stop based on duration and sound level"""
         if not self.recording:
             return False
 
-        current_time = time.time()
         recording_duration = (
-            0
-            if self.recording_start_time is None
-            else current_time - self.recording_start_time
+            0 if self.recording_start_time is None else now - self.recording_start_time
         )
 
+        # Track the quiet period from the moment the alert clears
+        if alert_level == "NONE":
+            if self.quiet_period_start is None:
+                self.quiet_period_start = now
+        else:
+            self.quiet_period_start = None
+
         # Always stop if we hit max duration
         if recording_duration >= self.MAX_RECORDING_DURATION:
             logger.info("Stopping recording: Max duration reached")
@@ -371,34 +727,11 @@ class AudioMonitorService:
         if recording_duration < self.MIN_RECORDING_DURATION:
             return False
 
-        # Handle quiet period tracking
-        if current_peak < self.device.yellow_threshold:
-            if self.quiet_period_start is None:
-                self.quiet_period_start = current_time
-            elif (
-                current_time - self.quiet_period_start
-            ) >= self.QUIET_PERIOD_THRESHOLD:
-                logger.info("Stopping recording: Quiet period threshold reached")
-                return True
-        else:
-            self.quiet_period_start = None
-            self.last_alert_time = current_time
+        if (
+            self.quiet_period_start is not None
+            and (now - self.quiet_period_start) >= self.QUIET_PERIOD_THRESHOLD
+        ):
+            logger.info("Stopping recording: Quiet period threshold reached")
+            return True
 
         return False
-
-    def process_queued_events(self):
-        """Process any queued events without blocking"""
-        try:
-            while True:
-                event = self.event_queue.get_nowait()
-                # Save to database
-                AudioEvent.objects.create(
-                    device=self.device,
-                    peak_value=event["peak"],
-                    alert_level=event["alert_level"],
-                )
-                # Broadcast via WebSocket
-                self.broadcast_level(event["peak"], event["alert_level"])
-                self.event_queue.task_done()
-        except queue.Empty:
-            pass  # No more events to process
@@ -0,0 +1,237 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Parents hear the monitor's own decoded PCM, downsampled to 16 kHz mono
+# 16-bit: 32 KB/s per device, however many of them are listening
+RELAY_RATE = 16000
+RELAY_ENCODING = "pcm_s16le"
+PACKET_MS = 200  # Audio per WebSocket frame
+# Listener sockets refresh a cache key this often, and the relay stops
+# publishing once it has gone unrefreshed for LISTENER_TTL
+LISTENER_REFRESH_INTERVAL = 5  # seconds
+LISTENER_TTL = 15  # seconds
+LISTENER_CHECK_INTERVAL = 1  # seconds
+# Packets the threaded engine's publisher may fall behind by, over all devices,
+# before new ones are dropped rather than holding up an audio thread
+PUBLISH_QUEUE_PACKETS = 100
+
+
+def relay_group_name(device_id: int) -> str:
+    return f"audio_{device_id}"
+
+
+def listener_cache_key(device_id: int) -> str:
+    return f"monitor:audio-listeners:{device_id}"
+
+
+def mark_listening(device_id: int):
+    """Called by listener sockets to keep their device's relay running"""
+    cache.set(listener_cache_key(device_id), True, LISTENER_TTL)
+
+
+def listening_devices(device_ids: Iterable[int]) -> set[int]:
+    """Which of `device_ids` have had a listener recently"""
+    keys = {listener_cache_key(device_id): device_id for device_id in device_ids}
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+def relay_format() -> dict:
+    """First frame sent to a listener, describing the binary frames that follow"""
+    return {
+        "type": "audio_format",
+        "encoding": RELAY_ENCODING,
+        "rate": RELAY_RATE,
+        "channels": 1,
+        "packet_ms": PACKET_MS,
+    }
+
+
+class AudioRelay:
+    """Re-encodes a device's PCM once for every parent listening to it.
+
+    The monitor already decodes the camera's audio for detection. The relay
+    takes each chunk, downsamples it to RELAY_RATE and packs PACKET_MS of it
+    into one frame for the device's relay group. The channel layer fans that
+    out to every listener socket, so the phone streams to the server once
+    however many parents are listening, and each frame is encoded once.
+
+    Nothing is done while nobody is listening, which `check_listeners()` reads
+    from the cache once a second.
+    """
+
+    def __init__(
+        self,
+        device_id: int,
+        rate: int,
+        publish: Callable[[dict], None],
+        poll_listeners: bool = True,
+    ):
+        if rate % RELAY_RATE:
+            raise ValueError(f"Can't relay {rate} Hz audio at {RELAY_RATE} Hz")
+        self.device_id = device_id
+        self.factor = rate // RELAY_RATE
+        self.publish = publish
+        # The asyncio engine checks all of its devices' listeners in one query
+        self.poll_listeners = poll_listeners
+        self.listening = False
+        self.last_check = -LISTENER_CHECK_INTERVAL
+        self.packet = np.empty(RELAY_RATE * PACKET_MS // 1000, dtype=np.int16)
+        self.filled = 0
+        self.sequence = 0
+
+    def check_listeners(self, now: float):
+        self.last_check = now
+        try:
+            self.set_listening(self.device_id in listening_devices([self.device_id]))
+        except Exception as e:
+            logger.error(
+                f"Error checking audio listeners of device {self.device_id}: {e}"
+            )
+
+    def set_listening(self, listening: bool):
+        if listening != self.listening:
+            logger.info(
+                f"Audio relay for device {self.device_id} "
+                f"{'started' if listening else 'stopped'}"
+            )
+            self.listening = listening
+
+    def feed(self, samples: np.ndarray, now: float):
+        """Add one chunk of the monitor's PCM, publishing each packet as it fills"""
+        if self.poll_listeners and now - self.last_check >= LISTENER_CHECK_INTERVAL:
+            self.check_listeners(now)
+        if not self.listening:
+            # Reset here rather than in set_listening(), which may run on another thread
+            self.filled = 0
+            return
+
+        # Averaging each group of `factor` samples is a cheap low-pass before decimating
+        usable = len(samples) - len(samples) % self.factor
+        reduced = samples[:usable].reshape(-1, self.factor).mean(axis=1)
+        while len(reduced):
+            n = min(len(reduced), len(self.packet) - self.filled)
+            self.packet[self.filled : self.filled + n] = reduced[:n]
+            self.filled += n
+            reduced = reduced[n:]
+            if self.filled == len(self.packet):
+                self.flush()
+
+    def flush(self):
+        message = {
+            "device_id": self.device_id,
+            "seq": self.sequence,
+            "pcm": self.packet.tobytes(),
+        }
+        self.sequence += 1
+        self.filled = 0
+        try:
+            self.publish(message)
+        except Exception as e:
+            logger.error(f"Error relaying audio of device {self.device_id}: {e}")
+
+
+class RelayPublisher:
+    """Sends the threaded engine's relay packets from one background thread.
+
+    `publish()` only queues a packet, dropping it if PUBLISH_QUEUE_PACKETS are
+    already waiting, so a stalled channel layer never holds up an audio thread.
+    The same thread checks every registered relay's listeners with one cache
+    lookup a second, like the asyncio engine does for its devices.
+    """
+
+    def __init__(self, max_queue: int = PUBLISH_QUEUE_PACKETS):
+        self.queue: queue.Queue[dict] = queue.Queue(maxsize=max_queue)
+        self.relays: dict[int, AudioRelay] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def register(self, relay: AudioRelay):
+        """Take over `relay`'s listener checks and start publishing"""
+        relay.poll_listeners = False
+        with self.lock:
+            self.relays[relay.device_id] = relay
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="audio-relay", daemon=True
+                )
+                self.thread.start()
+
+    def unregister(self, relay: AudioRelay):
+        with self.lock:
+            if self.relays.get(relay.device_id) is relay:
+                del self.relays[relay.device_id]
+        relay.set_listening(False)
+
+    def publish(self, message: dict):
+        """Queue one packet. Never blocks the caller"""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            logger.warning(
+                f"Audio relay queue full, dropping packet of device {message['device_id']}"
+            )
+
+    def check_listeners(self):
+        with self.lock:
+            relays = dict(self.relays)
+        if not relays:
+            return
+        try:
+            listening = listening_devices(list(relays))
+        except Exception as e:
+            logger.error(f"Error checking audio listeners: {e}")
+            return
+        for device_id, relay in relays.items():
+            relay.set_listening(device_id in listening)
+
+    def run(self):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("No channel layer available!")
+            return
+        send = async_to_sync(channel_layer.group_send)
+        next_check = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_check:
+                self.check_listeners()
+                next_check = now + LISTENER_CHECK_INTERVAL
+            try:
+                message = self.queue.get(timeout=max(0.0, next_check - now))
+            except queue.Empty:
+                continue
+            try:
+                send(
+                    relay_group_name(message["device_id"]),
+                    {"type": "audio_packet", "message": message},
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error relaying audio of device {message['device_id']}: {e}"
+                )
+
+
+_publisher: Optional[RelayPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_relay_publisher() -> RelayPublisher:
+    """The process-wide relay publisher of the threaded engine"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = RelayPublisher()
+        return _publisher
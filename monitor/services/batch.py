@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Optional
+
+import numpy as np
+
+from .features import BatchFeatureExtractor
+
+logger = logging.getLogger(__name__)
+
+# A tick waits at most this share of a chunk period for devices that haven't
+# submitted yet. Well under one chunk, so a stalled camera costs the others a
+# little latency rather than pushing them behind real time.
+MAX_WAIT_CHUNKS = 0.25
+
+
+class BatchAnalyzer:
+    """Extracts features for all of an async engine's devices in one call per tick.
+
+    Each device copies its latest chunk into its row of a shared, preallocated
+    (devices, frames) array and awaits `analyze()`. A tick closes as soon as
+    every registered device has submitted a chunk, or `max_wait` seconds after
+    the first one did, so a stalled camera never holds the others back. The
+    whole tick then goes through `BatchFeatureExtractor` in one vectorized call
+    and each device gets its own feature dict back for its alert logic.
+
+    Everything runs on the engine's event loop, so there is no locking.
+    """
+
+    def __init__(self, rate: int, frames: int, max_wait: float, capacity: int = 8):
+        self.frames = frames
+        self.max_wait = max_wait
+        self.extractor = BatchFeatureExtractor(rate, frames, capacity)
+        self.rows = np.zeros((capacity, frames), dtype=np.int16)
+        self.slots: dict[int, int] = {}  # device id -> row
+        self.pending: dict[int, asyncio.Future] = {}  # row -> waiting device
+        self.deadline: Optional[asyncio.TimerHandle] = None
+
+    def register(self, device_id: int) -> int:
+        """Give a device a row, returns its slot"""
+        slot = self.slots.get(device_id)
+        if slot is not None:
+            return slot
+        used = set(self.slots.values())
+        slot = next(i for i in range(len(self.slots) + 1) if i not in used)
+        if slot >= len(self.rows):
+            rows = np.zeros((len(self.rows) * 2, self.frames), dtype=np.int16)
+            rows[: len(self.rows)] = self.rows
+            self.rows = rows
+        self.slots[device_id] = slot
+        return slot
+
+    def unregister(self, device_id: int):
+        slot = self.slots.pop(device_id, None)
+        if slot is None:
+            return
+        future = self.pending.pop(slot, None)
+        if future is not None and not future.done():
+            future.cancel()
+        # The others may only have been waiting on this device
+        if self.pending and len(self.pending) >= len(self.slots):
+            self.run_tick()
+
+    async def analyze(self, slot: int, samples: np.ndarray) -> dict[str, float]:
+        """Queue one device's chunk for the current tick and wait for its features"""
+        self.rows[slot] = samples
+        future = asyncio.get_running_loop().create_future()
+        self.pending[slot] = future
+        if len(self.pending) >= len(self.slots):
+            self.run_tick()
+        elif self.deadline is None:
+            self.deadline = asyncio.get_running_loop().call_later(
+                self.max_wait, self.run_tick
+            )
+        return await future
+
+    def run_tick(self):
+        if self.deadline is not None:
+            self.deadline.cancel()
+            self.deadline = None
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        slots = sorted(pending)
+        if slots[-1] == len(slots) - 1:
+            samples = self.rows[: len(slots)]  # The usual full tick, no gather needed
+        else:
+            samples = self.rows[slots]
+        try:
+            results = self.extractor.extract_batch(samples)
+        except Exception as e:
+            logger.error(f"Batched analysis of {len(slots)} chunks failed: {e}")
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for slot, features in zip(slots, results):
+            future = pending[slot]
+            if not future.done():
+                future.set_result(features)
@@ -0,0 +1,124 @@
+import time
+from typing import Any, Dict, Optional
+
+from django.core.cache import cache
+
+from ..models import ChatMessage, ChatRoom
+
+# Messages sent on connect, and per "load older" page
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+CHAT_CACHE_TIMEOUT = 60 * 60  # seconds
+
+
+def room_cache_key(room_name: str) -> str:
+    return f"chat:room:{room_name}"
+
+
+def generation_cache_key(room_id: int) -> str:
+    return f"chat:generation:{room_id}"
+
+
+def recent_cache_key(room_id: int, generation: int) -> str:
+    return f"chat:recent:{room_id}:{generation}"
+
+
+def history_generation(room_id: int) -> int:
+    """The room's history version, bumped by every write.
+
+    Starts from the current time in microseconds, so a generation key that was
+    evicted never comes back at a value whose page is still cached.
+    """
+    key = generation_cache_key(room_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_room_id(room_name: str) -> int:
+    """Room ID for `room_name`, creating the room on first use"""
+    key = room_cache_key(room_name)
+    room_id = cache.get(key)
+    if room_id is None:
+        room, _ = ChatRoom.objects.get_or_create(name=room_name)
+        room_id = room.id
+        cache.set(key, room_id, CHAT_CACHE_TIMEOUT)
+    return room_id
+
+
+def serialize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape as the frontend's Message interface, plus the id used as the paging cursor
+    return {
+        "id": message["id"],
+        "user": message["user"],
+        "text": message["text"],
+        "timestamp": message["timestamp"].isoformat(),
+    }
+
+
+def fetch_page(
+    room_id: int,
+    before_id: Optional[int] = None,
+    limit: int = CHAT_HISTORY_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """Up to `limit` messages older than `before_id` (or the newest), oldest first.
+
+    Walks the (room, id) index backwards, so a page costs the same however long
+    the room's history is.
+    """
+    messages = ChatMessage.objects.filter(room_id=room_id)
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    rows = list(
+        messages.order_by("-id").values("id", "user", "text", "timestamp")[: limit + 1]
+    )
+    has_more = len(rows) > limit
+    page = [serialize_message(row) for row in reversed(rows[:limit])]
+    return {"messages": page, "has_more": has_more}
+
+
+def fetch_recent(room_name: str) -> Dict[str, Any]:
+    """The newest page of a room, served from the cache until the next write.
+
+    The page is cached under the generation read before querying it. A write
+    that lands in between bumps the generation, so the possibly stale page is
+    never served.
+    """
+    room_id = get_room_id(room_name)
+    key = recent_cache_key(room_id, history_generation(room_id))
+    page = cache.get(key)
+    if page is None:
+        page = fetch_page(room_id)
+        cache.set(key, page, CHAT_CACHE_TIMEOUT)
+    return page
+
+
+def fetch_older(
+    room_name: str, before_id: int, limit: int = CHAT_HISTORY_PAGE_SIZE
+) -> Dict[str, Any]:
+    limit = max(1, min(int(limit), CHAT_HISTORY_MAX_PAGE_SIZE))
+    return fetch_page(get_room_id(room_name), int(before_id), limit)
+
+
+def save_message(room_name: str, message_data: Dict[str, Any]) -> int:
+    """Save a chat message and return its id"""
+    room_id = get_room_id(room_name)
+    # Frontend sends ISO format timestamp, Django will parse it for the database
+    message = ChatMessage.objects.create(
+        room_id=room_id,
+        user=message_data["user"],
+        text=message_data["text"],
+        timestamp=message_data["timestamp"],
+    )
+    invalidate_history(room_id)
+    return message.id
+
+
+def invalidate_history(room_id: int):
+    try:
+        cache.incr(generation_cache_key(room_id))
+    except ValueError:
+        # No generation yet, the next read starts a new one after this write
+        pass
@@ -0,0 +1,56 @@
+import logging
+from typing import Iterable
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# A device's camera connection, as reported to monitor sockets
+CONNECTING = "connecting"
+CONNECTED = "connected"
+RECONNECTING = "reconnecting"  # The reader died or stalled, waiting out the backoff
+STOPPED = "stopped"
+
+
+def connection_cache_key(device_id: int) -> str:
+    return f"monitor:connection:{device_id}"
+
+
+def connection_message(device_id: int, state: str, **details) -> dict:
+    """{"type": "connection_state", "device_id", "state", "since", ...details}"""
+    return {
+        "type": "connection_state",
+        "device_id": device_id,
+        "state": state,
+        "since": timezone.now().isoformat(),
+        **details,
+    }
+
+
+def save_connection_state(message: dict):
+    """Keep the latest state so sockets that connect later can be told it"""
+    cache.set(connection_cache_key(message["device_id"]), message, None)
+
+
+def get_connection_states(device_ids: Iterable[int]) -> list[dict]:
+    """The last reported state of each device that has one"""
+    keys = [connection_cache_key(device_id) for device_id in device_ids]
+    return list(cache.get_many(keys).values())
+
+
+def publish_connection_state(device_id: int, state: str, **details):
+    """Record a device's connection state and send it to the device's monitor sockets"""
+    try:
+        message = connection_message(device_id, state, **details)
+        save_connection_state(message)
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            f"monitor_{device_id}", {"type": "monitor_message", "message": message}
+        )
+    except Exception as e:
+        logger.error(f"Error publishing connection state of device {device_id}: {e}")
@@ -0,0 +1,94 @@
+import logging
+import time
+from typing import Optional
+
+from django.core.cache import cache
+
+from ..models import MonitorDevice
+
+logger = logging.getLogger(__name__)
+
+DEVICE_CACHE_TIMEOUT = 60 * 60  # seconds
+# The camera login is never copied into the cache, only loaded for the ingest
+CREDENTIAL_FIELDS = ("username", "password")
+CONFIG_FIELDS = [
+    field.attname
+    for field in MonitorDevice._meta.concrete_fields
+    if field.attname not in CREDENTIAL_FIELDS
+]
+
+
+def version_cache_key(device_id: int) -> str:
+    return f"monitor:device-version:{device_id}"
+
+
+def device_cache_key(device_id: int, version: int) -> str:
+    return f"monitor:device:{device_id}:{version}"
+
+
+def device_version(device_id: int) -> Optional[int]:
+    """The device's config version, bumped by every save.
+
+    Starts from the current time in microseconds, so a version key that was
+    evicted never comes back at a value whose config is still cached. None if
+    the cache can't be reached.
+    """
+    key = version_cache_key(device_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns() // 1000, None)
+            version = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Device config cache unavailable, reading the database: {e}")
+        return None
+    return version
+
+
+def get_device(device_id, credentials: bool = False) -> MonitorDevice:
+    """A device's current config, served from the cache until it is next saved.
+
+    The config is cached under the version read before querying it, so a row
+    read just before a save is stored under a version that is never read again.
+    Cached devices have their credentials deferred; pass `credentials` to load
+    them now, e.g. before handing the device to an ingest on an event loop.
+
+    Falls back to the database when the cache can't be reached. Raises
+    MonitorDevice.DoesNotExist like a normal lookup.
+    """
+    device_id = int(device_id)
+    version = device_version(device_id)
+    if version is None:
+        return MonitorDevice.objects.get(id=device_id)
+    key = device_cache_key(device_id, version)
+    try:
+        config = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Device config cache unavailable, reading the database: {e}")
+        config = None
+    if config is None:
+        device = MonitorDevice.objects.get(id=device_id)
+        try:
+            cache.set(
+                key,
+                [getattr(device, name) for name in CONFIG_FIELDS],
+                DEVICE_CACHE_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f"Couldn't cache config of device {device_id}: {e}")
+        return device
+
+    device = MonitorDevice.from_db("default", CONFIG_FIELDS, config)
+    if credentials:
+        device.refresh_from_db(fields=CREDENTIAL_FIELDS)
+    return device
+
+
+def invalidate_device(device_id: int):
+    try:
+        cache.incr(version_cache_key(device_id))
+    except ValueError:
+        # No version yet, the next read starts a new one after this write
+        pass
+    except Exception as e:
+        logger.error(f"Couldn't invalidate cached config of device {device_id}: {e}")
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from ..models import AudioEvent
+from .alert_state import SEVERITY
+from .metrics import EVENT_QUEUE_DEPTH, EVENT_WRITE_SECONDS, EVENTS_DROPPED
+from .rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+
+# Measured on the same chunk as an event's peak, taken from whichever event a
+# coalesced one keeps the peak of
+FEATURE_FIELDS = (
+    "rms",
+    "crest_factor",
+    "zero_crossing_rate",
+    "band_low",
+    "band_mid",
+    "band_high",
+)
+
+
+def coalesce(pending: AudioEvent, event: AudioEvent):
+    """Fold `event` into `pending`, keeping the fields that describe the worst moment"""
+    if (SEVERITY[event.alert_level], event.peak_value) > (
+        SEVERITY[pending.alert_level],
+        pending.peak_value,
+    ):
+        pending.alert_level = event.alert_level
+        pending.peak_value = event.peak_value
+        for name in FEATURE_FIELDS:
+            setattr(pending, name, getattr(event, name))
+    if event.motion_score is not None and (
+        pending.motion_score is None or event.motion_score > pending.motion_score
+    ):
+        pending.motion_score = event.motion_score
+    if event.sound_confidence is not None and (
+        pending.sound_confidence is None
+        or event.sound_confidence > pending.sound_confidence
+    ):
+        pending.sound_label = event.sound_label
+        pending.sound_confidence = event.sound_confidence
+    pending.recording_path = pending.recording_path or event.recording_path
+
+
+class EventSink:
+    """Write-behind persistence for AudioEvents.
+
+    Monitors hand events to `put()`, which never blocks. A background thread
+    drains the bounded queue and saves events with `bulk_create`, in batches of
+    up to `batch_size` or whatever arrived within `flush_interval` seconds, and
+    folds each batch into the rollup tables in the same transaction.
+
+    When the queue is full the overflow policy applies:
+      * "coalesce": fold the event into one pending event per device, keeping the
+        level, peak and features of the most severe (then loudest) one, the
+        highest motion score and the most confident sound label, so a long
+        crying episode is still recorded
+      * "drop": discard the event
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_queue: int = 1000,
+        overflow: str = "coalesce",
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.queue: queue.Queue[AudioEvent] = queue.Queue(maxsize=max_queue)
+        self.coalesced: dict[int, AudioEvent] = {}
+        self.lock = threading.Lock()
+        self.closing = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        # Counters, read through stats()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.coalesced_count = 0
+        self.failed_batches = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(
+            target=self.run, name="audio-event-writer", daemon=True
+        )
+        self.thread.start()
+
+    def put(self, event: AudioEvent):
+        """Queue an event for saving. Never blocks the caller"""
+        try:
+            self.queue.put_nowait(event)
+            with self.lock:
+                self.enqueued += 1
+            return
+        except queue.Full:
+            pass
+
+        with self.lock:
+            if self.overflow != "coalesce":
+                self.dropped += 1
+                EVENTS_DROPPED.labels().inc()
+                return
+
+            pending = self.coalesced.get(event.device_id)
+            if pending is None:
+                self.coalesced[event.device_id] = event
+                return
+            coalesce(pending, event)
+            self.coalesced_count += 1
+
+    def run(self):
+        while not (self.closing.is_set() and self.queue.empty() and not self.coalesced):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> list[AudioEvent]:
+        batch: list[AudioEvent] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        with self.lock:
+            if self.coalesced:
+                batch.extend(self.coalesced.values())
+                self.coalesced = {}
+        EVENT_QUEUE_DEPTH.labels().set(self.queue.qsize())
+        return batch
+
+    def _write(self, batch: list[AudioEvent]):
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                AudioEvent.objects.bulk_create(batch)
+                update_rollups(batch)
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} audio events: {e}")
+            with self.lock:
+                self.failed_batches += 1
+                self.dropped += len(batch)
+            EVENTS_DROPPED.labels().inc(len(batch))
+            return
+        EVENT_WRITE_SECONDS.labels().observe(time.perf_counter() - started)
+        with self.lock:
+            self.written += len(batch)
+
+    def close(self, timeout: float = 10):
+        """Flush everything still queued and stop the writer"""
+        self.closing.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced_count,
+                "failed_batches": self.failed_batches,
+            }
+
+
+_sink: Optional[EventSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_event_sink() -> EventSink:
+    """The process-wide event sink, started on first use"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = EventSink(
+                batch_size=settings.MONITOR_EVENT_BATCH_SIZE,
+                flush_interval=settings.MONITOR_EVENT_FLUSH_INTERVAL,
+                max_queue=settings.MONITOR_EVENT_QUEUE_SIZE,
+                overflow=settings.MONITOR_EVENT_OVERFLOW,
+            )
+            _sink.start()
+            atexit.register(_sink.close)
+        return _sink
@@ -0,0 +1,348 @@
+import base64
+import fcntl
+import logging
+import os
+import struct
+import subprocess
+import termios
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from ..models import MonitorDevice
+from .motion import FRAME_HEIGHT, FRAME_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# MPEG-TS is made of fixed 188-byte packets. Reading whole packets means any
+# chunk we hand to the recorder can be written straight into a new clip.
+TS_PACKET_SIZE = 188
+AV_READ_SIZE = TS_PACKET_SIZE * 64
+WATCHDOG_INTERVAL = 1  # seconds between stall checks
+STDERR_TAIL_LINES = 20  # ffmpeg stderr lines kept to explain why a reader exited
+# ffmpeg's error for an output none of whose (optional) maps matched a stream
+NO_STREAM_ERROR = "does not contain any stream"
+
+# Stream URLs ffmpeg found no video in. Their readers reconnect without the
+# motion output, which would otherwise fail ffmpeg on every start.
+_videoless_streams: set[str] = set()
+
+
+def auth_header_args(device: MonitorDevice) -> list[str]:
+    """Build the ffmpeg -headers arguments for basic auth, if the device has credentials"""
+    if not device.username or not device.password:
+        if device.is_authenticated:
+            logger.error(
+                f"Device {device.name} is marked as authenticated but missing credentials"
+            )
+        return []
+
+    auth = base64.b64encode(f"{device.username}:{device.password}".encode()).decode()
+    return ["-headers", f"Authorization: Basic {auth}\r\n"]
+
+
+class StreamIngest:
+    """A single long-lived ffmpeg connection to a device's stream.
+
+    The stream is tee'd into two outputs:
+      * mono PCM audio on stdout, read by the level analyzer
+      * the muxed A/V feed as MPEG-TS on an inherited pipe, handed to `on_av_data`
+      * if the device has motion detection on, small grayscale video frames at
+        MOTION_FPS on a second inherited pipe, handed to `on_video_frame`
+
+    The A/V feed is drained continuously so ffmpeg never blocks on it, which lets
+    the recorder start and stop clips without reconnecting to the camera.
+    ffmpeg's stderr is drained and logged the same way.
+
+    A watchdog kills ffmpeg when no PCM has arrived for `stall_timeout` seconds
+    (e.g. the camera dropped off Wi-Fi), so a blocked read ends with EOF
+    instead of hanging forever.
+    """
+
+    def __init__(
+        self,
+        device: MonitorDevice,
+        rate: int,
+        on_av_data: Callable[[bytes], None],
+        on_video_frame: Optional[Callable[[bytes], None]] = None,
+    ):
+        self.device = device
+        self.rate = rate
+        self.on_av_data = on_av_data
+        self.on_video_frame = on_video_frame
+        self.process: Optional[subprocess.Popen] = None
+        self.av_thread: Optional[threading.Thread] = None
+        self.video_thread: Optional[threading.Thread] = None
+        self._av_read_fd: Optional[int] = None
+        self._video_read_fd: Optional[int] = None
+        self.frame_bytes = FRAME_WIDTH * FRAME_HEIGHT
+        self._av_pending = b""
+        self.stall_timeout = settings.MONITOR_STALL_TIMEOUT
+        self.last_data = 0.0  # time.monotonic() of the last PCM read
+        self.stalled = False
+        self.stderr_tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+        self.stopping = threading.Event()
+
+    @property
+    def decodes_video(self) -> bool:
+        return (
+            self.on_video_frame is not None
+            and self.device.motion_enabled
+            and self.device.stream_url not in _videoless_streams
+        )
+
+    def build_command(self, av_fd: int, video_fd: Optional[int] = None) -> list[str]:
+        command = ["ffmpeg", "-loglevel", "error"]  # Only show errors
+        command.extend(auth_header_args(self.device))
+        command.extend(["-i", self.device.stream_url])
+
+        # Output 1: audio only, decoded to PCM for level analysis
+        command.extend(
+            [
+                "-map",
+                "0:a:0",
+                "-acodec",
+                "pcm_s16le",
+                "-ar",
+                str(self.rate),
+                "-ac",
+                "1",
+                "-f",
+                "s16le",  # Raw samples, no header to skip
+                "pipe:1",
+            ]
+        )
+
+        # Output 2: video copied as-is, audio encoded once, muxed for the recorder
+        command.extend(
+            [
+                "-map",
+                "0:v?",
+                "-map",
+                "0:a?",
+                "-c:v",
+                "copy",
+                "-c:a",
+                "aac",
+                "-f",
+                "mpegts",
+                f"pipe:{av_fd}",
+            ]
+        )
+
+        # Output 3: downscaled grayscale frames at a few fps for motion detection.
+        # ffmpeg still refuses an output left with no streams, so a stream found
+        # to have no video is reconnected without it (see log_stderr). No frames
+        # on the pipe scores as no motion.
+        if video_fd is not None:
+            command.extend(
+                [
+                    "-map",
+                    "0:v:0?",
+                    "-vf",
+                    f"fps={settings.MOTION_FPS:g},scale={FRAME_WIDTH}:{FRAME_HEIGHT}",
+                    "-pix_fmt",
+                    "gray",
+                    "-f",
+                    "rawvideo",
+                    f"pipe:{video_fd}",
+                ]
+            )
+        return command
+
+    def open_pipes(self) -> tuple[list[int], list[int]]:
+        """Pipes for the extra outputs: ([A/V read, video read], [A/V write, video write]).
+
+        The video pair is left out when motion detection is off.
+        """
+        av_read, av_write = os.pipe()
+        if not self.decodes_video:
+            return [av_read], [av_write]
+        try:
+            video_read, video_write = os.pipe()
+        except OSError:
+            os.close(av_read)
+            os.close(av_write)
+            raise
+        return [av_read, video_read], [av_write, video_write]
+
+    def start(self):
+        """Start the ingest process and return its PCM audio pipe"""
+        read_fds, write_fds = self.open_pipes()
+        command = self.build_command(*write_fds)
+        logger.info(f"Starting ingest for {self.device.name}: {' '.join(command)}")
+
+        try:
+            self.process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=10**8,
+                pass_fds=write_fds,
+            )
+        except Exception:
+            for fd in read_fds:
+                os.close(fd)
+            raise
+        finally:
+            # The child owns the write ends now; closing ours means we see EOF when it exits
+            for fd in write_fds:
+                os.close(fd)
+        self._av_read_fd = read_fds[0]
+
+        if self.process.stdout is None:
+            raise RuntimeError("Failed to capture ffmpeg stdout.")
+
+        self.av_thread = threading.Thread(target=self._pump_av_feed, daemon=True)
+        self.av_thread.start()
+        if len(read_fds) > 1:
+            self._video_read_fd = read_fds[1]
+            self.video_thread = threading.Thread(
+                target=self._pump_video_frames, daemon=True
+            )
+            self.video_thread.start()
+        self.last_data = time.monotonic()
+        threading.Thread(
+            target=self._drain_stderr, args=(self.process,), daemon=True
+        ).start()
+        threading.Thread(target=self._watch, args=(self.process,), daemon=True).start()
+        return self.process.stdout
+
+    def readinto(self, buffer: memoryview) -> int:
+        """Read PCM from ffmpeg, 0 once it has exited"""
+        process = self.process
+        if process is None or process.stdout is None:
+            return 0
+        n = process.stdout.readinto(buffer) or 0
+        if n:
+            self.last_data = time.monotonic()
+        return n
+
+    def log_stderr(self, line: str):
+        line = line.strip()
+        if line:
+            self.stderr_tail.append(line)
+            logger.warning(f"ffmpeg ({self.device.name}): {line}")
+        if self.decodes_video and NO_STREAM_ERROR in line:
+            _videoless_streams.add(self.device.stream_url)
+            logger.warning(
+                f"{self.device.name} has no video stream, reconnecting without motion detection"
+            )
+
+    def check_stalled(self, now: float) -> bool:
+        """True, once, when no PCM has arrived for stall_timeout seconds"""
+        if self.stalled or now - self.last_data < self.stall_timeout:
+            return False
+        self.stalled = True
+        logger.warning(
+            f"No audio from {self.device.name} for {self.stall_timeout}s, killing ffmpeg"
+        )
+        return True
+
+    def disconnect_reason(self) -> str:
+        """Why the stream ended, for logs and the connection state"""
+        if self.stalled:
+            return f"no audio for {self.stall_timeout}s"
+        if self.stderr_tail:
+            return self.stderr_tail[-1]
+        return "stream ended"
+
+    def _drain_stderr(self, process: subprocess.Popen):
+        if process.stderr is None:
+            return
+        for line in process.stderr:
+            self.log_stderr(line.decode(errors="replace"))
+
+    def _watch(self, process: subprocess.Popen):
+        while not self.stopping.wait(WATCHDOG_INTERVAL):
+            if process.poll() is not None:
+                return
+            if self.check_stalled(time.monotonic()):
+                process.kill()
+                return
+
+    def _pump_av_feed(self):
+        """Drain the A/V pipe, forwarding whole TS packets to the recorder"""
+        fd = self._av_read_fd
+        if fd is None:
+            return
+        with os.fdopen(fd, "rb", buffering=0) as av_pipe:
+            while True:
+                data = av_pipe.read(AV_READ_SIZE)
+                if not data:
+                    break
+                self.forward_av(data)
+        logger.info(f"A/V feed closed for {self.device.name}")
+
+    def _pump_video_frames(self):
+        """Read whole grayscale frames off the video pipe and hand each to `on_video_frame`"""
+        fd = self._video_read_fd
+        if fd is None:
+            return
+        with os.fdopen(fd, "rb", buffering=0) as video_pipe:
+            while True:
+                # A fresh buffer per frame, the detector keeps the last one to diff against
+                frame = bytearray(self.frame_bytes)
+                view = memoryview(frame)
+                filled = 0
+                while filled < len(frame):
+                    n = video_pipe.readinto(view[filled:])
+                    if not n:
+                        logger.info(f"Video frames closed for {self.device.name}")
+                        return
+                    filled += n
+                self.forward_frame(frame)
+
+    def forward_frame(self, frame: bytearray):
+        try:
+            self.on_video_frame(frame)
+        except Exception as e:
+            logger.error(f"Error handling video frame for {self.device.name}: {e}")
+
+    def forward_av(self, data: bytes):
+        """Hand whole TS packets to `on_av_data`, holding back any partial packet"""
+        pending = self._av_pending + data
+        usable = len(pending) - (len(pending) % TS_PACKET_SIZE)
+        self._av_pending = pending[usable:]
+        if usable == 0:
+            return
+        try:
+            self.on_av_data(pending[:usable])
+        except Exception as e:
+            logger.error(f"Error handling A/V feed for {self.device.name}: {e}")
+
+    def pcm_backlog(self) -> int:
+        """Bytes of PCM sitting in the pipe, i.e. how far the analyzer is behind ffmpeg"""
+        process = self.process
+        if process is None or process.stdout is None:
+            return 0
+        try:
+            available = fcntl.ioctl(
+                process.stdout.fileno(), termios.FIONREAD, struct.pack("i", 0)
+            )
+        except (OSError, ValueError):
+            return 0
+        return struct.unpack("i", available)[0]
+
+    def stop(self):
+        """Stop the ingest process"""
+        # Swap first so a concurrent stop() from another thread is a no-op
+        process, self.process = self.process, None
+        if process is None:
+            return
+        self.stopping.set()
+
+        try:
+            process.terminate()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+            process.wait()
+
+        for thread in (self.av_thread, self.video_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self.av_thread = self.video_thread = None
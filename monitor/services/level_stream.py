@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .alert_state import SEVERITY
+
+logger = logging.getLogger(__name__)
+
+# Peaks are compared in steps of this many sample units when computing deltas
+LEVEL_QUANTUM = 64
+# A full snapshot of every device is sent this often, so new clients catch up
+KEYFRAME_INTERVAL = 1.0  # seconds
+
+
+def levels_group(device_id: int) -> str:
+    """Group of the sockets watching a device's live levels"""
+    return f"levels_{device_id}"
+
+
+def group_messages(message: dict) -> list[tuple[str, dict]]:
+    """Split a tick into one channel layer message per device, for its group"""
+    return [
+        (
+            levels_group(entry[0]),
+            {"type": "level_stream", "levels": {**message, "l": [entry]}},
+        )
+        for entry in message["l"]
+    ]
+
+
+async def publish_levels(channel_layer, message: dict):
+    """Send a tick to each of its devices' groups at once"""
+    await asyncio.gather(
+        *(
+            channel_layer.group_send(group, event)
+            for group, event in group_messages(message)
+        )
+    )
+
+
+class LevelStream:
+    """Coalesces live audio levels from every monitor in this process.
+
+    Monitors call `update()` for every chunk. `rate_hz` times a second the
+    highest peak and current alert state of each device are packed into a
+    compact message for that device's `levels_group()`. Only devices whose level
+    changed since the last tick are sent, except on periodic keyframes. A client
+    only joins the groups of the devices it watches, so it never receives, or
+    filters out, the levels of every other camera.
+
+    Message format: {"t": epoch ms, "k": 1 on keyframes, "l": [[device_id, peak, alert]]}
+    where alert is 0/1/2 for NONE/YELLOW/RED.
+    """
+
+    def __init__(self, rate_hz: float):
+        self.interval = 1.0 / rate_hz
+        self.lock = threading.Lock()
+        # device_id -> [max peak since the last tick, alert code]
+        self.latest: dict[int, list[int]] = {}
+        self.sent: dict[int, tuple[int, int]] = {}
+        self.last_keyframe = 0.0
+        self.thread: Optional[threading.Thread] = None
+
+    def update(self, device_id: int, peak: int, alert_level: str):
+        with self.lock:
+            entry = self.latest.get(device_id)
+            if entry is None:
+                self.latest[device_id] = [peak, SEVERITY[alert_level]]
+            else:
+                entry[0] = max(entry[0], peak)
+                entry[1] = SEVERITY[alert_level]
+
+    def remove(self, device_id: int):
+        with self.lock:
+            self.latest.pop(device_id, None)
+            self.sent.pop(device_id, None)
+
+    def tick(self, now: float) -> Optional[dict]:
+        """Build the next message, or None if nothing changed"""
+        keyframe = now - self.last_keyframe >= KEYFRAME_INTERVAL
+        if keyframe:
+            self.last_keyframe = now
+
+        levels = []
+        with self.lock:
+            for device_id, entry in self.latest.items():
+                peak, alert = entry
+                quantized = (peak // LEVEL_QUANTUM, alert)
+                if keyframe or self.sent.get(device_id) != quantized:
+                    levels.append([device_id, peak, alert])
+                    self.sent[device_id] = quantized
+                entry[0] = 0  # Start the next tick's max from scratch
+
+        if not levels:
+            return None
+        message = {"t": int(time.time() * 1000), "l": levels}
+        if keyframe:
+            message["k"] = 1
+        return message
+
+    async def run(self):
+        """Publish ticks from an event loop, used by the asyncio engine"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("No channel layer available!")
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            message = self.tick(loop.time())
+            if message is not None:
+                try:
+                    await publish_levels(channel_layer, message)
+                except Exception as e:
+                    logger.error(f"Error publishing levels: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start_thread(self):
+        """Publish ticks from a background thread, used by the threaded engine"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self._run_thread, name="level-stream", daemon=True
+            )
+        self.thread.start()
+
+    def _run_thread(self):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error("No channel layer available!")
+            return
+        send = async_to_sync(publish_levels)
+        while True:
+            started = time.monotonic()
+            message = self.tick(started)
+            if message is not None:
+                try:
+                    send(channel_layer, message)
+                except Exception as e:
+                    logger.error(f"Error publishing levels: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+_stream: Optional[LevelStream] = None
+_stream_lock = threading.Lock()
+
+
+def get_level_stream() -> LevelStream:
+    """The process-wide level stream. Whoever runs the monitors starts its publisher"""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = LevelStream(settings.MONITOR_LEVEL_STREAM_HZ)
+        return _stream
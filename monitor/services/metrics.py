@@ -0,0 +1,266 @@
+"""Prometheus-style metrics for the monitor hot path.
+
+Each process keeps its own registry. Supervisor workers copy a snapshot of theirs
+into the cache every few seconds, and the `/metrics` view renders those together
+with the web process's own metrics in the Prometheus text format, labelled with
+the process they came from.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from typing import Optional, Sequence
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+METRICS_PUBLISH_INTERVAL = 5  # seconds between worker snapshots
+METRICS_WORKERS_KEY = "metrics:workers"
+
+
+def worker_cache_key(index: int) -> str:
+    return f"metrics:worker:{index}"
+
+
+class _Child:
+    """One labelled series. Each is normally updated by a single thread"""
+
+    def __init__(self, buckets: Optional[Sequence[float]] = None):
+        self.lock = threading.Lock()
+        self.value = 0.0
+        self.buckets = buckets
+        if buckets is not None:
+            self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+            self.count = 0
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.value += value
+
+    def sample(self):
+        with self.lock:
+            if self.buckets is None:
+                return self.value
+            return (list(self.counts), self.value, self.count)
+
+
+class Metric:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if kind == "histogram" else None
+        self.children: dict[tuple, _Child] = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values) -> _Child:
+        """The series for these label values. Keep the result around on hot paths"""
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, _Child(self.buckets))
+        return child
+
+    def remove(self, *values):
+        with self.lock:
+            self.children.pop(tuple(str(value) for value in values), None)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            children = list(self.children.items())
+        return {
+            "kind": self.kind,
+            "help": self.help_text,
+            "labelnames": self.labelnames,
+            "buckets": self.buckets,
+            "samples": [(key, child.sample()) for key, child in children],
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Metric:
+        return self.register(Metric(name, help_text, "counter", labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Metric:
+        return self.register(Metric(name, help_text, "gauge", labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Metric(name, help_text, "histogram", labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+CHUNKS_PROCESSED = REGISTRY.counter(
+    "babycam_chunks_processed_total", "Audio chunks analyzed", ["device"]
+)
+CHUNK_READ_SECONDS = REGISTRY.histogram(
+    "babycam_chunk_read_seconds", "Time spent waiting for each audio chunk", ["device"]
+)
+CHUNK_PROCESSING_SECONDS = REGISTRY.histogram(
+    "babycam_chunk_processing_seconds",
+    "Time spent analyzing each audio chunk",
+    ["device"],
+)
+FFMPEG_RESTARTS = REGISTRY.counter(
+    "babycam_ffmpeg_restarts_total",
+    "Times a device's ffmpeg reader exited and was restarted",
+    ["device"],
+)
+PIPE_BACKLOG_BYTES = REGISTRY.gauge(
+    "babycam_pipe_backlog_bytes",
+    "PCM waiting in the ffmpeg pipe, sampled once per broadcast interval",
+    ["device"],
+)
+BROADCAST_SECONDS = REGISTRY.histogram(
+    "babycam_broadcast_seconds",
+    "Time to hand a level message to the channel layer",
+    ["device"],
+)
+ACTIVE_RECORDINGS = REGISTRY.gauge(
+    "babycam_active_recordings", "Clips being recorded", ["device"]
+)
+EVENT_WRITE_SECONDS = REGISTRY.histogram(
+    "babycam_event_write_seconds", "Time to save one batch of audio events"
+)
+EVENT_QUEUE_DEPTH = REGISTRY.gauge(
+    "babycam_event_queue_depth", "Audio events waiting to be saved"
+)
+EVENTS_DROPPED = REGISTRY.counter(
+    "babycam_events_dropped_total", "Audio events discarded by the event sink"
+)
+CLASSIFICATION_SECONDS = REGISTRY.histogram(
+    "babycam_classification_seconds",
+    "Time to classify one candidate window as crying or not",
+    ["device"],
+)
+RECORDINGS_GATED = REGISTRY.counter(
+    "babycam_recordings_gated_total",
+    "RED alerts that didn't start a recording because they didn't sound like crying",
+    ["device"],
+)
+AUDIO_RELAY_DROPPED = REGISTRY.counter(
+    "babycam_audio_relay_dropped_total",
+    "Relayed audio packets dropped because a listener fell behind",
+    ["device"],
+)
+WEBSOCKET_CLIENTS = REGISTRY.gauge(
+    "babycam_websocket_clients", "Connected WebSocket clients", ["consumer"]
+)
+
+
+def publish_snapshot(index: int):
+    """Copy this worker's metrics into the cache for the /metrics view"""
+    cache.set(
+        worker_cache_key(index), REGISTRY.snapshot(), METRICS_PUBLISH_INTERVAL * 3
+    )
+
+
+def start_publisher(index: int) -> threading.Thread:
+    """Publish this worker's metrics every METRICS_PUBLISH_INTERVAL seconds"""
+
+    def run():
+        while True:
+            time.sleep(METRICS_PUBLISH_INTERVAL)
+            try:
+                publish_snapshot(index)
+            except Exception as e:
+                logger.error(f"Error publishing metrics: {e}")
+
+    thread = threading.Thread(target=run, name="metrics-publisher", daemon=True)
+    thread.start()
+    return thread
+
+
+def collect_snapshots() -> dict[str, dict]:
+    """This process's metrics plus every live worker's latest snapshot, by process"""
+    snapshots = {"web": REGISTRY.snapshot()}
+    workers = cache.get(METRICS_WORKERS_KEY) or 0
+    published = cache.get_many([worker_cache_key(index) for index in range(workers)])
+    for index in range(workers):
+        snapshot = published.get(worker_cache_key(index))
+        if snapshot is not None:
+            snapshots[f"worker-{index}"] = snapshot
+    return snapshots
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(snapshots: dict[str, dict]) -> str:
+    """Prometheus text exposition format for snapshots keyed by process name"""
+    merged: dict[str, dict] = {}
+    for process, snapshot in snapshots.items():
+        for name, metric in snapshot.items():
+            entry = merged.setdefault(name, {**metric, "samples": []})
+            for key, sample in metric["samples"]:
+                entry["samples"].append(((process, *key), sample))
+
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = ("process", *metric["labelnames"])
+        for values, sample in metric["samples"]:
+            if metric["kind"] != "histogram":
+                labels = _format_labels(names, values)
+                lines.append(f"{name}{labels} {_format_value(sample)}")
+                continue
+            counts, total, count = sample
+            cumulative = 0
+            bounds = [*metric["buckets"], "+Inf"]
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                labels = _format_labels((*names, "le"), (*values, le))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, values)
+            lines.append(f"{name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{name}_count{labels} {count}")
+    return "\n".join(lines) + "\n"
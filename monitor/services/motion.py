@@ -0,0 +1,83 @@
+import logging
+from typing import Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Motion is scored on a small grayscale copy of the video, cheap to decode and diff
+FRAME_WIDTH = 160
+FRAME_HEIGHT = 120
+# A pixel counts as changed when its brightness moved by more than this (0-255)
+PIXEL_DIFF_THRESHOLD = 25
+
+
+def region_mask(regions: Sequence, width: int, height: int) -> np.ndarray:
+    """Boolean (height, width) mask of the pixels inside any of `regions`.
+
+    Regions are [x0, y0, x1, y1] rectangles in fractions of the frame (0-1), so
+    they don't depend on the analysis resolution. No regions means the whole frame.
+    """
+    if not regions:
+        return np.ones((height, width), dtype=bool)
+    mask = np.zeros((height, width), dtype=bool)
+    for region in regions:
+        try:
+            x0, y0, x1, y1 = (min(max(float(v), 0.0), 1.0) for v in region)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid motion region: {region!r}")
+            continue
+        mask[
+            int(y0 * height) : int(np.ceil(y1 * height)),
+            int(x0 * width) : int(np.ceil(x1 * width)),
+        ] = True
+    return mask
+
+
+class MotionDetector:
+    """Frame-differencing motion score for a fixed-size 8-bit grayscale feed.
+
+    Each frame is compared with the previous one, and the score is the
+    percentage of pixels inside the region mask whose brightness changed by
+    more than `pixel_threshold`. Buffers are allocated once, so a frame costs a
+    few vectorized NumPy calls: well under a millisecond at 160x120.
+    """
+
+    def __init__(
+        self,
+        width: int = FRAME_WIDTH,
+        height: int = FRAME_HEIGHT,
+        regions: Sequence = (),
+        pixel_threshold: int = PIXEL_DIFF_THRESHOLD,
+    ):
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height
+        self.pixel_threshold = pixel_threshold
+        self.previous: Optional[np.ndarray] = None
+        self.diff = np.empty((height, width), dtype=np.int16)
+        self.changed = np.empty((height, width), dtype=bool)
+        self.set_regions(regions)
+
+    def set_regions(self, regions: Sequence):
+        mask = region_mask(regions, self.width, self.height)
+        # Swapped as one tuple so a frame being scored never sees a half-updated mask
+        self.mask = (mask, max(int(np.count_nonzero(mask)), 1))
+
+    def reset(self):
+        """Forget the last frame, e.g. after a reconnect, so the next one isn't diffed against it"""
+        self.previous = None
+
+    def update(self, frame: bytes) -> float:
+        """Score one frame against the previous one, 0-100. The first frame scores 0"""
+        current = np.frombuffer(frame, dtype=np.uint8).reshape(self.height, self.width)
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return 0.0
+
+        mask, mask_pixels = self.mask
+        np.subtract(current, previous, out=self.diff, dtype=np.int16)
+        np.abs(self.diff, out=self.diff)
+        np.greater(self.diff, self.pixel_threshold, out=self.changed)
+        np.logical_and(self.changed, mask, out=self.changed)
+        return 100.0 * np.count_nonzero(self.changed) / mask_pixels
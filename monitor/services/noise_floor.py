@@ -0,0 +1,110 @@
+import logging
+import math
+from typing import Optional
+
+from django.db import connection
+
+from ..models import MonitorDevice
+from .device_config import invalidate_device
+
+logger = logging.getLogger(__name__)
+
+# The floor is this quantile of the level while no alert is active: low enough
+# to ignore crying and clicks, high enough to sit on a fan or white-noise machine.
+FLOOR_QUANTILE = 0.2
+# dB the estimate moves per chunk. At 25 chunks/s it rises at most 0.5 dB/s and
+# falls at most 2 dB/s, so a louder room is learned in well under a minute.
+FLOOR_STEP_DB = 0.1
+# With no saved floor, move 10x faster for the first 250 chunks (10 s)
+WARMUP_CHUNKS = 250
+WARMUP_BOOST = 10
+# Levels below this (digital silence) are treated as this, so the dB stay finite
+MIN_LEVEL = 1.0
+# Share of the step taken while an alert is active. The floor keeps learning
+# so a room that got louder for good (a fan, a white-noise machine) stops
+# alerting within a minute or two, while a few minutes of crying moves it by
+# a few dB at most.
+ALERT_STEP_SCALE = {"NONE": 1.0, "YELLOW": 0.25, "RED": 0.1}
+
+
+def to_db(level: float) -> float:
+    return 20 * math.log10(max(level, MIN_LEVEL))
+
+
+def from_db(db: float) -> float:
+    return 10 ** (db / 20)
+
+
+class NoiseFloor:
+    """Streaming estimate of a low quantile of a device's level, in dB.
+
+    Uses the frugal stochastic quantile update: each level nudges the estimate
+    up by `step * quantile` if it is above it and down by `step * (1 - quantile)`
+    otherwise, which settles where `quantile` of recent levels fall below.
+    That is one float of state, O(1) memory and a few float ops per chunk, and
+    older levels are forgotten on their own so the floor follows the room.
+    """
+
+    def __init__(
+        self,
+        initial: Optional[float] = None,
+        quantile: float = FLOOR_QUANTILE,
+        step_db: float = FLOOR_STEP_DB,
+    ):
+        self.quantile = quantile
+        self.step_db = step_db
+        self.estimate_db: Optional[float] = None
+        self.updates = 0
+        if initial is not None:
+            # A saved floor is already settled, skip the warm-up
+            self.estimate_db = to_db(initial)
+            self.updates = WARMUP_CHUNKS
+
+    @property
+    def value(self) -> Optional[float]:
+        """The floor in the level's own units, None until the first update"""
+        if self.estimate_db is None:
+            return None
+        return from_db(self.estimate_db)
+
+    def update(self, level: float, scale: float = 1.0):
+        """Nudge the estimate towards `level`, by `scale` times the usual step"""
+        x = to_db(level)
+        if self.estimate_db is None:
+            self.estimate_db = x
+            return
+        step = self.step_db * scale
+        if self.updates < WARMUP_CHUNKS:
+            step *= WARMUP_BOOST
+            self.updates += 1
+        if x > self.estimate_db:
+            self.estimate_db += step * self.quantile
+        elif x < self.estimate_db:
+            self.estimate_db -= step * (1 - self.quantile)
+
+    def threshold(self, db_above: float) -> Optional[float]:
+        """The level `db_above` dB over the floor"""
+        if self.estimate_db is None:
+            return None
+        return from_db(self.estimate_db + db_above)
+
+
+def store_noise_floor(device_id: int, floor: Optional[float]):
+    """Save a device's learned floor, None forgets it.
+
+    Uses update() so the post_save handler doesn't send the monitor a reload
+    for a value it produced itself.
+    """
+    try:
+        MonitorDevice.objects.filter(id=device_id).update(noise_floor=floor)
+        invalidate_device(device_id)
+    except Exception as e:
+        logger.error(f"Error saving noise floor of device {device_id}: {e}")
+
+
+def store_noise_floor_in_thread(device_id: int, floor: Optional[float]):
+    """store_noise_floor() for a thread that isn't going to make other queries"""
+    try:
+        store_noise_floor(device_id, floor)
+    finally:
+        connection.close()
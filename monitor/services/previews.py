@@ -0,0 +1,157 @@
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from django.db import connection
+from django.db.models import F
+
+from ..models import Recording
+from .recordings import resolve_recording_path
+
+logger = logging.getLogger(__name__)
+
+# Written next to each clip's playlist
+POSTER_NAME = "poster.jpg"
+WAVEFORM_NAME = "waveform.bin"
+POSTER_WIDTH = 320
+WAVEFORM_BUCKETS = 200
+# Audio is decoded at this rate for the waveform, plenty for a min/max overview
+WAVEFORM_RATE = 8000
+PREVIEW_TIMEOUT = 60  # seconds per ffmpeg call
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def compute_waveform(
+    samples: np.ndarray, buckets: int = WAVEFORM_BUCKETS
+) -> np.ndarray:
+    """Min and max of each of `buckets` equal slices of int16 `samples`.
+
+    Returned as int8 (the top byte of each sample), interleaved as
+    [min0, max0, min1, max1, ...], so a waveform is 2 * `buckets` bytes.
+    """
+    per_bucket = max(1, -(-len(samples) // buckets))
+    padded = np.zeros(per_bucket * buckets, dtype=np.int16)
+    padded[: len(samples)] = samples
+    slices = padded.reshape(buckets, per_bucket)
+    waveform = np.empty((buckets, 2), dtype=np.int8)
+    waveform[:, 0] = slices.min(axis=1) >> 8
+    waveform[:, 1] = slices.max(axis=1) >> 8
+    return waveform.ravel()
+
+
+def decode_audio(playlist: str) -> Optional[np.ndarray]:
+    """A clip's audio as mono int16 at WAVEFORM_RATE, None if it couldn't be decoded"""
+    command = [
+        "ffmpeg",
+        "-loglevel",
+        "error",
+        "-i",
+        playlist,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(WAVEFORM_RATE),
+        "-f",
+        "s16le",
+        "pipe:1",
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=PREVIEW_TIMEOUT)
+    if result.returncode != 0:
+        logger.error(f"Couldn't decode audio of {playlist}: {result.stderr.decode()}")
+        return None
+    usable = len(result.stdout) - len(result.stdout) % 2
+    return np.frombuffer(result.stdout[:usable], dtype=np.int16)
+
+
+def extract_poster(playlist: str, at_seconds: float, output: str) -> bool:
+    """Write one downscaled JPEG frame from `at_seconds` into the clip"""
+    command = [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-ss",
+        f"{at_seconds:.2f}",
+        "-i",
+        playlist,
+        "-frames:v",
+        "1",
+        "-vf",
+        f"scale={POSTER_WIDTH}:-2",
+        "-q:v",
+        "5",
+        output,
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=PREVIEW_TIMEOUT)
+    if result.returncode != 0 or not os.path.exists(output):
+        logger.error(
+            f"Couldn't extract a poster from {playlist}: {result.stderr.decode()}"
+        )
+        return False
+    return True
+
+
+def generate_previews(recording: Recording):
+    """Write a clip's waveform and poster frame and record them on the Recording.
+
+    The poster is taken from the loudest part of the clip, which is usually
+    what woke the monitor up.
+    """
+    playlist = resolve_recording_path(recording.path)
+    clip_dir = os.path.dirname(playlist)
+    added_bytes = 0
+
+    has_waveform = False
+    poster_at = min(1.0, recording.duration / 2)
+    samples = decode_audio(playlist)
+    if samples is not None and len(samples):
+        waveform = compute_waveform(samples)
+        waveform_path = os.path.join(clip_dir, WAVEFORM_NAME)
+        waveform.tofile(waveform_path)
+        added_bytes += waveform.nbytes
+        has_waveform = True
+        loudest = int(
+            np.argmax(np.maximum(-waveform[0::2].astype(np.int16), waveform[1::2]))
+        )
+        poster_at = (loudest + 0.5) * len(samples) / WAVEFORM_BUCKETS / WAVEFORM_RATE
+
+    poster_path = os.path.join(clip_dir, POSTER_NAME)
+    has_poster = extract_poster(playlist, poster_at, poster_path)
+    if has_poster:
+        added_bytes += os.path.getsize(poster_path)
+
+    Recording.objects.filter(id=recording.id).update(
+        has_poster=has_poster,
+        has_waveform=has_waveform,
+        size_bytes=F("size_bytes") + added_bytes,
+    )
+
+
+def _run_previews(recording_id: int):
+    try:
+        generate_previews(Recording.objects.get(id=recording_id))
+    except Recording.DoesNotExist:
+        pass
+    except Exception as e:
+        logger.error(f"Error generating previews for recording {recording_id}: {e}")
+    finally:
+        connection.close()
+
+
+def schedule_previews(recording_id: int):
+    """Generate a clip's previews in the background, one clip at a time per process"""
+    global _executor
+    # Recorders of several devices can finish clips at once
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="clip-previews"
+            )
+    _executor.submit(_run_previews, recording_id)
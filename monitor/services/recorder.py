@@ -0,0 +1,337 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import numpy as np
+
+from .ingest import TS_PACKET_SIZE
+
+logger = logging.getLogger(__name__)
+
+# File names inside each clip's directory, next to the playlist
+INIT_SEGMENT_NAME = "init.mp4"
+SEGMENT_NAME_PATTERN = "seg_%05d.m4s"
+
+TS_SYNC_BYTE = 0x47
+PAT_PID = 0
+# PMT stream_type values of video elementary streams: MPEG-1/2, MPEG-4, H.264, HEVC
+VIDEO_STREAM_TYPES = {0x01, 0x02, 0x10, 0x1B, 0x24}
+
+
+def packet_pids(packets: np.ndarray) -> np.ndarray:
+    """The 13-bit PID of each row of a (n, TS_PACKET_SIZE) packet array"""
+    return ((packets[:, 1].astype(np.uint16) & 0x1F) << 8) | packets[:, 2]
+
+
+def _section(packet: np.ndarray) -> Optional[bytes]:
+    """The PSI section starting in a packet, None if no section starts in it"""
+    if not packet[1] & 0x40 or not packet[3] & 0x10:
+        return None
+    start = 4
+    if packet[3] & 0x20:
+        start += 1 + int(packet[4])
+    if start >= TS_PACKET_SIZE:
+        return None
+    start += 1 + int(packet[start])  # pointer_field
+    return packet[start:].tobytes()
+
+
+def find_video_pid(data: bytes) -> Optional[int]:
+    """PID of the first video elementary stream listed in the chunk's PMT, if any.
+
+    Only looks at sections that fit in one packet, which the PAT and PMT of a
+    camera's few-stream program always do.
+    """
+    packets = np.frombuffer(data, dtype=np.uint8).reshape(-1, TS_PACKET_SIZE)
+    pids = packet_pids(packets)
+    pmt_pids = set()
+    for index in np.flatnonzero(pids == PAT_PID):
+        section = _section(packets[index])
+        if section is None or len(section) < 8 or section[0] != 0x00:
+            continue
+        end = min(3 + (((section[1] & 0x0F) << 8) | section[2]) - 4, len(section))
+        for entry in range(8, end - 3, 4):
+            program = (section[entry] << 8) | section[entry + 1]
+            if program != 0:  # Program 0 points at the network PID, not a PMT
+                pmt_pids.add(((section[entry + 2] & 0x1F) << 8) | section[entry + 3])
+    if not pmt_pids:
+        return None
+
+    for index in np.flatnonzero(np.isin(pids, list(pmt_pids))):
+        section = _section(packets[index])
+        if section is None or len(section) < 12 or section[0] != 0x02:
+            continue
+        end = min(3 + (((section[1] & 0x0F) << 8) | section[2]) - 4, len(section))
+        entry = 12 + (((section[10] & 0x0F) << 8) | section[11])
+        while entry + 5 <= end:
+            stream_type = section[entry]
+            pid = ((section[entry + 1] & 0x1F) << 8) | section[entry + 2]
+            if stream_type in VIDEO_STREAM_TYPES:
+                return pid
+            entry += 5 + (((section[entry + 3] & 0x0F) << 8) | section[entry + 4])
+    return None
+
+
+def find_random_access_point(data: bytes, video_pid: Optional[int]) -> Optional[int]:
+    """Byte offset of the first video TS packet flagged as a random access point, if any.
+
+    Checks the adaptation field's random_access_indicator of every packet in one
+    vectorized pass, on the video PID only: ffmpeg's muxer flags audio frames
+    too, and a clip starting on one of those could open mid-GOP. A clip that
+    starts on such a packet begins with a keyframe. Without a known video PID
+    there is nothing to look for.
+    """
+    if video_pid is None:
+        return None
+    packets = np.frombuffer(data, dtype=np.uint8).reshape(-1, TS_PACKET_SIZE)
+    has_adaptation = (packets[:, 3] & 0x20) != 0
+    rap = (
+        (packets[:, 0] == TS_SYNC_BYTE)
+        & (packet_pids(packets) == video_pid)
+        & has_adaptation
+        & (packets[:, 4] > 0)
+        & ((packets[:, 5] & 0x40) != 0)
+    )
+    hits = np.flatnonzero(rap)
+    if hits.size == 0:
+        return None
+    return int(hits[0]) * TS_PACKET_SIZE
+
+
+class PreRollBuffer:
+    """Memory-bounded ring buffer of the most recent encoded A/V chunks.
+
+    Holds at most `seconds` worth of the feed and never more than `max_bytes`,
+    whichever is hit first. Chunks are stored as-is, nothing is decoded.
+    """
+
+    def __init__(self, seconds: float, max_bytes: int):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        # (arrival time, chunk, offset of the first random access point or None)
+        self.chunks: deque[tuple[float, bytes, Optional[int]]] = deque()
+        self.size = 0
+        # Learned from the PMT, which ffmpeg repeats several times a second
+        self.video_pid: Optional[int] = None
+
+    def append(self, data: bytes, now: Optional[float] = None):
+        if self.seconds <= 0 or self.max_bytes <= 0:
+            return
+        if now is None:
+            now = time.monotonic()
+
+        video_pid = find_video_pid(data)
+        if video_pid is not None:
+            self.video_pid = video_pid
+        self.chunks.append((now, data, find_random_access_point(data, self.video_pid)))
+        self.size += len(data)
+
+        oldest_allowed = now - self.seconds
+        while self.chunks and (
+            self.size > self.max_bytes or self.chunks[0][0] < oldest_allowed
+        ):
+            _, dropped, _ = self.chunks.popleft()
+            self.size -= len(dropped)
+
+    def drain(self) -> tuple[Optional[float], list[bytes]]:
+        """Empty the buffer, returning its contents starting at the first keyframe.
+
+        Also returns the arrival time of the first chunk handed over, None if
+        the buffer was empty.
+        """
+        chunks = list(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+
+        for index, (arrived, data, rap_offset) in enumerate(chunks):
+            if rap_offset is not None:
+                first = data[rap_offset:]
+                return arrived, [first] + [chunk for _, chunk, _ in chunks[index + 1 :]]
+
+        # No keyframe marker seen, hand over everything and let the remuxer sync up
+        if not chunks:
+            return None, []
+        return chunks[0][0], [chunk for _, chunk, _ in chunks]
+
+
+class ClipRecorder:
+    """Writes segments of a device's MPEG-TS feed into HLS clips.
+
+    The recorder never talks to the camera. It is fed by `StreamIngest`, and a
+    clip is a local ffmpeg remux of the pre-roll buffer followed by the packets
+    it receives between `start()` and `stop()`. Each clip is a directory holding
+    an HLS playlist, an fMP4 init segment and `segment_seconds` long fMP4 media
+    segments, so it can be played (and seeked) while it is still being written.
+
+    `on_complete` is called with the playlist path, the clip's wall-clock
+    start (including pre-roll) and end, and the `info` dict passed to `start()`,
+    from a background thread, once a clip has been written.
+    """
+
+    def __init__(
+        self,
+        device_name: str,
+        pre_roll_seconds: float = 0,
+        pre_roll_max_bytes: int = 0,
+        segment_seconds: float = 2,
+        on_complete: Optional[Callable[[str, datetime, datetime, dict], None]] = None,
+    ):
+        self.device_name = device_name
+        self.segment_seconds = segment_seconds
+        self.on_complete = on_complete
+        self.process: Optional[subprocess.Popen] = None
+        self.path: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.info: dict = {}
+        self.lock = threading.Lock()
+        self.pre_roll = PreRollBuffer(pre_roll_seconds, pre_roll_max_bytes)
+
+    @property
+    def recording(self) -> bool:
+        return self.process is not None
+
+    def command(self, path: str) -> list[str]:
+        """The remuxer's command line, creating the clip's directory"""
+        clip_dir = os.path.dirname(path) or "."
+        os.makedirs(clip_dir, exist_ok=True)
+        return [
+            "ffmpeg",
+            "-y",  # Overwrite output files without asking
+            "-loglevel",
+            "error",
+            "-f",
+            "mpegts",
+            "-i",
+            "pipe:0",
+            "-c",
+            "copy",
+            "-f",
+            "hls",
+            "-hls_time",
+            str(self.segment_seconds),
+            # Keep every segment in the playlist, ENDLIST is added when the clip ends
+            "-hls_playlist_type",
+            "event",
+            "-hls_segment_type",
+            "fmp4",
+            "-hls_fmp4_init_filename",
+            INIT_SEGMENT_NAME,
+            "-hls_segment_filename",
+            os.path.join(clip_dir, SEGMENT_NAME_PATTERN),
+            path,
+        ]
+
+    def take_pre_roll(self) -> tuple[datetime, list[bytes]]:
+        """Empty the pre-roll, returning the clip's wall-clock start and its chunks"""
+        pre_roll_start, pre_roll = self.pre_roll.drain()
+        pre_roll_age = (
+            0 if pre_roll_start is None else time.monotonic() - pre_roll_start
+        )
+        return datetime.now(timezone.utc) - timedelta(seconds=pre_roll_age), pre_roll
+
+    def start(self, path: str, info: Optional[dict] = None) -> bool:
+        """Start a new clip with its playlist at `path`, segments are written next to it.
+
+        `info` is handed back to `on_complete`, the caller may keep updating it
+        while the clip records. Returns False if the remuxer couldn't start.
+        """
+        with self.lock:
+            if self.process is not None:
+                return True
+
+            command = self.command(path)
+            try:
+                self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+                self.path = path
+                self.info = info if info is not None else {}
+                self.started_at, pre_roll = self.take_pre_roll()
+                if self.process.stdin is not None:
+                    for chunk in pre_roll:
+                        self.process.stdin.write(chunk)
+                logger.info(
+                    f"Started recording to {path} with {sum(map(len, pre_roll))} bytes of pre-roll"
+                )
+                return True
+            except Exception as e:
+                logger.error(f"Failed to start recording: {e}")
+                process = self._detach()
+                if process is not None:
+                    process.kill()
+                    process.wait()
+                return False
+
+    def feed(self, data: bytes):
+        """Called by the ingest for every chunk of the A/V feed"""
+        with self.lock:
+            process = self.process
+            if process is None or process.stdin is None:
+                self.pre_roll.append(data)
+                return
+            try:
+                process.stdin.write(data)
+                return
+            except (BrokenPipeError, ValueError) as e:
+                logger.error(
+                    f"Recorder for {self.device_name} stopped accepting data: {e}"
+                )
+                clip = (self.path, self.started_at, self.info)
+                self._detach()
+        threading.Thread(
+            target=self._finalize, args=(process, *clip), daemon=True
+        ).start()
+
+    def stop(self):
+        """Finish the current clip"""
+        with self.lock:
+            clip = (self.path, self.started_at, self.info)
+            process = self._detach()
+        if process is None:
+            return
+        # Finish in the background so the audio thread never waits on the last segment
+        threading.Thread(
+            target=self._finalize, args=(process, *clip), daemon=True
+        ).start()
+        logger.info("Stopped recording")
+
+    def _detach(self) -> Optional[subprocess.Popen]:
+        process = self.process
+        self.process = None
+        self.path = None
+        self.started_at = None
+        self.info = {}
+        return process
+
+    def _finalize(
+        self,
+        process: subprocess.Popen,
+        path: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        info: Optional[dict] = None,
+    ):
+        # Done outside the lock so the ingest never blocks on a finishing clip
+        ended_at = datetime.now(timezone.utc)
+        try:
+            # Closing stdin lets ffmpeg flush the last segment and end the playlist
+            if process.stdin is not None:
+                process.stdin.close()
+            process.wait(timeout=5)
+        except Exception as e:
+            logger.error(f"Error stopping recording: {e}")
+            process.kill()
+            process.wait()
+            return
+
+        if process.returncode != 0:
+            logger.error(
+                f"Recorder for {self.device_name} exited with {process.returncode}"
+            )
+        elif path is not None and started_at is not None and self.on_complete:
+            try:
+                self.on_complete(path, started_at, ended_at, info or {})
+            except Exception as e:
+                logger.error(f"Error handling finished recording {path}: {e}")
@@ -0,0 +1,121 @@
+import bisect
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import Recording, RecordingSegment
+from .recorder import INIT_SEGMENT_NAME
+
+PLAYLIST_NAME = "index.m3u8"
+
+
+def recordings_root() -> str:
+    return os.path.realpath(settings.RECORDINGS_ROOT)
+
+
+def new_playlist_path(device_name: str, now: datetime) -> str:
+    """Playlist path, relative to RECORDINGS_ROOT, for a clip starting at `now`.
+
+    Named to the millisecond, with a counter added if that directory is taken,
+    so back-to-back clips never write into the same directory.
+    """
+    clip_dir = f"{device_name}_{now:%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}"
+    name, suffix = clip_dir, 1
+    while os.path.exists(os.path.join(recordings_root(), name)):
+        suffix += 1
+        name = f"{clip_dir}_{suffix}"
+    return os.path.join(name, PLAYLIST_NAME)
+
+
+def resolve_recording_path(path: str) -> str:
+    """Absolute path of a file under RECORDINGS_ROOT. Raises ValueError if it escapes the root"""
+    root = recordings_root()
+    full_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f"Invalid recording path: {path}")
+    return full_path
+
+
+def relative_recording_path(full_path: str) -> str:
+    return os.path.relpath(os.path.realpath(full_path), recordings_root())
+
+
+def parse_playlist(path: str) -> list[tuple[str, float]]:
+    """(segment URI, duration) for every media segment in an HLS playlist"""
+    segments = []
+    duration = None
+    with open(path) as playlist:
+        for line in playlist:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:") :].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((line, duration))
+                duration = None
+    return segments
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def index_recording(
+    device_id: int,
+    path: str,
+    started_at: datetime,
+    ended_at: datetime,
+    max_peak: int = 0,
+    max_alert: str = "NONE",
+) -> Recording:
+    """Add a finished clip and its segments to the recording index"""
+    playlist_path = resolve_recording_path(path)
+    clip_dir = os.path.dirname(playlist_path)
+
+    segments = []
+    offset = 0.0
+    size = _file_size(playlist_path) + _file_size(
+        os.path.join(clip_dir, INIT_SEGMENT_NAME)
+    )
+    for sequence, (uri, duration) in enumerate(parse_playlist(playlist_path)):
+        segment_size = _file_size(os.path.join(clip_dir, uri))
+        segments.append(
+            RecordingSegment(
+                sequence=sequence,
+                uri=uri,
+                started_at=started_at + timedelta(seconds=offset),
+                offset=offset,
+                duration=duration,
+                size_bytes=segment_size,
+            )
+        )
+        offset += duration
+        size += segment_size
+
+    with transaction.atomic():
+        recording = Recording.objects.create(
+            device_id=device_id,
+            path=path,
+            started_at=started_at,
+            ended_at=ended_at,
+            duration=offset or (ended_at - started_at).total_seconds(),
+            size_bytes=size,
+            max_peak=max_peak,
+            max_alert=max_alert,
+        )
+        for segment in segments:
+            segment.recording = recording
+        RecordingSegment.objects.bulk_create(segments)
+    return recording
+
+
+def segment_at(offsets: list[float], offset: float) -> Optional[int]:
+    """Index of the segment covering `offset` seconds, given each segment's start offset"""
+    if not offsets or offset < 0:
+        return None
+    return bisect.bisect_right(offsets, offset) - 1
@@ -0,0 +1,98 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import AudioEvent, AudioEventHourRollup, AudioEventMinuteRollup
+
+logger = logging.getLogger(__name__)
+
+PRUNE_BATCH_SIZE = 5000
+
+
+def _minute(ts: datetime) -> datetime:
+    return ts.replace(second=0, microsecond=0)
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def update_rollups(events: Iterable[AudioEvent]):
+    """Fold newly saved events into the minute and hour rollup tables.
+
+    Events are aggregated in memory first, so a batch only costs one upsert per
+    (device, bucket) it touches.
+    """
+    # Each event covers one broadcast interval of the monitor that produced it
+    interval = settings.MONITOR_BROADCAST_INTERVAL
+
+    for model, truncate in (
+        (AudioEventMinuteRollup, _minute),
+        (AudioEventHourRollup, _hour),
+    ):
+        totals: dict[tuple[int, datetime], dict] = defaultdict(
+            lambda: {"max_peak": 0, "yellow_count": 0, "red_count": 0, "loud_seconds": 0.0}
+        )
+        for event in events:
+            ts = event.timestamp
+            if isinstance(ts, str):
+                ts = datetime.fromisoformat(ts)
+            if timezone.is_naive(ts):
+                ts = timezone.make_aware(ts)
+            total = totals[(event.device_id, truncate(ts))]
+            total["max_peak"] = max(total["max_peak"], event.peak_value)
+            if event.alert_level == "RED":
+                total["red_count"] += 1
+            elif event.alert_level == "YELLOW":
+                total["yellow_count"] += 1
+            if event.alert_level != "NONE":
+                total["loud_seconds"] += interval
+
+        for (device_id, bucket), total in totals.items():
+            _upsert(model, device_id, bucket, total)
+
+
+def _upsert(model, device_id: int, bucket: datetime, total: dict):
+    def increment() -> int:
+        return model.objects.filter(device_id=device_id, bucket=bucket).update(
+            max_peak=Greatest(F("max_peak"), total["max_peak"]),
+            yellow_count=F("yellow_count") + total["yellow_count"],
+            red_count=F("red_count") + total["red_count"],
+            loud_seconds=F("loud_seconds") + total["loud_seconds"],
+        )
+
+    if increment():
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(device_id=device_id, bucket=bucket, **total)
+    except IntegrityError:
+        # Another writer created the bucket first
+        increment()
+
+
+def prune_raw_events(days: int) -> int:
+    """Delete raw AudioEvents older than `days`, in batches. Rollups are kept"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(
+            AudioEvent.objects.filter(timestamp__lt=cutoff).values_list("id", flat=True)[
+                :PRUNE_BATCH_SIZE
+            ]
+        )
+        if not ids:
+            break
+        count, _ = AudioEvent.objects.filter(id__in=ids).delete()
+        deleted += count
+
+    if deleted:
+        logger.info(f"Pruned {deleted} audio events older than {days} days")
+    return deleted
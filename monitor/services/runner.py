@@ -0,0 +1,113 @@
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from django.db import close_old_connections
+
+from ..models import MonitorDevice
+from .audio_monitor import AudioMonitorService
+from .connection_state import (
+    CONNECTING,
+    RECONNECTING,
+    STOPPED,
+    publish_connection_state,
+)
+from .device_config import get_device
+from .metrics import FFMPEG_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+RESTART_BACKOFF_MIN = 1  # seconds
+RESTART_BACKOFF_MAX = 60  # seconds
+HEALTHY_RUN_SECONDS = 30  # a run at least this long resets the backoff
+
+
+def restart_delay(backoff: float) -> float:
+    """`backoff` with jitter, so cameras that dropped together don't reconnect in lockstep"""
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class DeviceRunner:
+    """Keeps one device's monitor running inside a supervisor worker.
+
+    When the ffmpeg reader crashes, hits EOF or stalls, the runner waits out a
+    jittered exponential backoff and starts a fresh monitor. Each step is sent to
+    the device's monitor sockets as a connection state. Config changes reach the
+    running monitor through `reload()`.
+    """
+
+    def __init__(self, device_id: int):
+        self.device_id = device_id
+        self.monitor: Optional[AudioMonitorService] = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"monitor-{device_id}", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.stop()
+        self.thread.join(timeout=5)
+
+    def reload(self):
+        """Hand the device's latest config to the running monitor"""
+        monitor = self.monitor
+        if monitor is None:
+            return
+        close_old_connections()
+        try:
+            monitor.reload_device(get_device(self.device_id))
+        except Exception as e:
+            logger.error(f"Couldn't reload config for device {self.device_id}: {e}")
+
+    def run(self):
+        backoff = RESTART_BACKOFF_MIN
+        while not self.stop_event.is_set():
+            started_at = time.monotonic()
+            close_old_connections()
+            reason = None
+            try:
+                device = get_device(self.device_id, credentials=True)
+                self.monitor = AudioMonitorService(device)
+                self.monitor.running = True
+                # stop() may have run before the monitor existed
+                if self.stop_event.is_set():
+                    break
+                publish_connection_state(self.device_id, CONNECTING)
+                self.monitor.process_audio()
+                reason = self.monitor.disconnect_reason
+            except MonitorDevice.DoesNotExist:
+                logger.error(f"Device {self.device_id} no longer exists, giving up")
+                return
+            except Exception as e:
+                logger.error(f"Monitor for device {self.device_id} crashed: {e}")
+                reason = str(e)
+            finally:
+                self.monitor = None
+
+            if self.stop_event.is_set():
+                break
+
+            FFMPEG_RESTARTS.labels(self.device_id).inc()
+            if time.monotonic() - started_at >= HEALTHY_RUN_SECONDS:
+                backoff = RESTART_BACKOFF_MIN
+            delay = restart_delay(backoff)
+            logger.warning(
+                f"Reader for device {self.device_id} exited ({reason}), "
+                f"restarting in {delay:.1f}s"
+            )
+            publish_connection_state(
+                self.device_id, RECONNECTING, reason=reason, retry_in=round(delay, 1)
+            )
+            self.stop_event.wait(delay)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+        publish_connection_state(self.device_id, STOPPED)
+        logger.info(f"Runner for device {self.device_id} stopped")
@@ -0,0 +1,142 @@
+import wave
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import numpy as np
+
+from ..models import MonitorDevice
+from .ingest import StreamIngest
+
+
+class AudioSource(ABC):
+    """Where a monitor's mono int16 PCM comes from.
+
+    Sources are file-like: `readinto()` fills as much of the buffer as it can and
+    returns the number of bytes written, 0 at the end of the stream.
+    """
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def readinto(self, buffer: memoryview) -> int:
+        """Fill as much of `buffer` as possible, returning the bytes written"""
+
+    def close(self):
+        pass
+
+    def backlog(self) -> int:
+        """Bytes ready to read but not yet consumed, 0 if unknown"""
+        return 0
+
+    def disconnect_reason(self) -> str:
+        return "end of stream"
+
+
+class LiveStreamSource(AudioSource):
+    """PCM from the device's camera stream, via the shared ffmpeg ingest"""
+
+    def __init__(
+        self,
+        device: MonitorDevice,
+        rate: int,
+        on_av_data: Callable[[bytes], None],
+        on_video_frame: Optional[Callable[[bytes], None]] = None,
+    ):
+        self.ingest = StreamIngest(device, rate, on_av_data, on_video_frame)
+
+    def open(self):
+        self.ingest.start()
+
+    def readinto(self, buffer: memoryview) -> int:
+        return self.ingest.readinto(buffer)
+
+    def close(self):
+        self.ingest.stop()
+
+    def disconnect_reason(self) -> str:
+        return self.ingest.disconnect_reason()
+
+    def backlog(self) -> int:
+        return self.ingest.pcm_backlog()
+
+
+class ArraySource(AudioSource):
+    """Serves PCM from an in-memory int16 array, `loops` times over"""
+
+    def __init__(self, samples: np.ndarray, loops: int = 1):
+        self.samples = np.ascontiguousarray(samples, dtype=np.int16)
+        self.remaining = len(self.samples) * loops
+        self.position = 0
+
+    def readinto(self, buffer: memoryview) -> int:
+        out = np.frombuffer(buffer, dtype=np.int16)
+        written = 0
+        while written < len(out) and self.remaining > 0:
+            n = min(
+                len(out) - written,
+                len(self.samples) - self.position,
+                self.remaining,
+            )
+            out[written : written + n] = self.samples[self.position : self.position + n]
+            written += n
+            self.remaining -= n
+            self.position = (self.position + n) % len(self.samples)
+        return written * 2
+
+
+class WavFileSource(ArraySource):
+    """A 16-bit WAV file, mixed down to mono and resampled to `rate` on load"""
+
+    def __init__(self, path: str, rate: int, loops: int = 1):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit WAV files are supported")
+            channels = wav.getnchannels()
+            file_rate = wav.getframerate()
+            frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+        samples = frames.reshape(-1, channels).mean(axis=1)
+        if file_rate != rate:
+            duration = len(samples) / file_rate
+            target = np.linspace(0, duration, int(duration * rate), endpoint=False)
+            samples = np.interp(target, np.arange(len(samples)) / file_rate, samples)
+        super().__init__(samples.astype(np.int16), loops)
+
+
+class SyntheticSource(ArraySource):
+    """Generated nursery audio: a noise floor with periodic cry-like bursts and clicks.
+
+    One `pattern_seconds` block is generated up front and repeated until
+    `seconds` of audio have been served, so generating never shows up in a
+    benchmark.
+    """
+
+    def __init__(
+        self,
+        rate: int,
+        seconds: float,
+        pattern_seconds: int = 60,
+        seed: Optional[int] = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        n = rate * pattern_seconds
+        t = np.arange(n) / rate
+        samples = rng.normal(0, 200, n)
+
+        # A 3 s cry every 20 s: 450 Hz fundamental with harmonics, amplitude-modulated
+        for start in range(5, pattern_seconds, 20):
+            cry = slice(start * rate, (start + 3) * rate)
+            tone = sum(
+                np.sin(2 * np.pi * 450 * h * t[cry]) / h for h in (1, 2, 3, 4)
+            )
+            samples[cry] += 6000 * tone * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t[cry]))
+
+        # A short click (door, toy) every 15 s
+        for start in range(12, pattern_seconds, 15):
+            click = slice(start * rate, start * rate + rate // 200)
+            samples[click] += rng.normal(0, 15000, click.stop - click.start)
+
+        samples = np.clip(samples, -32768, 32767).astype(np.int16)
+        super().__init__(samples, loops=1)
+        self.remaining = int(seconds * rate)
@@ -0,0 +1,148 @@
+import logging
+import os
+import shutil
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, QuerySet, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+
+from ..models import AudioEvent, MonitorDevice, Recording
+from .alert_state import SEVERITY
+from .recordings import recordings_root, resolve_recording_path
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def device_quota_bytes(device: MonitorDevice) -> int:
+    """Bytes a device's clips may use, 0 for no limit"""
+    return (device.recording_quota_mb or settings.RECORDINGS_DEVICE_MAX_MB) * MB
+
+
+def eviction_order(recordings: QuerySet) -> QuerySet:
+    """Least important clips first.
+
+    Clips that never reached a higher alert level go first, then the oldest
+    day's clips, the quietest of each day first.
+    """
+    severity = Case(
+        *[When(max_alert=level, then=Value(rank)) for level, rank in SEVERITY.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return recordings.annotate(severity=severity, day=TruncDate("started_at")).order_by(
+        "severity", "day", "max_peak", "started_at"
+    )
+
+
+def usage() -> dict:
+    """Bytes and clip counts per device and overall, from the recording index.
+
+    Sizes come from the Recording table, so this never walks RECORDINGS_ROOT.
+    """
+    devices = MonitorDevice.objects.annotate(
+        used_bytes=Coalesce(Sum("recordings__size_bytes"), 0),
+        clips=Count("recordings"),
+    ).order_by("id")
+    per_device = [
+        {
+            "device_id": device.id,
+            "name": device.name,
+            "bytes": device.used_bytes,
+            "clips": device.clips,
+            "quota_bytes": device_quota_bytes(device),
+        }
+        for device in devices
+    ]
+    root = recordings_root()
+    disk = shutil.disk_usage(root if os.path.isdir(root) else settings.BASE_DIR)
+    return {
+        "bytes": sum(d["bytes"] for d in per_device),
+        "clips": sum(d["clips"] for d in per_device),
+        "quota_bytes": settings.RECORDINGS_MAX_MB * MB,
+        "min_free_bytes": settings.RECORDINGS_MIN_FREE_MB * MB,
+        "disk": {"total": disk.total, "used": disk.used, "free": disk.free},
+        "devices": per_device,
+    }
+
+
+def evict(recording: Recording):
+    """Delete a clip's files and its index entry, unlinking the events that pointed at it"""
+    clip_dir = os.path.dirname(resolve_recording_path(recording.path))
+    if clip_dir != recordings_root():
+        shutil.rmtree(clip_dir, ignore_errors=True)
+    with transaction.atomic():
+        AudioEvent.objects.filter(
+            device_id=recording.device_id,
+            timestamp__range=(recording.started_at, recording.ended_at),
+            recording_path=recording.path,
+        ).update(recording_path=None)
+        recording.delete()
+    logger.info(
+        f"Evicted recording {recording.path} ({recording.size_bytes} bytes, "
+        f"{recording.max_alert}, peak {recording.max_peak})"
+    )
+
+
+def evict_bytes(recordings: QuerySet, excess: int) -> tuple[int, int]:
+    """Evict clips from `recordings`, least important first, until `excess` bytes are freed.
+
+    Returns (clips evicted, bytes freed).
+    """
+    evicted = freed = 0
+    if excess <= 0:
+        return evicted, freed
+    for recording in eviction_order(recordings).iterator():
+        evict(recording)
+        evicted += 1
+        freed += recording.size_bytes
+        if freed >= excess:
+            break
+    return evicted, freed
+
+
+def enforce_quotas() -> tuple[int, int]:
+    """Apply the per-device, overall and minimum free space limits.
+
+    Returns (clips evicted, bytes freed).
+    """
+    evicted = freed = 0
+    current = usage()
+
+    for device in current["devices"]:
+        quota = device["quota_bytes"]
+        if quota and device["bytes"] > quota:
+            n, size = evict_bytes(
+                Recording.objects.filter(device_id=device["device_id"]),
+                device["bytes"] - quota,
+            )
+            evicted += n
+            freed += size
+
+    total_quota = current["quota_bytes"]
+    if total_quota and current["bytes"] - freed > total_quota:
+        n, size = evict_bytes(
+            Recording.objects.all(), current["bytes"] - freed - total_quota
+        )
+        evicted += n
+        freed += size
+
+    min_free = current["min_free_bytes"]
+    if min_free:
+        free = current["disk"]["free"] + freed
+        if free < min_free:
+            logger.warning(
+                f"Only {free // MB} MB free on the recordings disk, evicting clips "
+                f"to get back to {min_free // MB} MB"
+            )
+            n, size = evict_bytes(Recording.objects.all(), min_free - free)
+            evicted += n
+            freed += size
+
+    if evicted:
+        logger.info(
+            f"Storage quotas: evicted {evicted} recordings, freed {freed} bytes"
+        )
+    return evicted, freed
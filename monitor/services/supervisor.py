@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import MonitorDevice
+from .metrics import METRICS_WORKERS_KEY
+from .rollups import prune_raw_events
+from .storage import enforce_quotas
+from .worker import worker_main
+
+logger = logging.getLogger(__name__)
+
+# Channel layer channel the views use to send start/stop commands to the supervisor
+CONTROL_CHANNEL = "monitor.control"
+
+WORKER_CHECK_INTERVAL = 2  # seconds
+WORKER_RESTART_BACKOFF_MAX = 60  # seconds
+WORKER_HEALTHY_SECONDS = 60  # a worker alive this long gets its backoff reset
+RETENTION_INTERVAL = 6 * 60 * 60  # seconds between raw AudioEvent prunes
+STORAGE_INTERVAL = 60  # seconds between recording quota checks
+
+
+def send_control(action: str, device_id: int):
+    """Ask the running supervisor to start, stop or reload the config of a device"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        raise RuntimeError("No channel layer available to reach the monitor supervisor")
+    async_to_sync(channel_layer.send)(
+        CONTROL_CHANNEL,
+        {"type": "monitor.control", "action": action, "device_id": int(device_id)},
+    )
+
+
+@dataclass
+class WorkerHandle:
+    index: int
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    commands: Optional[multiprocessing.Queue] = None
+    device_ids: set[int] = field(default_factory=set)
+    restart_backoff: float = 1
+    restart_at: float = 0
+    started_at: float = 0
+
+
+class MonitorSupervisor:
+    """Owns every device monitor on this machine.
+
+    Devices are spread over a pool of worker processes (one per core by default)
+    so analysis isn't serialized behind one GIL. Each worker runs either a
+    reader thread per device or, with the "asyncio" engine, all of its devices on
+    one event loop. Start/stop requests arrive over
+    the channel layer on CONTROL_CHANNEL, and workers that die are respawned with
+    backoff and get their devices back. It also applies the AudioEvent retention
+    policy and keeps recordings within their disk quotas.
+    """
+
+    def __init__(self, num_workers: int = 0, engine: str = ""):
+        if num_workers <= 0:
+            num_workers = settings.MONITOR_WORKERS or os.cpu_count() or 1
+        self.engine = engine or settings.MONITOR_ENGINE
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = [WorkerHandle(index=i) for i in range(num_workers)]
+        self.stopping = False
+
+    def spawn_worker(self, worker: WorkerHandle, now: float = 0):
+        worker.started_at = now
+        worker.commands = self.context.Queue()
+        worker.process = self.context.Process(
+            target=worker_main,
+            args=(worker.commands, worker.index, self.engine),
+            name=f"monitor-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        for device_id in worker.device_ids:
+            worker.commands.put(("start", device_id))
+
+    def start_device(self, device_id: int):
+        if any(device_id in worker.device_ids for worker in self.workers):
+            return
+        worker = min(self.workers, key=lambda w: len(w.device_ids))
+        worker.device_ids.add(device_id)
+        if worker.commands is not None:
+            worker.commands.put(("start", device_id))
+        logger.info(f"Device {device_id} assigned to worker {worker.index}")
+
+    def stop_device(self, device_id: int):
+        for worker in self.workers:
+            if device_id in worker.device_ids:
+                worker.device_ids.discard(device_id)
+                if worker.commands is not None:
+                    worker.commands.put(("stop", device_id))
+                logger.info(f"Device {device_id} stopped on worker {worker.index}")
+
+    def reload_device(self, device_id: int):
+        """Tell the worker running a device to pick up its new config"""
+        for worker in self.workers:
+            if device_id in worker.device_ids and worker.commands is not None:
+                worker.commands.put(("reload", device_id))
+
+    def handle_control(self, message: dict):
+        action = message.get("action")
+        device_id = message.get("device_id")
+        if device_id is None:
+            logger.error(f"Control message without device_id: {message}")
+            return
+        if action == "start":
+            self.start_device(device_id)
+        elif action == "stop":
+            self.stop_device(device_id)
+        elif action == "reload":
+            self.reload_device(device_id)
+        else:
+            logger.error(f"Unknown control action: {action}")
+
+    def check_workers(self):
+        """Respawn dead workers, backing off if they keep dying"""
+        now = asyncio.get_running_loop().time()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                if now - worker.started_at >= WORKER_HEALTHY_SECONDS:
+                    worker.restart_backoff = 1
+                continue
+            if worker.process is not None:
+                logger.error(
+                    f"Worker {worker.index} exited with code {worker.process.exitcode}, "
+                    f"restarting in {worker.restart_backoff}s"
+                )
+                worker.process = None
+                worker.restart_at = now + worker.restart_backoff
+                worker.restart_backoff = min(
+                    worker.restart_backoff * 2, WORKER_RESTART_BACKOFF_MAX
+                )
+            if now >= worker.restart_at:
+                self.spawn_worker(worker, now)
+
+    async def control_loop(self, channel_layer):
+        while not self.stopping:
+            message = await channel_layer.receive(CONTROL_CHANNEL)
+            self.handle_control(message)
+
+    async def health_loop(self):
+        while not self.stopping:
+            self.check_workers()
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+
+    async def retention_loop(self):
+        while not self.stopping:
+            try:
+                await asyncio.to_thread(
+                    prune_raw_events, settings.AUDIO_EVENT_RETENTION_DAYS
+                )
+            except Exception as e:
+                logger.error(f"Error pruning audio events: {e}")
+            await asyncio.sleep(RETENTION_INTERVAL)
+
+    async def storage_loop(self):
+        while not self.stopping:
+            try:
+                await asyncio.to_thread(enforce_quotas)
+            except Exception as e:
+                logger.error(f"Error enforcing recording quotas: {e}")
+            await asyncio.sleep(STORAGE_INTERVAL)
+
+    async def run(self):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            raise RuntimeError("No channel layer available for monitor control")
+
+        now = asyncio.get_running_loop().time()
+        for worker in self.workers:
+            self.spawn_worker(worker, now)
+        # Tells the /metrics view how many worker snapshots to look for
+        await asyncio.to_thread(cache.set, METRICS_WORKERS_KEY, len(self.workers), None)
+
+        device_ids = await asyncio.to_thread(
+            lambda: list(
+                MonitorDevice.objects.filter(is_active=True).values_list("id", flat=True)
+            )
+        )
+        for device_id in device_ids:
+            self.start_device(device_id)
+
+        logger.info(
+            f"Monitor supervisor running {len(device_ids)} devices on {len(self.workers)} workers"
+        )
+        try:
+            await asyncio.gather(
+                self.control_loop(channel_layer),
+                self.health_loop(),
+                self.retention_loop(),
+                self.storage_loop(),
+            )
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process is None or worker.commands is None:
+                continue
+            worker.commands.put(("shutdown", None))
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        logger.info("Monitor supervisor stopped")
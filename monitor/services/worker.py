@@ -0,0 +1,91 @@
+"""Entry point for supervisor worker processes.
+
+Only stdlib imports at module level: this module is imported by freshly spawned
+processes before Django has been set up.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+
+def worker_main(commands: multiprocessing.Queue, index: int, engine: str = "threads"):
+    """Run the device monitors assigned to this worker until told to shut down"""
+    import django
+
+    django.setup()
+
+    if engine == "asyncio":
+        asyncio.run(run_async_worker(commands, index))
+    else:
+        run_thread_worker(commands, index)
+
+
+def run_thread_worker(commands: multiprocessing.Queue, index: int):
+    """One blocking reader thread per device"""
+    from .event_sink import get_event_sink
+    from .level_stream import get_level_stream
+    from .metrics import start_publisher
+    from .runner import DeviceRunner
+
+    runners: dict[int, DeviceRunner] = {}
+    get_level_stream().start_thread()
+    start_publisher(index)
+    logger.info(f"Monitor worker {index} started")
+
+    try:
+        while True:
+            action, device_id = commands.get()
+            if action == "start":
+                existing = runners.get(device_id)
+                if existing is not None and existing.thread.is_alive():
+                    continue
+                runners[device_id] = DeviceRunner(device_id)
+                runners[device_id].start()
+            elif action == "stop":
+                runner = runners.pop(device_id, None)
+                if runner is not None:
+                    runner.stop()
+            elif action == "reload":
+                runner = runners.get(device_id)
+                if runner is not None:
+                    runner.reload()
+            elif action == "shutdown":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for runner in runners.values():
+            runner.stop()
+        get_event_sink().close()
+        logger.info(f"Monitor worker {index} stopped")
+
+
+async def run_async_worker(commands: multiprocessing.Queue, index: int):
+    """All of this worker's devices on one event loop"""
+    from .async_engine import AsyncMonitorEngine
+    from .event_sink import get_event_sink
+    from .metrics import start_publisher
+
+    engine = AsyncMonitorEngine()
+    await engine.start()
+    start_publisher(index)
+    logger.info(f"Monitor worker {index} started (asyncio engine)")
+
+    try:
+        while True:
+            action, device_id = await asyncio.to_thread(commands.get)
+            if action == "start":
+                engine.start_device(device_id)
+            elif action == "stop":
+                await engine.stop_device(device_id)
+            elif action == "reload":
+                await engine.reload_device(device_id)
+            elif action == "shutdown":
+                break
+    finally:
+        await engine.shutdown()
+        await asyncio.to_thread(get_event_sink().close)
+        logger.info(f"Monitor worker {index} stopped")
@@ -0,0 +1,33 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MonitorDevice
+from .services.device_config import invalidate_device
+from .services.supervisor import send_control
+
+logger = logging.getLogger(__name__)
+
+
+def _device_changed(device_id: int):
+    invalidate_device(device_id)
+    try:
+        # Running monitors pick up the new thresholds without a restart
+        send_control("reload", device_id)
+    except Exception as e:
+        logger.warning(
+            f"Couldn't notify the monitor supervisor about device {device_id}: {e}"
+        )
+
+
+@receiver(post_save, sender=MonitorDevice)
+def device_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _device_changed(instance.id))
+
+
+@receiver(post_delete, sender=MonitorDevice)
+def device_deleted(sender, instance, **kwargs):
+    device_id = instance.id
+    transaction.on_commit(lambda: invalidate_device(device_id))
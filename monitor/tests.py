@@ -1,3 +1,989 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import math
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .management.commands.benchmark_monitor import BenchmarkMonitor
+from .models import AudioEvent, ChatMessage, MonitorDevice
+from .services import chat_history
+from .services import ingest
+from .services.alert_state import AlertStateMachine
+from .services.audio_relay import AudioRelay, RelayPublisher, mark_listening
+from .services import classifier
+from .services.classifier import (
+    CRY_LABEL,
+    MODEL_VERSION,
+    NOISE_LABEL,
+    CryClassifier,
+    LogMelFeatures,
+    hz_to_mel,
+    mel_to_hz,
+)
+from .services.device_config import get_device, invalidate_device
+from .services.event_sink import EventSink
+from .services.features import BatchFeatureExtractor, FeatureExtractor
+from .services.motion import MotionDetector, region_mask
+from .services.noise_floor import (
+    ALERT_STEP_SCALE,
+    FLOOR_QUANTILE,
+    FLOOR_STEP_DB,
+    WARMUP_CHUNKS,
+    NoiseFloor,
+    from_db,
+    to_db,
+)
+from .services.recorder import (
+    PAT_PID,
+    PreRollBuffer,
+    find_random_access_point,
+    find_video_pid,
+)
+from .services.recordings import new_playlist_path
+from .views import _decode_cursor, _encode_cursor, serve_recording_file
+
+RATE = 48000
+CHUNK_FRAMES = 1920  # 40 ms, as the monitor reads
+CHUNK_SECONDS = CHUNK_FRAMES / RATE
+
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+AUDIO_PID = 0x101
+
+
+def tone(amplitude: float, frequency: float = 440.0) -> np.ndarray:
+    """One chunk of a sine tone peaking at `amplitude`, as int16 PCM"""
+    t = np.arange(CHUNK_FRAMES) / RATE
+    return np.round(amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def pcm(*parts: tuple[float, float]) -> np.ndarray:
+    """Synthetic PCM of (amplitude, seconds) sections, split into chunks"""
+    chunks = []
+    for amplitude, seconds in parts:
+        chunks.extend(tone(amplitude) for _ in range(round(seconds / CHUNK_SECONDS)))
+    return np.stack(chunks)
+
+
+class AlertStateMachineTests(SimpleTestCase):
+    def setUp(self):
+        self.extractor = FeatureExtractor(RATE, CHUNK_FRAMES)
+        self.machine = AlertStateMachine(
+            yellow_threshold=1000, red_threshold=5000, sustain=0.2, release=1.0
+        )
+        self.now = 0.0
+
+    def feed(self, chunks: np.ndarray) -> list[str]:
+        """Run the chunks' peaks through the machine, returns the state after each"""
+        states = []
+        for chunk in chunks:
+            self.now += CHUNK_SECONDS
+            peak = self.extractor.extract(chunk)["peak"]
+            states.append(self.machine.update(peak, self.now))
+        return states
+
+    def test_quiet_stays_none(self):
+        self.assertEqual(set(self.feed(pcm((200, 2.0)))), {"NONE"})
+
+    def test_short_burst_is_not_sustained(self):
+        # A 120 ms slam is well above RED but shorter than the 200 ms sustain
+        states = self.feed(pcm((200, 0.4), (20000, 0.12), (200, 0.4)))
+        self.assertEqual(set(states), {"NONE"})
+
+    def test_sustained_level_escalates(self):
+        states = self.feed(pcm((200, 0.4), (2000, 0.4)))
+        # Above YELLOW from chunk 10, raised once 200 ms have passed
+        self.assertEqual(states[:15], ["NONE"] * 15)
+        self.assertEqual(states[15:], ["YELLOW"] * 5)
+
+    def test_loud_level_goes_straight_to_red(self):
+        states = self.feed(pcm((20000, 0.4)))
+        self.assertNotIn("YELLOW", states)
+        self.assertEqual(states[-1], "RED")
+
+    def test_hysteresis_holds_alert_between_exit_and_enter(self):
+        # 900 is below the 1000 enter threshold but above the 800 exit threshold
+        self.feed(pcm((2000, 0.4)))
+        states = self.feed(pcm((900, 3.0)))
+        self.assertEqual(set(states), {"YELLOW"})
+
+    def test_release_waits_for_release_time(self):
+        self.feed(pcm((2000, 0.4)))
+        states = self.feed(pcm((200, 1.2)))
+        # The first quiet chunk starts the timer, released 1 s after it
+        self.assertEqual(states[:25], ["YELLOW"] * 25)
+        self.assertEqual(states[25:], ["NONE"] * 5)
+
+    def test_level_back_above_exit_restarts_release(self):
+        self.feed(pcm((2000, 0.4)))
+        states = self.feed(pcm((200, 0.8), (900, 0.08), (200, 0.8)))
+        self.assertEqual(set(states), {"YELLOW"})
+
+    def test_red_releases_to_yellow_then_none(self):
+        self.feed(pcm((20000, 0.4)))
+        # Between YELLOW's and RED's exit thresholds: RED steps down to YELLOW
+        states = self.feed(pcm((2000, 1.2)))
+        self.assertEqual(states[0], "RED")
+        self.assertEqual(states[-1], "YELLOW")
+        states = self.feed(pcm((200, 1.2)))
+        self.assertEqual(states[-1], "NONE")
+
+    def test_red_releases_straight_to_none_when_quiet(self):
+        self.feed(pcm((20000, 0.4)))
+        states = self.feed(pcm((200, 1.2)))
+        self.assertNotIn("YELLOW", states)
+        self.assertEqual(states[-1], "NONE")
+
+    def test_configure_keeps_state(self):
+        self.feed(pcm((2000, 0.4)))
+        self.machine.configure(yellow_threshold=3000, red_threshold=6000)
+        self.assertEqual(self.machine.state, "YELLOW")
+        # Now below the new exit threshold, so it releases
+        states = self.feed(pcm((2000, 1.2)))
+        self.assertEqual(states[-1], "NONE")
+
+
+class ServeRecordingFileTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(RECORDINGS_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.data = bytes(range(100))
+        with open(f"{root.name}/segment.m4s", "wb") as f:
+            f.write(self.data)
+        self.factory = RequestFactory()
+
+    def get(self, path="segment.m4s", **headers):
+        request = self.factory.get(f"/api/recordings/files/{path}", headers=headers)
+        return serve_recording_file(request, path)
+
+    def test_no_range_sends_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Type"], "video/iso.segment")
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+
+    def test_closed_range(self):
+        response = self.get(Range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(b"".join(response.streaming_content), self.data[10:20])
+
+    def test_open_ended_range(self):
+        response = self.get(Range="bytes=90-")
+        self.assertEqual(response["Content-Range"], "bytes 90-99/100")
+        self.assertEqual(b"".join(response.streaming_content), self.data[90:])
+
+    def test_end_past_file_is_clamped(self):
+        response = self.get(Range="bytes=95-500")
+        self.assertEqual(response["Content-Range"], "bytes 95-99/100")
+        self.assertEqual(b"".join(response.streaming_content), self.data[95:])
+
+    def test_suffix_range(self):
+        response = self.get(Range="bytes=-30")
+        self.assertEqual(response["Content-Range"], "bytes 70-99/100")
+        self.assertEqual(b"".join(response.streaming_content), self.data[70:])
+
+    def test_suffix_longer_than_file(self):
+        response = self.get(Range="bytes=-500")
+        self.assertEqual(response["Content-Range"], "bytes 0-99/100")
+
+    def test_unsatisfiable_ranges(self):
+        for header in ("bytes=100-", "bytes=50-40"):
+            with self.subTest(header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_multipart_or_malformed_range_sends_whole_file(self):
+        for header in ("bytes=0-9,20-29", "bytes=-", "items=0-9"):
+            with self.subTest(header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b"".join(response.streaming_content), self.data)
+
+    def test_path_outside_root_is_not_found(self):
+        self.assertEqual(self.get("../etc/passwd").status_code, 404)
+        self.assertEqual(self.get("missing.m4s").status_code, 404)
+
+
+class RegionMaskTests(SimpleTestCase):
+    def test_no_regions_is_whole_frame(self):
+        self.assertTrue(region_mask([], 16, 12).all())
+
+    def test_region_in_fractions_of_the_frame(self):
+        mask = region_mask([[0.5, 0.0, 1.0, 0.5]], 16, 12)
+        self.assertEqual(mask.shape, (12, 16))
+        self.assertTrue(mask[:6, 8:].all())
+        self.assertEqual(np.count_nonzero(mask), 6 * 8)
+
+    def test_regions_are_combined_and_clamped(self):
+        mask = region_mask([[-1, -1, 0.25, 0.25], [0.75, 0.75, 2, 2]], 16, 12)
+        self.assertEqual(np.count_nonzero(mask), 2 * 3 * 4)
+        self.assertTrue(mask[0, 0] and mask[11, 15])
+
+    def test_invalid_regions_are_ignored(self):
+        with self.assertLogs("monitor.services.motion", "WARNING") as logs:
+            mask = region_mask([[0, 0, 1], ["a", 0, 1, 1], [0, 0, 0.5, 0.5]], 16, 12)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(np.count_nonzero(mask), 6 * 8)
+
+
+class MotionDetectorTests(SimpleTestCase):
+    def setUp(self):
+        self.detector = MotionDetector(width=16, height=12)
+
+    def frame(self, brightness=0, box=None, box_brightness=255) -> bytes:
+        """A flat gray frame, optionally with a (x0, y0, x1, y1) pixel box drawn in"""
+        pixels = np.full((12, 16), brightness, dtype=np.uint8)
+        if box:
+            x0, y0, x1, y1 = box
+            pixels[y0:y1, x0:x1] = box_brightness
+        return pixels.tobytes()
+
+    def test_first_frame_scores_zero(self):
+        self.assertEqual(self.detector.update(self.frame(box=(0, 0, 8, 6))), 0.0)
+
+    def test_still_frames_score_zero(self):
+        self.detector.update(self.frame(100))
+        self.assertEqual(self.detector.update(self.frame(100)), 0.0)
+
+    def test_score_is_percentage_of_changed_pixels(self):
+        self.detector.update(self.frame())
+        # A quarter of the frame flips from black to white
+        self.assertEqual(self.detector.update(self.frame(box=(0, 0, 8, 6))), 25.0)
+        # and back, which is a change too
+        self.assertEqual(self.detector.update(self.frame()), 25.0)
+
+    def test_small_brightness_changes_are_ignored(self):
+        self.detector.update(self.frame(100))
+        self.assertEqual(self.detector.update(self.frame(120)), 0.0)
+        self.assertEqual(self.detector.update(self.frame(105)), 0.0)
+        # Darkening past the threshold counts like brightening
+        self.assertEqual(self.detector.update(self.frame(60)), 100.0)
+
+    def test_score_is_relative_to_regions(self):
+        self.detector.set_regions([[0.0, 0.0, 0.5, 0.5]])
+        self.detector.update(self.frame())
+        self.assertEqual(self.detector.update(self.frame(box=(0, 0, 4, 6))), 50.0)
+        # Motion outside the regions doesn't count
+        self.detector.update(self.frame())
+        self.assertEqual(self.detector.update(self.frame(box=(8, 6, 16, 12))), 0.0)
+
+    def test_reset_forgets_last_frame(self):
+        self.detector.update(self.frame())
+        self.detector.reset()
+        self.assertEqual(self.detector.update(self.frame(255)), 0.0)
+
+
+class BatchFeatureExtractorTests(SimpleTestCase):
+    def setUp(self):
+        self.extractor = FeatureExtractor(RATE, CHUNK_FRAMES)
+        self.batch = BatchFeatureExtractor(RATE, CHUNK_FRAMES, capacity=2)
+
+    def assertMatchesExtract(self, chunks: np.ndarray):
+        results = self.batch.extract_batch(chunks)
+        self.assertEqual(len(results), len(chunks))
+        for i, (chunk, features) in enumerate(zip(chunks, results)):
+            expected = self.extractor.extract(chunk)
+            self.assertEqual(features.keys(), expected.keys())
+            for name, value in expected.items():
+                with self.subTest(row=i, feature=name):
+                    self.assertIsInstance(features[name], float)
+                    self.assertAlmostEqual(
+                        features[name], value, delta=max(abs(value) * 1e-4, 1e-3)
+                    )
+
+    def test_matches_extract_row_for_row(self):
+        rng = np.random.default_rng(0)
+        chunks = np.stack(
+            [
+                tone(3000),
+                tone(12000, frequency=150),
+                tone(500, frequency=5000),
+                rng.integers(-8000, 8000, CHUNK_FRAMES, dtype=np.int16),
+            ]
+        )
+        # More rows than the initial capacity, so the scratch buffers grow
+        self.assertMatchesExtract(chunks)
+        self.assertGreaterEqual(self.batch.capacity, len(chunks))
+        # and fewer afterwards reuse them
+        self.assertMatchesExtract(chunks[1:3])
+
+    def test_silence_and_full_scale(self):
+        chunks = np.stack(
+            [
+                np.zeros(CHUNK_FRAMES, dtype=np.int16),
+                np.full(CHUNK_FRAMES, -32768, dtype=np.int16),
+            ]
+        )
+        self.assertMatchesExtract(chunks)
+        silence, full_scale = self.batch.extract_batch(chunks)
+        self.assertEqual(silence["crest_factor"], 0.0)
+        self.assertEqual(full_scale["peak"], 32768.0)
+
+
+class NoiseFloorTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def room(self, low_db: float, high_db: float, chunks: int) -> np.ndarray:
+        """Levels spread evenly in dB between low_db and high_db"""
+        return from_db(self.rng.uniform(low_db, high_db, chunks))
+
+    def test_no_estimate_before_first_update(self):
+        floor = NoiseFloor()
+        self.assertIsNone(floor.value)
+        self.assertIsNone(floor.threshold(10))
+        floor.update(100)
+        self.assertAlmostEqual(floor.value, 100)
+        self.assertAlmostEqual(to_db(floor.threshold(6)), to_db(100) + 6)
+
+    def test_converges_to_quantile(self):
+        floor = NoiseFloor()
+        for level in self.room(30, 50, 5000):
+            floor.update(level)
+        # 20% of levels uniform over 30-50 dB fall below 34 dB
+        self.assertAlmostEqual(floor.estimate_db, 34, delta=1)
+
+    def test_follows_a_louder_room(self):
+        floor = NoiseFloor(initial=from_db(34))
+        # 3 minutes of a fan 12 dB louder
+        for level in self.room(42, 62, 180 * 25):
+            floor.update(level)
+        self.assertAlmostEqual(floor.estimate_db, 46, delta=1)
+
+    def test_warmup_learns_fast_without_saved_floor(self):
+        floor = NoiseFloor()
+        floor.update(from_db(20))
+        for level in self.room(30, 50, WARMUP_CHUNKS):
+            floor.update(level)
+        self.assertAlmostEqual(floor.estimate_db, 34, delta=2)
+
+    def test_saved_floor_skips_warmup(self):
+        floor = NoiseFloor(initial=from_db(20))
+        for _ in range(100):
+            floor.update(from_db(60))
+        self.assertAlmostEqual(
+            floor.estimate_db, 20 + 100 * FLOOR_STEP_DB * FLOOR_QUANTILE
+        )
+
+    def test_alert_scale_slows_learning(self):
+        floor = NoiseFloor(initial=from_db(40))
+        for _ in range(100):
+            floor.update(from_db(70), ALERT_STEP_SCALE["RED"])
+        # 4 s of crying moves the floor by a fraction of a dB
+        self.assertLess(floor.estimate_db - 40, 0.25)
+        self.assertGreater(floor.estimate_db, 40)
+
+    def test_silence_stays_finite(self):
+        floor = NoiseFloor()
+        for _ in range(10):
+            floor.update(0)
+        self.assertEqual(floor.estimate_db, 0.0)
+
+
+def ts_packet(pid: int, payload: bytes = b"", start=False, adaptation=None) -> bytes:
+    """One 188-byte MPEG-TS packet, `adaptation` is the field after its length byte"""
+    header = bytes([0x47, (0x40 if start else 0) | pid >> 8, pid & 0xFF])
+    control = 0x10 if payload else 0
+    body = b""
+    if adaptation is not None:
+        control |= 0x20
+        room = 183 - len(payload) - len(adaptation)
+        body = bytes([len(adaptation) + room]) + adaptation + b"\xff" * room
+    body += payload
+    return header + bytes([control]) + body + b"\xff" * (184 - len(body))
+
+
+def psi(table_id: int, body: bytes) -> bytes:
+    """A section after a zero pointer_field, with a dummy CRC"""
+    length = len(body) + 4
+    return bytes([0, table_id, 0xB0 | length >> 8, length & 0xFF]) + body + bytes(4)
+
+
+def pat(pmt_pid: int = PMT_PID) -> bytes:
+    # Program 0 points at the network PID and must not be taken for a PMT
+    programs = bytes([0, 0, 0xE0, 0x10, 0, 1, 0xE0 | pmt_pid >> 8, pmt_pid & 0xFF])
+    return ts_packet(PAT_PID, psi(0x00, bytes([0, 1, 0xC1, 0, 0]) + programs), True)
+
+
+def pmt(*streams: tuple[int, int]) -> bytes:
+    """A PMT listing (stream_type, pid) streams, the first with a descriptor"""
+    entries = b""
+    for i, (stream_type, pid) in enumerate(streams):
+        descriptor = b"" if i else bytes([0x0A, 2, 0x65, 0x6E])
+        entries += bytes([stream_type, 0xE0 | pid >> 8, pid & 0xFF, 0xF0])
+        entries += bytes([len(descriptor)]) + descriptor
+    header = bytes([0, 1, 0xC1, 0, 0, 0xE1, 0, 0xF0, 0])
+    return ts_packet(PMT_PID, psi(0x02, header + entries), True)
+
+
+def pes(pid: int, random_access=False) -> bytes:
+    """A payload packet, flagged as a random access point if asked"""
+    adaptation = bytes([0x40]) if random_access else None
+    return ts_packet(pid, b"\x00\x00\x01\xe0", True, adaptation)
+
+
+class MpegTsTests(SimpleTestCase):
+    def test_video_pid_from_pat_and_pmt(self):
+        data = pat() + pmt((0x0F, AUDIO_PID), (0x1B, VIDEO_PID)) + pes(VIDEO_PID)
+        self.assertEqual(find_video_pid(data), VIDEO_PID)
+
+    def test_no_video_pid(self):
+        self.assertIsNone(find_video_pid(pat() + pmt((0x0F, AUDIO_PID))))
+        # A PMT without the PAT pointing at it isn't read
+        self.assertIsNone(find_video_pid(pmt((0x1B, VIDEO_PID))))
+        self.assertIsNone(find_video_pid(pes(VIDEO_PID) + pes(AUDIO_PID)))
+
+    def test_truncated_sections_are_skipped(self):
+        # Section lengths running past the packet, and a PMT cut inside its loop
+        long_pat = bytearray(pat())
+        long_pat[7] = 0xFF
+        short_pmt = bytearray(pmt((0x0F, AUDIO_PID), (0x1B, VIDEO_PID)))
+        short_pmt[7] = 0x14
+        self.assertIsNone(find_video_pid(bytes(long_pat) + bytes(short_pmt)))
+        self.assertIsNone(find_video_pid(pat() + bytes(short_pmt)))
+        full_pmt = pmt((0x0F, AUDIO_PID), (0x1B, VIDEO_PID))
+        self.assertEqual(find_video_pid(bytes(long_pat) + full_pmt), VIDEO_PID)
+
+    def test_adaptation_only_packets(self):
+        # No payload: a PAT/PMT can't start here, but a video RAI can
+        stuffing = ts_packet(PMT_PID, start=True, adaptation=b"\x00")
+        self.assertIsNone(find_video_pid(pat() + stuffing))
+        rap = ts_packet(VIDEO_PID, adaptation=b"\x40")
+        self.assertEqual(find_random_access_point(pes(VIDEO_PID) + rap, VIDEO_PID), 188)
+        # An empty adaptation field has no flags, the payload after it isn't read as one
+        empty = bytes([0x47, VIDEO_PID >> 8, VIDEO_PID & 0xFF, 0x30, 0, 0x40])
+        empty += bytes(182)
+        self.assertIsNone(find_random_access_point(empty, VIDEO_PID))
+        # A PMT whose adaptation field leaves no room for the section is skipped
+        self.assertIsNone(
+            find_video_pid(pat() + ts_packet(PMT_PID, b"\x00", True, bytes(182)))
+        )
+
+    def test_random_access_point_on_video_pid_only(self):
+        data = pes(AUDIO_PID, random_access=True) + pes(VIDEO_PID)
+        data += pes(VIDEO_PID, random_access=True)
+        self.assertEqual(find_random_access_point(data, VIDEO_PID), 2 * 188)
+        self.assertIsNone(find_random_access_point(data[: 2 * 188], VIDEO_PID))
+        self.assertIsNone(find_random_access_point(data, None))
+
+
+class PreRollBufferTests(SimpleTestCase):
+    def test_learns_video_pid_and_drains_from_keyframe(self):
+        buffer = PreRollBuffer(seconds=10, max_bytes=1 << 20)
+        header = pat() + pmt((0x0F, AUDIO_PID), (0x1B, VIDEO_PID))
+        buffer.append(header + pes(AUDIO_PID, random_access=True), now=0)
+        keyframe = pes(VIDEO_PID, random_access=True) + pes(AUDIO_PID)
+        buffer.append(pes(VIDEO_PID) + keyframe, now=1)
+        self.assertEqual(buffer.video_pid, VIDEO_PID)
+
+        started, chunks = buffer.drain()
+        self.assertEqual(started, 1)
+        self.assertEqual(chunks, [keyframe])
+        self.assertEqual((buffer.size, len(buffer.chunks)), (0, 0))
+
+    def test_eviction_keeps_a_keyframe_start(self):
+        buffer = PreRollBuffer(seconds=2.5, max_bytes=1 << 20)
+        buffer.append(pat() + pmt((0x1B, VIDEO_PID)), now=0)
+        gops = []
+        for second in range(1, 6):
+            gop = pes(VIDEO_PID, random_access=True) + pes(VIDEO_PID)
+            gops.append(gop)
+            buffer.append(gop, now=second)
+        # The chunk with the PMT was evicted long ago, the PID is remembered
+        self.assertEqual(len(buffer.chunks), 3)
+
+        started, chunks = buffer.drain()
+        self.assertEqual(started, 3)
+        self.assertEqual(chunks, gops[2:])
+        self.assertEqual(chunks[0][:188], pes(VIDEO_PID, random_access=True))
+
+    def test_byte_limit_evicts_oldest(self):
+        buffer = PreRollBuffer(seconds=60, max_bytes=3 * 188)
+        buffer.append(pat() + pmt((0x1B, VIDEO_PID)), now=0)
+        buffer.append(pes(VIDEO_PID, random_access=True), now=1)
+        buffer.append(pes(VIDEO_PID) + pes(VIDEO_PID, random_access=True), now=2)
+        self.assertEqual(buffer.size, 3 * 188)
+        started, chunks = buffer.drain()
+        self.assertEqual((started, len(chunks)), (1, 2))
+
+    def test_no_keyframe_hands_over_everything(self):
+        buffer = PreRollBuffer(seconds=10, max_bytes=1 << 20)
+        buffer.append(pes(AUDIO_PID, random_access=True), now=0)
+        buffer.append(pes(VIDEO_PID, random_access=True), now=1)
+        # Without a PMT the video PID is unknown, no packet counts as a keyframe
+        self.assertEqual(
+            buffer.drain(), (0, [pes(AUDIO_PID, True), pes(VIDEO_PID, True)])
+        )
+        self.assertEqual(buffer.drain(), (None, []))
+
+    def test_disabled(self):
+        buffer = PreRollBuffer(seconds=0, max_bytes=1 << 20)
+        buffer.append(pat(), now=0)
+        self.assertEqual(buffer.drain(), (None, []))
+
+
+class StreamIngestCommandTests(SimpleTestCase):
+    def setUp(self):
+        device = MonitorDevice(
+            name="nursery", stream_url="rtsp://camera/audio", motion_enabled=True
+        )
+        self.ingest = ingest.StreamIngest(device, RATE, lambda data: None, len)
+        self.addCleanup(ingest._videoless_streams.clear)
+
+    def test_motion_output_maps_video_optionally(self):
+        self.assertTrue(self.ingest.decodes_video)
+        command = self.ingest.build_command(3, 4)
+        # The motion output follows the A/V one
+        motion = command[command.index("pipe:3") + 1 :]
+        self.assertEqual(motion[:2], ["-map", "0:v:0?"])
+        self.assertEqual(motion[-1], "pipe:4")
+
+    def test_stream_without_video_reconnects_without_motion_output(self):
+        with self.assertLogs("monitor.services.ingest", "WARNING"):
+            self.ingest.log_stderr(
+                "[out#2/rawvideo @ 0x1] Output file does not contain any stream\n"
+            )
+        self.assertFalse(self.ingest.decodes_video)
+        read_fds, write_fds = self.ingest.open_pipes()
+        for fd in read_fds + write_fds:
+            os.close(fd)
+        self.assertEqual(len(read_fds), 1)
+        again = ingest.StreamIngest(self.ingest.device, RATE, lambda data: None, len)
+        self.assertFalse(again.decodes_video)
+
+
+class EventSinkCoalesceTests(SimpleTestCase):
+    def setUp(self):
+        # Never started, so everything past the first event overflows
+        self.sink = EventSink(max_queue=1)
+        self.sink.put(self.event("NONE", 100))
+
+    def event(self, alert_level, peak, **fields) -> AudioEvent:
+        return AudioEvent(
+            device_id=1,
+            alert_level=alert_level,
+            peak_value=peak,
+            rms=peak / 4,
+            band_mid=peak / 2,
+            **fields,
+        )
+
+    def test_keeps_features_of_the_worst_event(self):
+        self.sink.put(self.event("YELLOW", 2000, motion_score=40.0))
+        self.sink.put(
+            self.event("RED", 6000, sound_label="crying", sound_confidence=0.7)
+        )
+        # Louder but less severe, and a quieter RED
+        self.sink.put(self.event("YELLOW", 9000, motion_score=5.0))
+        self.sink.put(
+            self.event("RED", 5500, sound_label="speech", sound_confidence=0.4)
+        )
+
+        pending = self.sink.coalesced[1]
+        self.assertEqual(self.sink.stats()["coalesced"], 3)
+        self.assertEqual((pending.alert_level, pending.peak_value), ("RED", 6000))
+        self.assertEqual((pending.rms, pending.band_mid), (1500, 3000))
+        self.assertEqual(pending.motion_score, 40.0)
+        self.assertEqual(pending.sound_label, "crying")
+        self.assertEqual(pending.sound_confidence, 0.7)
+
+    def test_louder_event_of_same_level_wins(self):
+        self.sink.put(self.event("RED", 6000, recording_path="a/index.m3u8"))
+        self.sink.put(self.event("RED", 8000))
+        pending = self.sink.coalesced[1]
+        self.assertEqual((pending.peak_value, pending.rms), (8000, 2000))
+        self.assertEqual(pending.recording_path, "a/index.m3u8")
+
+    def test_drop_policy(self):
+        sink = EventSink(max_queue=1, overflow="drop")
+        sink.put(self.event("NONE", 100))
+        sink.put(self.event("RED", 6000))
+        self.assertEqual(sink.coalesced, {})
+        self.assertEqual(sink.stats()["dropped"], 1)
+
+
+class NewPlaylistPathTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(RECORDINGS_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = root.name
+
+    def test_clips_in_the_same_second_get_their_own_directory(self):
+        now = datetime(2024, 5, 1, 12, 30, 5, 250000)
+        first = new_playlist_path("nursery", now)
+        self.assertEqual(first, "nursery_20240501_123005_250/index.m3u8")
+        os.makedirs(os.path.join(self.root, os.path.dirname(first)))
+        later = new_playlist_path("nursery", now.replace(microsecond=900000))
+        self.assertEqual(later, "nursery_20240501_123005_900/index.m3u8")
+
+    def test_taken_directory_gets_a_counter(self):
+        now = datetime(2024, 5, 1, 12, 30, 5, 250000)
+        paths = []
+        for _ in range(3):
+            path = new_playlist_path("nursery", now)
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)))
+            paths.append(os.path.dirname(path))
+        self.assertEqual(
+            paths,
+            [
+                "nursery_20240501_123005_250",
+                "nursery_20240501_123005_250_2",
+                "nursery_20240501_123005_250_3",
+            ],
+        )
+
+
+class RelayPublisherTests(SimpleTestCase):
+    def setUp(self):
+        self.publisher = RelayPublisher(max_queue=2)
+        self.relay = AudioRelay(7, RATE, self.publisher.publish, poll_listeners=False)
+        # Checked by hand below instead of from the publisher's thread
+        self.publisher.relays[7] = self.relay
+
+    def test_listener_checks_turn_relay_on_and_off(self):
+        self.publisher.check_listeners()
+        self.assertFalse(self.relay.listening)
+        mark_listening(7)
+        self.addCleanup(cache.clear)
+        self.publisher.check_listeners()
+        self.assertTrue(self.relay.listening)
+        self.publisher.unregister(self.relay)
+        self.assertFalse(self.relay.listening)
+        self.assertEqual(self.publisher.relays, {})
+
+    def test_full_queue_drops_packets_without_blocking(self):
+        self.relay.set_listening(True)
+        # 1 s of audio is five 200 ms packets, only two fit in the queue
+        with self.assertLogs("monitor.services.audio_relay", "WARNING"):
+            for _ in range(25):
+                self.relay.feed(tone(1000), 0)
+        self.assertEqual(self.publisher.queue.qsize(), 2)
+        self.assertEqual(self.publisher.dropped, 3)
+        first = self.publisher.queue.get_nowait()
+        self.assertEqual((first["device_id"], first["seq"]), (7, 0))
+        self.assertEqual(len(first["pcm"]), 2 * 16000 * 200 // 1000)
+
+
+class DeviceConfigTests(TestCase):
+    def setUp(self):
+        self.device = MonitorDevice.objects.create(
+            name="nursery",
+            stream_url="rtsp://camera/audio",
+            username="admin",
+            password="secret",
+        )
+        self.addCleanup(cache.clear)
+
+    def test_cached_config_without_queries_or_credentials(self):
+        get_device(self.device.id)
+        with self.assertNumQueries(0):
+            device = get_device(self.device.id)
+        self.assertEqual(device.name, "nursery")
+        self.assertEqual(device.get_deferred_fields(), {"username", "password"})
+        with self.assertNumQueries(1):
+            device = get_device(self.device.id, credentials=True)
+        self.assertEqual(device.password, "secret")
+
+    def test_saved_config_is_read_again(self):
+        get_device(self.device.id)
+        MonitorDevice.objects.filter(id=self.device.id).update(name="bedroom")
+        invalidate_device(self.device.id)
+        self.assertEqual(get_device(self.device.id).name, "bedroom")
+
+    def test_falls_back_to_database_when_cache_is_down(self):
+        broken = mock.Mock()
+        for method in ("get", "add", "set", "incr"):
+            getattr(broken, method).side_effect = ConnectionError("cache down")
+        with mock.patch("monitor.services.device_config.cache", broken):
+            with self.assertLogs("monitor.services.device_config", "WARNING"):
+                device = get_device(self.device.id)
+            self.assertEqual(device.password, "secret")
+            with self.assertLogs("monitor.services.device_config", "ERROR"):
+                invalidate_device(self.device.id)
+        with self.assertRaises(MonitorDevice.DoesNotExist):
+            get_device(self.device.id + 1)
+
+
+class DeviceEventsTests(TestCase):
+    def setUp(self):
+        self.device = MonitorDevice.objects.create(
+            name="nursery", stream_url="rtsp://camera/audio"
+        )
+        self.addCleanup(cache.clear)
+        start = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+        # Three events share a timestamp, so pages have to break the tie on id
+        offsets = [0, 1, 1, 1, 2, 3]
+        self.events = [
+            AudioEvent.objects.create(
+                device=self.device,
+                timestamp=start + timedelta(seconds=offset),
+                peak_value=1000 + i,
+                alert_level="YELLOW",
+            )
+            for i, offset in enumerate(offsets)
+        ]
+        self.url = reverse("get_device_events", args=[self.device.id])
+
+    def newest_first(self, events):
+        return [e.id for e in sorted(events, key=lambda e: (e.timestamp, e.id))][::-1]
+
+    def test_cursor_round_trip(self):
+        event = {
+            "id": 42,
+            "timestamp": datetime(2024, 5, 1, 12, 0, 1, 500, timezone.utc),
+        }
+        self.assertEqual(
+            _decode_cursor(_encode_cursor(event)), (event["timestamp"], 42)
+        )
+
+    def test_pages_cover_duplicate_timestamps_exactly_once(self):
+        ids, cursor = [], None
+        for _ in range(10):
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(self.url, params).json()
+            ids.extend(event["id"] for event in page["events"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.newest_first(self.events))
+
+    def test_time_range(self):
+        page = self.client.get(
+            self.url,
+            {
+                "since": "2024-05-01T12:00:01+00:00",
+                "until": "2024-05-01T12:00:03+00:00",
+            },
+        ).json()
+        self.assertEqual(
+            [event["id"] for event in page["events"]],
+            self.newest_first(self.events[1:5]),
+        )
+        self.assertIsNone(page["next_cursor"])
+
+    def test_invalid_cursor_is_bad_request(self):
+        for cursor in (
+            "not base64!",
+            base64.urlsafe_b64encode(b"no separator").decode(),
+            base64.urlsafe_b64encode(b"yesterday|1").decode(),
+            base64.urlsafe_b64encode(b"2024-05-01T12:00:00|x").decode(),
+        ):
+            with self.subTest(cursor):
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+
+    def test_ndjson_export_streams_every_event(self):
+        response = self.client.get(self.url, {"format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["id"] for row in rows], self.newest_first(self.events))
+        self.assertEqual(rows[-1]["timestamp"], "2024-05-01T12:00:00+00:00")
+
+    def test_csv_export_has_header_and_every_event(self):
+        response = self.client.get(self.url, {"format": "csv"})
+        self.assertIn('filename="nursery_events.csv"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode()
+        header, *rows = csv.reader(content.splitlines())
+        self.assertEqual(header[:4], ["id", "timestamp", "peak_value", "alert_level"])
+        self.assertEqual([int(row[0]) for row in rows], self.newest_first(self.events))
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.room_id = chat_history.get_room_id("nursery")
+
+    def say(self, text: str) -> int:
+        return chat_history.save_message(
+            "nursery",
+            {"user": "parent", "text": text, "timestamp": "2024-05-01T12:00:00Z"},
+        )
+
+    def texts(self, page) -> list[str]:
+        return [message["text"] for message in page["messages"]]
+
+    def test_recent_page_is_cached_until_the_next_message(self):
+        self.say("first")
+        generation = chat_history.history_generation(self.room_id)
+        self.assertEqual(self.texts(chat_history.fetch_recent("nursery")), ["first"])
+        with self.assertNumQueries(0):
+            chat_history.fetch_recent("nursery")
+
+        self.say("second")
+        self.assertEqual(chat_history.history_generation(self.room_id), generation + 1)
+        page = chat_history.fetch_recent("nursery")
+        self.assertEqual(self.texts(page), ["first", "second"])
+        self.assertFalse(page["has_more"])
+
+    def test_page_cached_before_a_write_is_not_served_after_it(self):
+        generation = chat_history.history_generation(self.room_id)
+        self.say("hello")
+        # A reader that queried just before the write caches under the old generation
+        cache.set(
+            chat_history.recent_cache_key(self.room_id, generation),
+            {"messages": [], "has_more": False},
+        )
+        self.assertEqual(self.texts(chat_history.fetch_recent("nursery")), ["hello"])
+
+    def test_deleting_history_invalidates_the_cache(self):
+        self.say("hello")
+        chat_history.fetch_recent("nursery")
+        response = self.client.delete(reverse("delete_chat_history", args=["nursery"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.assertEqual(chat_history.fetch_recent("nursery")["messages"], [])
+
+    def test_load_older_pages_back_through_history(self):
+        ids = [self.say(f"message {i}") for i in range(7)]
+        page = chat_history.fetch_older("nursery", ids[-1], limit=3)
+        self.assertEqual(self.texts(page), ["message 3", "message 4", "message 5"])
+        self.assertTrue(page["has_more"])
+        page = chat_history.fetch_older("nursery", page["messages"][0]["id"], limit=3)
+        self.assertEqual(self.texts(page), ["message 0", "message 1", "message 2"])
+        self.assertFalse(page["has_more"])
+        # Limits are clamped like the socket's
+        page = chat_history.fetch_older("nursery", ids[-1], limit=0)
+        self.assertEqual(self.texts(page), ["message 5"])
+
+
+def cry_model(weights, bias, mean=None, scale=None, n_mels=2) -> dict:
+    size = 2 * n_mels
+    return {
+        "version": MODEL_VERSION,
+        "rate": RATE,
+        "frame": CHUNK_FRAMES,
+        "n_mels": n_mels,
+        "mean": mean or [0.0] * size,
+        "scale": scale or [1.0] * size,
+        "weights": weights,
+        "bias": bias,
+    }
+
+
+class CryClassifierTests(SimpleTestCase):
+    def test_log_mel_features_of_a_tone(self):
+        features = LogMelFeatures(RATE, CHUNK_FRAMES)
+        vector = features.extract(np.stack([tone(8000, frequency=1000)] * 5))
+        self.assertEqual(vector.shape, (features.size,))
+        # Identical frames: no spread over time, and the loudest band is the tone's
+        self.assertTrue(np.allclose(vector[features.size // 2 :], 0, atol=1e-4))
+        centers = mel_to_hz(np.linspace(hz_to_mel(100), hz_to_mel(8000), 34))[1:-1]
+        self.assertAlmostEqual(
+            centers[np.argmax(vector[: features.size // 2])], 1000, delta=100
+        )
+
+    def test_silence_stays_finite(self):
+        vector = LogMelFeatures(RATE, CHUNK_FRAMES, n_mels=2).extract(
+            np.zeros((3, CHUNK_FRAMES), dtype=np.int16)
+        )
+        # log10 of the floor, computed in float32
+        np.testing.assert_allclose(vector, [-10, -10, 0, 0], atol=1e-5)
+
+    def test_hand_built_model_probability(self):
+        # Silence's features are [-10, -10, 0, 0], standardized the first is 0.5
+        model = CryClassifier(
+            cry_model([1.0, 0, 0, 0], 0.0, mean=[-12, -12, 0, 0], scale=[4, 4, 1, 1])
+        )
+        silence = np.zeros((25, CHUNK_FRAMES), dtype=np.int16)
+        expected = 1 / (1 + math.exp(-0.5))
+        self.assertAlmostEqual(model.cry_probability(silence), expected, places=6)
+        result = model.classify(silence)
+        self.assertEqual(
+            (result.label, result.cry_probability), (CRY_LABEL, result.confidence)
+        )
+
+        model = CryClassifier(cry_model([0, 0, 0, 0], -1.0))
+        result = model.classify(silence)
+        self.assertEqual(result.label, NOISE_LABEL)
+        self.assertAlmostEqual(result.confidence, 1 - 1 / (1 + math.e))
+
+    def test_loading_models(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            json.dump(cry_model([0, 0, 0, 0], 0.0), f)
+            f.flush()
+            self.assertEqual(CryClassifier.load(f.name).features.size, 4)
+        with self.assertRaises(ValueError):
+            CryClassifier(
+                {**cry_model([0, 0, 0, 0], 0.0), "version": MODEL_VERSION + 1}
+            )
+        with self.assertRaises(ValueError):
+            CryClassifier(cry_model([0, 0, 0], 0.0))
+
+    def test_missing_or_broken_model_file_means_no_classifier(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            f.write("{not json")
+            f.flush()
+            for path in (f.name + ".missing", f.name):
+                with self.subTest(path), override_settings(CRY_MODEL_PATH=path):
+                    with mock.patch.object(classifier, "_classifier_loaded", False):
+                        with self.assertLogs("monitor.services.classifier"):
+                            self.assertIsNone(classifier.get_classifier())
+
+
+class CryGatingTests(SimpleTestCase):
+    def monitor(self, model=None, threshold=0.5) -> BenchmarkMonitor:
+        device = MonitorDevice(
+            id=99,
+            name="nursery",
+            stream_url="rtsp://camera/audio",
+            cry_confidence_threshold=threshold,
+        )
+        monitor = BenchmarkMonitor(device, None)
+        monitor.classifier = model
+        monitor.recent_audio = np.zeros(
+            (monitor.CLASSIFY_CHUNKS, CHUNK_FRAMES), dtype=np.int16
+        )
+        return monitor
+
+    def scream(self, monitor, seconds=1.0):
+        """Feed a RED-level tone through the detection path"""
+        for chunk in pcm((20000, seconds)):
+            monitor.frames_consumed += CHUNK_FRAMES
+            monitor.process_chunk(chunk, monitor.stream_time)
+
+    def test_no_model_records_every_red(self):
+        monitor = self.monitor(model=None)
+        self.scream(monitor)
+        self.assertEqual(monitor.recordings_started, 1)
+        self.assertIsNone(monitor.last_classification)
+
+    def test_unlikely_cry_is_not_recorded(self):
+        # Whatever the audio, the model puts crying at 12%
+        monitor = self.monitor(CryClassifier(cry_model([0, 0, 0, 0], -2.0)))
+        gated = monitor.gated_metric.value
+        with self.assertLogs("monitor.services.audio_monitor", "INFO") as logs:
+            self.scream(monitor)
+        self.assertEqual(monitor.recordings_started, 0)
+        self.assertIn("not recording, sounds like noise (12% crying)", logs.output[-1])
+        # RED from 0.2 s on, classified at most twice a second rather than every chunk
+        self.assertEqual(monitor.gated_metric.value - gated, 2)
+
+    def test_likely_cry_is_recorded(self):
+        monitor = self.monitor(CryClassifier(cry_model([0, 0, 0, 0], 2.0)))
+        self.scream(monitor)
+        self.assertEqual(monitor.recordings_started, 1)
+        self.assertEqual(monitor.last_classification.label, CRY_LABEL)
+
+    def test_zero_threshold_records_everything(self):
+        monitor = self.monitor(CryClassifier(cry_model([0, 0, 0, 0], -2.0)), 0)
+        self.scream(monitor)
+        self.assertEqual(monitor.recordings_started, 1)
@@ -12,4 +12,23 @@ urlpatterns = [
         "device/<str:device_id>/start", views.start_monitoring, name="start_monitoring"
     ),
     path("device/<str:device_id>/stop", views.stop_monitoring, name="stop_monitoring"),
+    path(
+        "device/<str:device_id>/events",
+        views.get_device_events,
+        name="get_device_events",
+    ),
+    path(
+        "device/<str:device_id>/recordings",
+        views.get_device_recordings,
+        name="get_device_recordings",
+    ),
+    path("recording/<int:recording_id>", views.get_recording, name="get_recording"),
+    path(
+        "recordings/usage", views.get_recordings_usage, name="get_recordings_usage"
+    ),
+    path(
+        "recordings/files/<path:path>",
+        views.serve_recording_file,
+        name="serve_recording_file",
+    ),
 ]
@@ -1,10 +1,59 @@
 from django.shortcuts import render
-from django.http import JsonResponse
-from .models import ChatRoom, ChatMessage, MonitorDevice
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from .models import AudioEvent, ChatRoom, ChatMessage, MonitorDevice, Recording
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from .services.audio_monitor import AudioMonitorService
+from .services.chat_history import invalidate_history
+from .services.device_config import get_device
+from .services.metrics import collect_snapshots, render as render_metrics
+from .services.previews import POSTER_NAME, WAVEFORM_NAME
+from .services.recordings import resolve_recording_path, segment_at
+from .services.storage import usage
+from .services.supervisor import send_control
+import base64
+import csv
 import json
+import os
+import posixpath
+import re
+
+EVENT_FIELDS = (
+    "id",
+    "timestamp",
+    "peak_value",
+    "alert_level",
+    "recording_path",
+    "rms",
+    "crest_factor",
+    "zero_crossing_rate",
+    "band_low",
+    "band_mid",
+    "band_high",
+    "motion_score",
+    "sound_label",
+    "sound_confidence",
+)
+EVENTS_DEFAULT_LIMIT = 100
+EVENTS_MAX_LIMIT = 1000
+EXPORT_CHUNK_SIZE = 2000
+RECORDINGS_DEFAULT_LIMIT = 50
+RECORDINGS_MAX_LIMIT = 500
+RECORDING_CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".jpg": "image/jpeg",
+}
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+FILE_CHUNK_SIZE = 64 * 1024
 
 # Create your views here.
 
@@ -15,6 +64,7 @@ def delete_chat_history(request, room_name):
     try:
         room = ChatRoom.objects.get(name=room_name)
         ChatMessage.objects.filter(room=room).delete()
+        invalidate_history(room.id)
         return JsonResponse({"status": "success", "message": "Chat history deleted"})
     except ChatRoom.DoesNotExist:
         return JsonResponse(
@@ -28,13 +78,16 @@ def delete_chat_history(request, room_name):
 @require_http_methods(["GET"])
 def get_monitor_device(request, device_id):
     try:
-        device = MonitorDevice.objects.get(id=device_id)
+        device = get_device(device_id)
         return JsonResponse(
             {
                 "id": device.id,
                 "name": device.name,
                 "stream_url": device.stream_url,
                 "is_active": device.is_active,
+                "motion_enabled": device.motion_enabled,
+                "threshold_mode": device.threshold_mode,
+                "noise_floor": device.noise_floor,
             }
         )
     except MonitorDevice.DoesNotExist:
@@ -50,8 +103,7 @@ def get_monitor_device(request, device_id):
 def start_monitoring(request, device_id):
     try:
         device = MonitorDevice.objects.get(id=device_id)
-        monitor = AudioMonitorService.get_monitor(device.id)
-        monitor.start()
+        send_control("start", device.id)
         device.is_active = True
         device.save()
         return JsonResponse({"status": "success", "message": "Monitoring started"})
@@ -68,8 +120,7 @@ def start_monitoring(request, device_id):
 def stop_monitoring(request, device_id):
     try:
         device = MonitorDevice.objects.get(id=device_id)
-        monitor = AudioMonitorService.get_monitor(device.id)
-        monitor.stop()
+        send_control("stop", device.id)
         device.is_active = False
         device.save()
         return JsonResponse({"status": "success", "message": "Monitoring stopped"})
@@ -79,3 +130,316 @@ def stop_monitoring(request, device_id):
         )
     except Exception as e:
         return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+
+class _Echo:
+    """File-like object for csv.writer that hands rows straight back to the response"""
+
+    def write(self, value):
+        return value
+
+
+def _encode_cursor(event):
+    raw = f"{event['timestamp'].isoformat()}|{event['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    timestamp, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    parsed = parse_datetime(timestamp)
+    if parsed is None:
+        raise ValueError("Invalid cursor")
+    return parsed, int(event_id)
+
+
+def _parse_time_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid {name} timestamp: {value}")
+    return parsed
+
+
+def _serialize_event(event):
+    return {**event, "timestamp": event["timestamp"].isoformat()}
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_device_events(request, device_id):
+    """Alert history for a device, newest first.
+
+    Query params:
+        since, until: ISO timestamps bounding the range
+        cursor: `next_cursor` from the previous page (keyset on timestamp, id)
+        limit: page size, up to EVENTS_MAX_LIMIT
+        format: "json" (paginated, default), or "ndjson"/"csv" to stream the
+            whole range without loading it into memory
+    """
+    try:
+        device = get_device(device_id)
+        since = _parse_time_param(request, "since")
+        until = _parse_time_param(request, "until")
+        export_format = request.GET.get("format", "json")
+        if export_format not in ("json", "ndjson", "csv"):
+            raise ValueError(f"Unknown format: {export_format}")
+
+        events = AudioEvent.objects.filter(device=device)
+        if since is not None:
+            events = events.filter(timestamp__gte=since)
+        if until is not None:
+            events = events.filter(timestamp__lt=until)
+
+        cursor = request.GET.get("cursor")
+        if cursor:
+            cursor_timestamp, cursor_id = _decode_cursor(cursor)
+            events = events.filter(
+                Q(timestamp__lt=cursor_timestamp)
+                | Q(timestamp=cursor_timestamp, id__lt=cursor_id)
+            )
+
+        # Matches the (device, timestamp) index, so deep pages cost the same as the first
+        events = events.order_by("-timestamp", "-id").values(*EVENT_FIELDS)
+
+        if export_format == "ndjson":
+            rows = (
+                json.dumps(_serialize_event(event)) + "\n"
+                for event in events.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+            return StreamingHttpResponse(rows, content_type="application/x-ndjson")
+
+        if export_format == "csv":
+            writer = csv.writer(_Echo())
+            rows = (
+                writer.writerow([_serialize_event(event)[f] for f in EVENT_FIELDS])
+                for event in events.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+            header = iter([writer.writerow(EVENT_FIELDS)])
+            response = StreamingHttpResponse(
+                (row for part in (header, rows) for row in part),
+                content_type="text/csv",
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="{device.name}_events.csv"'
+            )
+            return response
+
+        limit = max(
+            1,
+            min(int(request.GET.get("limit", EVENTS_DEFAULT_LIMIT)), EVENTS_MAX_LIMIT),
+        )
+        page = list(events[: limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        return JsonResponse(
+            {
+                "events": [_serialize_event(event) for event in page],
+                "next_cursor": _encode_cursor(page[-1]) if has_more else None,
+            }
+        )
+    except MonitorDevice.DoesNotExist:
+        return JsonResponse(
+            {"status": "error", "message": "Monitor device not found"}, status=404
+        )
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+
+def _recording_file_url(path):
+    return reverse("serve_recording_file", args=[path])
+
+
+def _clip_file_url(recording, name):
+    return _recording_file_url(posixpath.join(posixpath.dirname(recording.path), name))
+
+
+def _serialize_recording(recording):
+    return {
+        "id": recording.id,
+        "device_id": recording.device_id,
+        "started_at": recording.started_at.isoformat(),
+        "ended_at": recording.ended_at.isoformat(),
+        "duration": recording.duration,
+        "size_bytes": recording.size_bytes,
+        "playlist_url": _recording_file_url(recording.path),
+        # JPEG frame from the loudest moment of the clip
+        "poster_url": (
+            _clip_file_url(recording, POSTER_NAME) if recording.has_poster else None
+        ),
+        # int8 [min, max] pairs, one per bucket across the whole clip
+        "waveform_url": (
+            _clip_file_url(recording, WAVEFORM_NAME) if recording.has_waveform else None
+        ),
+    }
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_device_recordings(request, device_id):
+    """Recorded clips for a device, newest first. Pass `before=<id>` for the next page"""
+    try:
+        device = get_device(device_id)
+        recordings = Recording.objects.filter(device=device)
+        before = request.GET.get("before")
+        if before:
+            recordings = recordings.filter(id__lt=int(before))
+        limit = max(
+            1,
+            min(
+                int(request.GET.get("limit", RECORDINGS_DEFAULT_LIMIT)),
+                RECORDINGS_MAX_LIMIT,
+            ),
+        )
+        page = list(recordings.order_by("-id")[: limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        return JsonResponse(
+            {
+                "recordings": [_serialize_recording(r) for r in page],
+                "next_before": page[-1].id if has_more else None,
+            }
+        )
+    except MonitorDevice.DoesNotExist:
+        return JsonResponse(
+            {"status": "error", "message": "Monitor device not found"}, status=404
+        )
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_recordings_usage(request):
+    """Disk used by recorded clips, per device and overall, with the configured quotas"""
+    try:
+        return JsonResponse(usage())
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_recording(request, recording_id):
+    """A clip's segments and the AudioEvents saved while it was recording.
+
+    Each event carries its `offset` into the clip and the `segment` that covers
+    it, so the UI can seek straight to it.
+    """
+    try:
+        recording = Recording.objects.get(id=recording_id)
+        segments = list(recording.segments.order_by("sequence"))
+        offsets = [segment.offset for segment in segments]
+
+        events = []
+        for event in (
+            AudioEvent.objects.filter(
+                device_id=recording.device_id,
+                timestamp__gte=recording.started_at,
+                timestamp__lte=recording.ended_at,
+                recording_path=recording.path,
+            )
+            .order_by("timestamp", "id")
+            .values(*EVENT_FIELDS)
+        ):
+            offset = (event["timestamp"] - recording.started_at).total_seconds()
+            events.append(
+                {
+                    **_serialize_event(event),
+                    "offset": offset,
+                    "segment": segment_at(offsets, offset),
+                }
+            )
+
+        return JsonResponse(
+            {
+                **_serialize_recording(recording),
+                "segments": [
+                    {
+                        "sequence": segment.sequence,
+                        "url": _clip_file_url(recording, segment.uri),
+                        "started_at": segment.started_at.isoformat(),
+                        "offset": segment.offset,
+                        "duration": segment.duration,
+                    }
+                    for segment in segments
+                ],
+                "events": events,
+            }
+        )
+    except Recording.DoesNotExist:
+        return JsonResponse(
+            {"status": "error", "message": "Recording not found"}, status=404
+        )
+    except Exception as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(FILE_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_recording_file(request, path):
+    """Serve a playlist or segment from RECORDINGS_ROOT, honouring single byte ranges
+    so players can seek without downloading the whole clip"""
+    try:
+        full_path = resolve_recording_path(path)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Not found"}, status=404)
+    if not os.path.isfile(full_path):
+        return JsonResponse({"status": "error", "message": "Not found"}, status=404)
+
+    size = os.path.getsize(full_path)
+    content_type = RECORDING_CONTENT_TYPES.get(
+        os.path.splitext(full_path)[1], "application/octet-stream"
+    )
+    match = RANGE_PATTERN.match(request.headers.get("Range", "").strip())
+    if match is None or match.groups() == ("", ""):
+        # No (or a multi-part) range, send the whole file
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # "bytes=-N" is the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_range(full_path, start, length), status=206, content_type=content_type
+    )
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Monitor metrics from this process and every supervisor worker, for Prometheus"""
+    return HttpResponse(
+        render_metrics(collect_snapshots()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )